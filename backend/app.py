@@ -3,14 +3,31 @@ Chess Puzzle API Backend
 RESTful API cho ứng dụng học cờ vua
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, make_response, request
 from flask_cors import CORS
+import atexit
+import os
 import sqlite3
 import random
 from datetime import datetime
 from functools import wraps
 
+from config.database import ConnectionManager
+from config.migrations import check_plans, migrate
+from models.importer import MODES as IMPORT_MODES, PositionImporter, iter_ndjson
+from models.ingest import ProgressIngestQueue
+from models.leaderboard import Leaderboard
+from models.pack import MAX_PACK_SIZE, build_pack
+from models.position import PositionCatalog
+from models.progress import record_many, record_progress
+from models.selection import RandomSelector, parse_id_list
+from models.session import SessionStore
+from models.stats import GlobalStats
+from models.verifier import InvalidPosition, MoveVerifier
+from utils.serializer import FastJSONProvider, dumps, iter_json_object
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson/ujson nếu đã cài, không thì stdlib json
 # CORS(app, origins=['http://localhost:3000', 'http://localhost:5173', 'http://localhost:3002'])  
 CORS(app, origins=[
     'https://chess-app-zmni.onrender.com', 
@@ -19,76 +36,76 @@ CORS(app, origins=[
 
 DATABASE = 'data/chess_puzzles.db'
 
+# Batch fetch: tối đa số id trong ?ids=, và ngưỡng chuyển sang stream NDJSON
+MAX_BATCH_IDS = 1000
+BATCH_JSON_LIMIT = 500
+# Leaderboard lớn hơn ngưỡng này được stream thay vì dựng cả danh sách
+LEADERBOARD_STREAM_THRESHOLD = 100
+
+# Pool kết nối theo thread; DB_MAX_CONNECTIONS giới hạn số kết nối checkout cùng lúc
+db = ConnectionManager(DATABASE, max_connections=int(os.environ.get('DB_MAX_CONNECTIONS', 0)) or None)
+
+# PROGRESS_INGEST=async: tiến độ ghi qua hàng đợi write-behind (group commit + journal)
+progress_queue = (ProgressIngestQueue(db, os.environ.get('PROGRESS_JOURNAL_DIR', 'data/journal'))
+                  if os.environ.get('PROGRESS_INGEST', 'sync') == 'async' else None)
+if progress_queue is not None:
+    atexit.register(progress_queue.close)  # dev server; gunicorn dùng worker_exit
+
+# Bảng xếp hạng trong RAM, đồng bộ giữa các worker qua leaderboard_log
+leaderboard = Leaderboard(db)
+
+# Catalog positions trong RAM, nạp lười một lần cho mỗi gunicorn worker
+catalog = PositionCatalog(DATABASE)
+
+# Thống kê toàn hệ thống: bộ đếm do trigger cập nhật, cache TTL + singleflight
+global_stats = GlobalStats(db, count_positions=lambda: len(catalog.snapshot()))
+
 # ==================== DATABASE HELPERS ====================
 
 def get_db():
-    """Kết nối database"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # Trả về dict thay vì tuple
-    return conn
+    """Lấy kết nối database từ pool (conn.close() sẽ trả kết nối về pool)"""
+    return db.acquire()
+
+@app.teardown_appcontext
+def release_db(exception=None):
+    """Trả kết nối còn sót về pool khi request kết thúc (kể cả khi lỗi)"""
+    db.release_current()
 
 def init_db():
-    """Khởi tạo database với các bảng cần thiết"""
+    """Áp dụng các migration còn thiếu (tạo bảng, sửa schema lệch, index)"""
+    with db.connection() as conn:
+        applied = migrate(conn)
+        for migration in applied:
+            print(f"✅ Applied migration {migration.version:03d} {migration.name}")
+        for failure in check_plans(conn, applied):
+            print(f"⚠️  Query plan check failed: {failure}")
+    print("✅ Database initialized")
+
+# Chạy khi import => cả gunicorn (Procfile) lẫn dev server; migrate() tự khóa nên
+# khi nhiều worker cùng khởi động chỉ một worker thực sự áp dụng
+init_db()
+
+def load_solve_counts():
+    """Số lần mỗi position được giải (trọng số cho random có ưu tiên)"""
     conn = get_db()
     cursor = conn.cursor()
     
-    # Bảng positions (đã có từ script parse)
     cursor.execute('''
-    CREATE TABLE IF NOT EXISTS positions (
-        id INTEGER PRIMARY KEY,
-        fen TEXT NOT NULL,
-        solution TEXT,
-        difficulty TEXT,
-        source TEXT,
-        tags TEXT,
-        board_notation TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Bảng users (người dùng)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Bảng user_progress (theo dõi tiến độ)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_progress (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        position_id INTEGER NOT NULL,
-        solved BOOLEAN DEFAULT 0,
-        attempts INTEGER DEFAULT 0,
-        time_spent INTEGER DEFAULT 0,
-        last_attempt TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id),
-        FOREIGN KEY (position_id) REFERENCES positions(id),
-        UNIQUE(user_id, position_id)
-    )
-    ''')
-    
-    # Bảng statistics (thống kê tổng)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_stats (
-        user_id INTEGER PRIMARY KEY,
-        total_solved INTEGER DEFAULT 0,
-        total_attempts INTEGER DEFAULT 0,
-        success_rate REAL DEFAULT 0.0,
-        avg_time INTEGER DEFAULT 0,
-        streak INTEGER DEFAULT 0,
-        last_solved_date DATE,
-        FOREIGN KEY (user_id) REFERENCES users(id)
-    )
+        SELECT position_id, COUNT(*) as solve_count
+        FROM user_progress
+        WHERE solved = 1
+        GROUP BY position_id
     ''')
+    counts = {row['position_id']: row['solve_count'] for row in cursor.fetchall()}
     
-    conn.commit()
     conn.close()
-    print("✅ Database initialized")
+    return counts
+
+selector = RandomSelector(catalog, solve_counts_loader=load_solve_counts)
+verifier = MoveVerifier(catalog)
+
+# Session giải trọn biến, trong RAM của worker; tiến độ được ghi theo lô
+sessions = SessionStore(verifier, persist=lambda records: persist_sessions(records))
 
 # ==================== DECORATORS ====================
 
@@ -98,14 +115,83 @@ def json_response(f):
     def decorated_function(*args, **kwargs):
         try:
             result = f(*args, **kwargs)
+            if isinstance(result, Response):  # VD: response stream NDJSON
+                return result
+            if isinstance(result, tuple):  # (body, status) hoặc (body, status, headers)
+                return (jsonify(result[0]),) + result[1:]
             return jsonify(result)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     return decorated_function
 
+# Cache-Control cho từng loại tài nguyên
+CACHE_IMMUTABLE = 'public, max-age=86400, stale-while-revalidate=604800'  # position/solution theo id
+CACHE_SHORT = 'public, max-age=30, stale-while-revalidate=300'            # count, leaderboard, stats toàn hệ thống
+CACHE_PRIVATE = 'private, max-age=5'                                       # thống kê của từng user
+CACHE_NONE = 'no-store'                                                    # random, pack, ghi dữ liệu
+
+def http_cache(cache_control, etag=None, vary=None):
+    """
+    Decorator thêm Cache-Control và ETag cho response GET
+    
+    Args:
+        cache_control: Giá trị header Cache-Control khi response thành công
+        etag: Hàm (cùng tham số với view) trả về ETag, hoặc None nếu không có
+        vary: Header request mà response phụ thuộc (vd. 'Accept-Encoding'), gửi cả trên 304
+    
+    Nếu If-None-Match của request khớp ETag thì trả 304 mà không gọi view.
+    ETag là weak: bản gốc và các bản nén (gzip/br) cùng một nội dung dùng chung một ETag.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            tag = etag(*args, **kwargs) if etag else None
+            
+            if tag and request.if_none_match.contains_weak(tag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or (etag and not tag):
+                    # Lỗi hoặc tài nguyên không tồn tại => không cache
+                    response.headers['Cache-Control'] = CACHE_NONE
+                    return response
+            
+            response.headers['Cache-Control'] = cache_control
+            if vary:
+                response.vary.add(vary)
+            if tag:
+                response.set_etag(tag, weak=True)
+            return response
+        return decorated_function
+    return decorator
+
+def payload_response(payload):
+    """Trả body dựng sẵn của catalog, chọn bản nén theo Accept-Encoding"""
+    body, encoding = payload.negotiate(request.accept_encodings)
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def position_etag(position_id):
+    return catalog.snapshot().etag(position_id)
+
+def index_etag(index):
+    """ETag cho by-index: phụ thuộc cả difficulty và id đang ở thứ tự đó"""
+    snapshot = catalog.snapshot()
+    difficulty = request.args.get('difficulty', 'mate_in_2')
+    position_id = snapshot.id_at(difficulty, index)
+    return f'{difficulty}-{index}-{snapshot.etag(position_id)}' if position_id is not None else None
+
+def solution_etag(position_id):
+    tag = catalog.snapshot().etag(position_id)
+    return f'{tag}-solution' if tag else None
+
 # ==================== API ENDPOINTS ====================
 
 @app.route('/api/health', methods=['GET'])
+@http_cache(CACHE_NONE)
 @json_response
 def health_check():
     """Kiểm tra server hoạt động"""
@@ -115,135 +201,163 @@ def health_check():
     }
 
 @app.route('/api/positions/count', methods=['GET'])
+@http_cache(CACHE_SHORT)
 @json_response
 def get_positions_count():
     """Lấy tổng số puzzle positions"""
     difficulty = request.args.get('difficulty', 'mate_in_2')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT COUNT(*) as total
-        FROM positions 
-        WHERE difficulty = ?
-    ''', (difficulty,))
-    
-    row = cursor.fetchone()
-    conn.close()
-    
     return {
-        'total': row['total'],
+        'total': catalog.snapshot().count(difficulty),
         'difficulty': difficulty
     }
 
 @app.route('/api/positions/random', methods=['GET'])
+@http_cache(CACHE_NONE)
 @json_response
 def get_random_position():
     """Lấy 1 vị trí ngẫu nhiên"""
     difficulty = request.args.get('difficulty', 'mate_in_2')
+    weighted = request.args.get('weighted', '0') in ('1', 'true')  # ưu tiên puzzle ít người giải
+    exclude = parse_id_list(request.args.get('exclude'))  # VD: "12,40,7" - các id vừa chơi
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, fen, difficulty, tags
-        FROM positions 
-        WHERE difficulty = ?
-        ORDER BY RANDOM() 
-        LIMIT 1
-    ''', (difficulty,))
+    position = selector.pick(difficulty, weighted=weighted, exclude=exclude)
     
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'id': row['id'],
-            'fen': row['fen'],
-            'difficulty': row['difficulty'],
-            'tags': row['tags'].split(',') if row['tags'] else []
-        }
+    if position:
+        return position
     else:
         return {'error': 'No positions found'}, 404
 
 @app.route('/api/positions/by-index/<int:index>', methods=['GET'])
+@http_cache(CACHE_SHORT, etag=index_etag, vary='Accept-Encoding')
 @json_response
 def get_position_by_index(index):
     """Lấy vị trí theo index (thứ tự)"""
     difficulty = request.args.get('difficulty', 'mate_in_2')
     
-    conn = get_db()
-    cursor = conn.cursor()
+    snapshot = catalog.snapshot()
+    position_id = snapshot.id_at(difficulty, index)
     
-    cursor.execute('''
-        SELECT id, fen, difficulty, tags
-        FROM positions 
-        WHERE difficulty = ?
-        ORDER BY id
-        LIMIT 1 OFFSET ?
-    ''', (difficulty, index))
+    if position_id is not None:
+        return payload_response(snapshot.payloads[position_id])
+    else:
+        return {'error': 'Position not found'}, 404
+
+@app.route('/api/positions/batch', methods=['GET'])
+@http_cache(CACHE_SHORT)
+@json_response
+def get_positions_batch():
+    """
+    Lấy nhiều vị trí trong một request
     
-    row = cursor.fetchone()
-    conn.close()
+    - ?ids=1,2,3                              theo danh sách id
+    - ?difficulty=mate_in_2&from=0&count=100  theo khoảng thứ tự (như by-index)
     
-    if row:
-        return {
-            'id': row['id'],
-            'fen': row['fen'],
-            'difficulty': row['difficulty'],
-            'tags': row['tags'].split(',') if row['tags'] else []
-        }
+    Trả JSON khi ít kết quả; stream NDJSON (mỗi dòng một position) khi
+    ?format=ndjson, Accept: application/x-ndjson hoặc vượt BATCH_JSON_LIMIT.
+    """
+    snapshot = catalog.snapshot()
+    
+    if 'ids' in request.args:
+        ids = parse_id_list(request.args.get('ids'), limit=MAX_BATCH_IDS)
     else:
-        return {'error': 'Position not found'}, 404
+        difficulty = request.args.get('difficulty', 'mate_in_2')
+        start = request.args.get('from', 0, type=int)
+        count = request.args.get('count', 20, type=int)
+        if start < 0 or count < 0:
+            return {'error': 'from and count must be non-negative'}, 400
+        ordered = snapshot.ids(difficulty)
+        # range() thay vì slice => không sao chép danh sách id dù count lớn
+        ids = (ordered[i] for i in range(start, min(start + count, len(ordered))))
+        if count <= BATCH_JSON_LIMIT:
+            ids = list(ids)
+    
+    wants_ndjson = (
+        request.args.get('format') == 'ndjson'
+        or request.accept_mimetypes.best == 'application/x-ndjson'
+        or not isinstance(ids, list)
+        or len(ids) > BATCH_JSON_LIMIT
+    )
+    
+    if wants_ndjson:
+        def generate():
+            for position_id in ids:
+                position = snapshot.get(position_id)
+                if position is None:
+                    position = {'id': position_id, 'error': 'Position not found'}
+                yield dumps(position) + b'\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    missing = []
+    
+    def found():
+        for position_id in ids:
+            position = snapshot.get(position_id)
+            if position is None:
+                missing.append(position_id)
+            else:
+                yield position
+    
+    stream = iter_json_object('positions', found(), tail=lambda: {'missing': missing})
+    return Response(stream, mimetype='application/json')
+
+@app.route('/api/packs/next', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_next_pack():
+    """
+    Lấy pack N puzzle kế tiếp để client prefetch
+    
+    ?user_id=&size=10&mode=random|sequential&difficulty=&token=
+    Bỏ qua các puzzle user đã giải; truyền lại next_token để lấy pack tiếp theo.
+    """
+    user_id = request.args.get('user_id', type=int)
+    size = min(max(request.args.get('size', 10, type=int), 1), MAX_PACK_SIZE)
+    mode = request.args.get('mode', 'random')
+    difficulty = request.args.get('difficulty', 'mate_in_2')
+    token = request.args.get('token')
+    
+    if mode not in ('random', 'sequential'):
+        return {'error': 'mode must be random or sequential'}, 400
+    
+    solved = set()
+    if user_id is not None:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT position_id FROM user_progress
+            WHERE user_id = ? AND solved = 1
+        ''', (user_id,))
+        solved = {row['position_id'] for row in cursor.fetchall()}
+        conn.close()
+    
+    try:
+        return build_pack(selector, size, mode, difficulty, solved, token)
+    except ValueError as e:
+        return {'error': str(e)}, 400
 
 @app.route('/api/positions/<int:position_id>', methods=['GET'])
+@http_cache(CACHE_IMMUTABLE, etag=position_etag, vary='Accept-Encoding')
 @json_response
 def get_position(position_id):
     """Lấy vị trí theo ID"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, fen, difficulty, tags
-        FROM positions 
-        WHERE id = ?
-    ''', (position_id,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    payload = catalog.snapshot().payloads.get(position_id)
     
-    if row:
-        return {
-            'id': row['id'],
-            'fen': row['fen'],
-            'difficulty': row['difficulty'],
-            'tags': row['tags'].split(',') if row['tags'] else []
-        }
+    if payload:
+        return payload_response(payload)
     else:
         return {'error': 'Position not found'}, 404
 
 @app.route('/api/positions/<int:position_id>/solution', methods=['GET'])
+@http_cache(CACHE_IMMUTABLE, etag=solution_etag, vary='Accept-Encoding')
 @json_response
 def get_solution(position_id):
     """Lấy lời giải (chỉ sau khi người dùng yêu cầu)"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT solution
-        FROM positions 
-        WHERE id = ?
-    ''', (position_id,))
+    payload = catalog.snapshot().solution_payloads.get(position_id)
     
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'position_id': position_id,
-            'solution': row['solution']
-        }
+    if payload:
+        return payload_response(payload)
     else:
         return {'error': 'Position not found'}, 404
 
@@ -252,34 +366,78 @@ def get_solution(position_id):
 def verify_move(position_id):
     """Kiểm tra nước đi của người dùng"""
     data = request.get_json()
-    user_move = data.get('move', '')  # VD: "h7+"
+    user_move = data.get('move', '')  # VD: "h7+", "h7", "h6h7"
     
-    conn = get_db()
-    cursor = conn.cursor()
+    # So sánh theo luật cờ: SAN/UCI đều được đổi về cùng một nước đi chuẩn
+    try:
+        result = verifier.verify(position_id, user_move)
+    except InvalidPosition:
+        return {'error': 'invalid position'}, 422
     
-    cursor.execute('''
-        SELECT solution
-        FROM positions 
-        WHERE id = ?
-    ''', (position_id,))
+    if result is None:
+        return {'error': 'Position not found'}, 404
     
-    row = cursor.fetchone()
-    conn.close()
+    return result
+
+# ==================== PUZZLE SESSIONS ====================
+
+@app.route('/api/sessions', methods=['POST'])
+@http_cache(CACHE_NONE)
+@json_response
+def start_session():
+    """Mở session giải trọn biến (lời giải không gửi về client)"""
+    data = request.get_json() or {}
+    position_id = data.get('position_id')
+    user_id = data.get('user_id')
     
-    if not row:
+    if not isinstance(position_id, int):
+        return {'error': 'position_id required'}, 400
+    
+    try:
+        session = sessions.start(position_id, user_id if isinstance(user_id, int) else None)
+    except InvalidPosition:
+        return {'error': 'invalid position'}, 422
+    
+    if session is None:
         return {'error': 'Position not found'}, 404
     
-    solution = row['solution']
-    # Lấy nước đi đầu tiên trong solution
-    first_move = solution.split()[1] if solution else ''  # "1. h7+" -> "h7+"
+    return session, 201
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_session(session_id):
+    """Trạng thái hiện tại của session"""
+    try:
+        session = sessions.get(session_id)
+    except InvalidPosition:
+        return {'error': 'invalid position'}, 422
     
-    is_correct = user_move.lower() == first_move.lower()
+    if session is None:
+        return {'error': 'Session not found or expired'}, 404
     
-    return {
-        'correct': is_correct,
-        'user_move': user_move,
-        'expected_move': first_move if not is_correct else None
-    }
+    return session
+
+@app.route('/api/sessions/<session_id>/moves', methods=['POST'])
+@http_cache(CACHE_NONE)
+@json_response
+def play_session_move(session_id):
+    """Gửi một nước; trả về đúng/sai và nước đáp của đối phương"""
+    data = request.get_json() or {}
+    user_move = data.get('move', '')
+    
+    if not user_move:
+        return {'error': 'move required'}, 400
+    
+    try:
+        result = sessions.play(session_id, user_move)
+    except InvalidPosition:
+        return {'error': 'invalid position'}, 422
+    
+    if result is None:
+        return {'error': 'Session not found or expired'}, 404
+    
+    return result
 
 @app.route('/api/users', methods=['POST'])
 @json_response
@@ -324,65 +482,38 @@ def create_user():
 @app.route('/api/users/<int:user_id>/progress', methods=['POST'])
 @json_response
 def update_progress(user_id):
-    """Cập nhật tiến độ người dùng"""
-    data = request.get_json()
+    """Cập nhật tiến độ người dùng (một transaction, 2 câu UPSERT)"""
+    data = request.get_json() or {}
     position_id = data.get('position_id')
-    solved = data.get('solved', False)
+    solved = bool(data.get('solved', False))
     time_spent = data.get('time_spent', 0)  # seconds
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Kiểm tra xem đã có record chưa
-    cursor.execute('''
-        SELECT attempts FROM user_progress
-        WHERE user_id = ? AND position_id = ?
-    ''', (user_id, position_id))
-    
-    row = cursor.fetchone()
-    
-    if row:
-        # Update existing record
-        new_attempts = row['attempts'] + 1
-        cursor.execute('''
-            UPDATE user_progress
-            SET solved = ?,
-                attempts = ?,
-                time_spent = time_spent + ?,
-                last_attempt = CURRENT_TIMESTAMP
-            WHERE user_id = ? AND position_id = ?
-        ''', (solved, new_attempts, time_spent, user_id, position_id))
-    else:
-        # Insert new record
-        cursor.execute('''
-            INSERT INTO user_progress 
-            (user_id, position_id, solved, attempts, time_spent, last_attempt)
-            VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, position_id, solved, time_spent))
+    if not isinstance(position_id, int):
+        return {'error': 'position_id required'}, 400
     
-    # Update user stats if solved
-    if solved:
-        cursor.execute('''
-            UPDATE user_stats
-            SET total_solved = total_solved + 1,
-                total_attempts = total_attempts + 1,
-                last_solved_date = DATE('now')
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        # Update success rate
-        cursor.execute('''
-            UPDATE user_stats
-            SET success_rate = (total_solved * 100.0 / total_attempts)
-            WHERE user_id = ?
-        ''', (user_id,))
+    # Write-behind: đã ghi journal, writer thread sẽ commit theo lô
+    if progress_queue is not None and progress_queue.submit((user_id, position_id, solved, 1, time_spent)):
+        return {'message': 'Progress queued', 'queued': True}, 202
     
+    conn = get_db()
+    record_progress(conn, user_id, position_id, solved, time_spent)
     conn.commit()
     conn.close()
     
     return {'message': 'Progress updated successfully'}
 
+def persist_sessions(records):
+    """Ghi một lô session đã kết thúc / hết hạn trong một transaction"""
+    if progress_queue is not None:
+        records = [record for record in records if not progress_queue.submit(record)]
+        if not records:
+            return
+    with db.connection() as conn:
+        record_many(conn, records)
+        conn.commit()
+
 @app.route('/api/users/<int:user_id>/stats', methods=['GET'])
+@http_cache(CACHE_PRIVATE)
 @json_response
 def get_user_stats(user_id):
     """Lấy thống kê người dùng"""
@@ -423,129 +554,154 @@ def get_user_stats(user_id):
     }
 
 @app.route('/api/leaderboard', methods=['GET'])
+@http_cache(CACHE_SHORT)
 @json_response
 def get_leaderboard():
-    """Lấy bảng xếp hạng"""
-    limit = request.args.get('limit', 10, type=int)
+    """Lấy bảng xếp hạng (từ index trong RAM, không sắp xếp lại mỗi request)"""
+    limit = max(0, request.args.get('limit', 10, type=int))
+    offset = max(0, request.args.get('offset', 0, type=int))
     
-    conn = get_db()
-    cursor = conn.cursor()
+    entries = leaderboard.top(limit, offset)
     
-    cursor.execute('''
-        SELECT 
-            u.username,
-            s.total_solved,
-            s.success_rate,
-            s.streak
-        FROM user_stats s
-        JOIN users u ON s.user_id = u.id
-        ORDER BY s.total_solved DESC, s.success_rate DESC
-        LIMIT ?
-    ''', (limit,))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    if limit > LEADERBOARD_STREAM_THRESHOLD:
+        # Stream từng dòng, không dựng cả body JSON trong bộ nhớ
+        return Response(iter_json_object('leaderboard', iter(entries)), mimetype='application/json')
     
-    leaderboard = [
-        {
-            'rank': i + 1,
-            'username': row['username'],
-            'total_solved': row['total_solved'],
-            'success_rate': round(row['success_rate'], 2),
-            'streak': row['streak']
-        }
-        for i, row in enumerate(rows)
-    ]
+    return {'leaderboard': entries}
+
+@app.route('/api/users/<int:user_id>/rank', methods=['GET'])
+@http_cache(CACHE_PRIVATE)
+@json_response
+def get_user_rank(user_id):
+    """Hạng của user cùng các user đứng ngay trên / dưới (?radius=, tối đa 50)"""
+    radius = min(max(0, request.args.get('radius', 5, type=int)), 50)
+    
+    result = leaderboard.around(user_id, radius)
+    if result is None:
+        return {'error': 'User not found'}, 404
     
-    return {'leaderboard': leaderboard}
+    return result
 
 @app.route('/api/stats/global', methods=['GET'])
+@http_cache(CACHE_SHORT)
 @json_response
 def get_global_stats():
-    """Thống kê toàn hệ thống"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Tổng số vị trí
-    cursor.execute('SELECT COUNT(*) as total FROM positions')
-    total_positions = cursor.fetchone()['total']
-    
-    # Tổng số users
-    cursor.execute('SELECT COUNT(*) as total FROM users')
-    total_users = cursor.fetchone()['total']
-    
-    # Vị trí được giải nhiều nhất
-    cursor.execute('''
-        SELECT position_id, COUNT(*) as solve_count
-        FROM user_progress
-        WHERE solved = 1
-        GROUP BY position_id
-        ORDER BY solve_count DESC
-        LIMIT 5
-    ''')
-    most_solved = [dict(r) for r in cursor.fetchall()]
-    
-    conn.close()
-    
-    return {
-        'total_positions': total_positions,
-        'total_users': total_users,
-        'most_solved': most_solved
-    }
+    """Thống kê toàn hệ thống (bộ đếm vật chất hóa, cache TTL + singleflight)"""
+    return global_stats.get()
 
 # ==================== ADMIN ENDPOINTS ====================
 
 @app.route('/api/admin/positions/bulk', methods=['POST'])
 @json_response
 def bulk_insert_positions():
-    """Bulk insert positions (dùng khi import từ JSON)"""
-    data = request.get_json()
-    positions = data.get('positions', [])
+    """
+    Bulk import positions, ghi theo lô (mỗi lô một transaction)
+    
+    - Content-Type application/x-ndjson: mỗi dòng một position, đọc dạng stream
+      (có thể gửi chunked) => bộ nhớ không đổi dù import hàng triệu dòng
+    - application/json {'positions': [...]}: như trước, cho import nhỏ
+    
+    ?mode=insert (bỏ qua id đã có) | replace (cập nhật id đã có), ?dry_run=1 chỉ đếm
+    """
+    mode = request.args.get('mode', 'insert')
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    if mode not in IMPORT_MODES:
+        return {'error': f"mode must be one of {', '.join(IMPORT_MODES)}"}, 400
+    
+    if request.mimetype == 'application/x-ndjson':
+        items = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        items = ((i, pos, None) for i, pos in enumerate(data.get('positions', []), 1))
     
     conn = get_db()
-    cursor = conn.cursor()
-    
-    inserted = 0
-    for pos in positions:
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO positions 
-                (id, fen, solution, difficulty, source, tags)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                pos['id'],
-                pos['fen'],
-                pos.get('solution', ''),
-                pos.get('difficulty', 'mate_in_2'),
-                pos.get('source', ''),
-                ','.join(pos.get('tags', []))
-            ))
-            inserted += 1
-        except Exception as e:
-            print(f"Error inserting position {pos['id']}: {e}")
-    
-    conn.commit()
+    importer = PositionImporter(conn, mode, dry_run)
+    for line_no, pos, error in items:
+        importer.add(line_no, pos, error)
+    result = importer.finish()
     conn.close()
     
-    return {'inserted': inserted, 'total': len(positions)}
+    if not dry_run and (result['inserted'] or result['updated']):
+        if importer.changed_rows is None:
+            catalog.invalidate()  # import lớn: nạp lại thay vì vá từng dòng
+        else:
+            catalog.apply_changes(upserts=importer.changed_rows)
+        global_stats.invalidate()
+    
+    return result
+
+@app.route('/api/admin/db/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_db_metrics():
+    """Thống kê pool kết nối của worker hiện tại"""
+    return db.metrics()
+
+@app.route('/api/admin/verify/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_verify_metrics():
+    """Tỉ lệ cache hit và percentile thời gian verify của worker hiện tại"""
+    return verifier.metrics()
+
+@app.route('/api/admin/sessions/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_session_metrics():
+    """Số session đang mở / đã giải / hết hạn và hàng chờ ghi của worker hiện tại"""
+    return sessions.metrics()
+
+@app.route('/api/admin/leaderboard/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_leaderboard_metrics():
+    """Số user trong index, số lần nạp lại / đồng bộ tăng dần của worker hiện tại"""
+    return leaderboard.metrics()
+
+@app.route('/api/admin/stats/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_stats_metrics():
+    """Cache hit / stale hit / số lần tính lại thống kê toàn hệ thống của worker hiện tại"""
+    return global_stats.metrics()
+
+@app.route('/api/admin/ingest/metrics', methods=['GET'])
+@http_cache(CACHE_NONE)
+@json_response
+def get_ingest_metrics():
+    """Độ sâu hàng đợi, kích thước lô và độ trễ commit của hàng đợi tiến độ"""
+    if progress_queue is None:
+        return {'enabled': False}
+    return {'enabled': True, **progress_queue.metrics()}
 
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
     print("🚀 Starting Chess Puzzle API Server...")
-    init_db()
     print("📡 Server running on http://localhost:5000")
     print("\n📚 API Endpoints:")
     print("   GET  /api/health")
     print("   GET  /api/positions/random")
+    print("   GET  /api/positions/batch?ids=... | ?from=&count=")
     print("   GET  /api/positions/<id>")
+    print("   GET  /api/packs/next")
     print("   GET  /api/positions/<id>/solution")
     print("   POST /api/positions/<id>/verify")
+    print("   POST /api/sessions")
+    print("   GET  /api/sessions/<id>")
+    print("   POST /api/sessions/<id>/moves")
     print("   POST /api/users")
     print("   POST /api/users/<id>/progress")
     print("   GET  /api/users/<id>/stats")
     print("   GET  /api/leaderboard")
+    print("   GET  /api/users/<id>/rank")
     print("   GET  /api/stats/global")
+    print("   GET  /api/admin/db/metrics")
+    print("   GET  /api/admin/verify/metrics")
+    print("   GET  /api/admin/sessions/metrics")
+    print("   GET  /api/admin/stats/metrics")
+    print("   GET  /api/admin/ingest/metrics")
+    print("   GET  /api/admin/leaderboard/metrics")
     print("\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
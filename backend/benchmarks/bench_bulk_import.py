@@ -0,0 +1,79 @@
+"""
+Benchmark: bulk import NDJSON dạng stream vào bảng positions
+
+Sinh NDJSON lười (không dựng cả body trong RAM) rồi đưa qua iter_ndjson +
+PositionImporter - cùng đường đi với /api/admin/positions/bulk. Mỗi cỡ chạy trong
+một process riêng để đo peak RSS: bộ nhớ phải gần như không đổi khi số dòng tăng.
+Chạy lần hai ở mode replace để đo đường cập nhật.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_bulk_import.py [--rows 100000 1000000] [--batch 5000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.database import PRAGMAS  # noqa: E402
+from config.migrations import migrate  # noqa: E402
+from models.importer import PositionImporter, iter_ndjson  # noqa: E402
+
+FEN = 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4'
+
+
+def ndjson_lines(rows: int):
+    for i in range(1, rows + 1):
+        yield (f'{{"id":{i},"fen":"{FEN}","solution":"1. Qxf7#","difficulty":"mate_in_{i % 3 + 1}",'
+               f'"source":"bench","tags":["mate","bench"]}}\n').encode()
+
+
+def run(path: str, rows: int, mode: str, batch: int, results) -> None:
+    conn = sqlite3.connect(path)
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    started = time.perf_counter()
+    importer = PositionImporter(conn, mode, batch_rows=batch)
+    for line_no, pos, error in iter_ndjson(ndjson_lines(rows)):
+        importer.add(line_no, pos, error)
+    result = importer.finish()
+    elapsed = time.perf_counter() - started
+    stored = conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+    conn.close()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((elapsed, peak_mb, result, stored))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000], help='Số dòng NDJSON')
+    parser.add_argument('--batch', type=int, default=5000, help='Số dòng mỗi transaction')
+    args = parser.parse_args()
+
+    print(f"batch: {args.batch:,} rows per transaction")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            conn = sqlite3.connect(path)
+            migrate(conn)
+            conn.close()
+            for mode in ('insert', 'replace'):
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(target=run, args=(path, rows, mode, args.batch, results))
+                process.start()
+                elapsed, peak_mb, result, stored = results.get()
+                process.join()
+                print(f"   {rows:>10,} rows {mode:<7} {elapsed:6.2f}s ({rows / elapsed:>9,.0f} rows/s) | "
+                      f"peak RSS {peak_mb:6.1f} MB | inserted {result['inserted']:,} updated {result['updated']:,} "
+                      f"skipped {result['skipped']:,} failed {result['failed']:,} | stored {stored:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: /api/stats/global - COUNT(*) + GROUP BY cũ vs bộ đếm vật chất hóa
+
+Dựng user_progress với số dòng tăng dần, đo độ trễ câu truy vấn cũ và của
+GlobalStats._compute() (chưa tính cache TTL, tức là trường hợp cache miss).
+Trước khi đo, kiểm tra bộ đếm do trigger cập nhật khớp với truy vấn cũ.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_global_stats.py [--rows 100000 1000000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.database import ConnectionManager  # noqa: E402
+from config.migrations import migrate  # noqa: E402
+from models.progress import record_progress  # noqa: E402
+from models.stats import GlobalStats  # noqa: E402
+
+POSITIONS = 702
+USERS_PER_ROWS = 100  # mỗi user giải tối đa 100 position khác nhau
+
+
+def legacy_stats(conn):
+    total_positions = conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+    total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+    most_solved = conn.execute('''
+        SELECT position_id, COUNT(*) as solve_count
+        FROM user_progress
+        WHERE solved = 1
+        GROUP BY position_id
+        ORDER BY solve_count DESC
+        LIMIT 5
+    ''').fetchall()
+    return total_positions, total_users, [tuple(r) for r in most_solved]
+
+
+def build_db(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    migrate(conn)  # bảng gốc + trigger bộ đếm (migration 007) => dữ liệu dưới đây được đếm khi ghi
+    rng = random.Random(rows)
+    users = max(1, rows // USERS_PER_ROWS)
+    conn.executemany('INSERT INTO positions (id, fen) VALUES (?, ?)',
+                     ((i, '8/8/8/8/8/8/8/8 w - - 0 1') for i in range(1, POSITIONS + 1)))
+    conn.executemany('INSERT INTO users (id, username, email) VALUES (?, ?, ?)',
+                     ((i, f'u{i}', f'u{i}@bench') for i in range(1, users + 1)))
+    conn.executemany(
+        'INSERT INTO user_progress (user_id, position_id, solved, attempts) VALUES (?, ?, ?, 1)',
+        ((i // USERS_PER_ROWS + 1, i % USERS_PER_ROWS * 7 % POSITIONS + 1, rng.random() < 0.6)
+         for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def run(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_db(path, rows)
+        db = ConnectionManager(path)
+        stats = GlobalStats(db, count_positions=lambda: POSITIONS, ttl=0)
+        stats.get()
+
+        # Ghi thêm qua đường UPSERT thật => trigger phải giữ bộ đếm khớp
+        with db.connection() as conn:
+            for i in range(2000):
+                record_progress(conn, i % 50 + 1, i % POSITIONS + 1, i % 3 != 0, 10)
+            conn.execute("INSERT INTO users (username, email) VALUES ('late', 'late@bench')")
+            conn.commit()
+            legacy = legacy_stats(conn)
+        current = stats.get()
+        materialized = (current['total_positions'], current['total_users'],
+                        [(r['position_id'], r['solve_count']) for r in current['most_solved']])
+        assert legacy[:2] == materialized[:2], (legacy, materialized)
+        assert [c for _, c in legacy[2]] == [c for _, c in materialized[2]], (legacy, materialized)
+
+        with db.connection() as conn:
+            legacy_ms = timed(lambda: legacy_stats(conn), repeat)
+        materialized_ms = timed(stats._compute, repeat)
+        db.close_all()
+        print(f"   {rows:>12,} rows | legacy {legacy_ms:9.3f} ms | materialized {materialized_ms:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Số dòng user_progress cần thử')
+    parser.add_argument('--repeat', type=int, default=20, help='Số lần đo mỗi cỡ (lấy trung vị)')
+    args = parser.parse_args()
+
+    print("user_progress size vs /api/stats/global latency (median, cache miss)")
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: payload dựng sẵn vs đường json_response cũ
+
+So sánh số request/giây của GET /api/positions/<id> (body dựng sẵn từ catalog)
+với cùng dữ liệu đi qua json_response + jsonify như trước, dùng Flask test client.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_payload_cache.py [--requests 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(BACKEND_DIR)  # DATABASE là đường dẫn tương đối
+
+import app as backend  # noqa: E402
+from models import payload  # noqa: E402
+
+
+@backend.app.route('/bench/json-response/<int:position_id>')
+@backend.http_cache(backend.CACHE_IMMUTABLE, etag=backend.position_etag)
+@backend.json_response
+def legacy_position(position_id):
+    """Đường cũ: dựng dict rồi jsonify ở mỗi request"""
+    snapshot = backend.catalog.snapshot()
+    position = snapshot.get(position_id)
+    return {
+        'id': position['id'],
+        'fen': position['fen'],
+        'difficulty': position['difficulty'],
+        'tags': list(position['tags'])
+    }
+
+
+def run(client, url_template: str, ids, requests: int, headers=None) -> float:
+    """Số request/giây qua test client"""
+    started = time.perf_counter()
+    for i in range(requests):
+        response = client.get(url_template.format(ids[i % len(ids)]), headers=headers)
+        response.get_data()
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    client = backend.app.test_client()
+    snapshot = backend.catalog.snapshot()
+    ids = list(snapshot.by_id)
+    random.shuffle(ids)
+
+    cases = [
+        ('json_response + jsonify', '/bench/json-response/{}', None),
+        ('payload cache (identity)', '/api/positions/{}', None),
+        ('payload cache (gzip, br)', '/api/positions/{}', {'Accept-Encoding': 'gzip, br'}),
+    ]
+
+    print(f"positions: {len(ids)}, requests per case: {args.requests:,}")
+    print(f"brotli available: {payload.brotli is not None}")
+    baseline = None
+    for name, url, headers in cases:
+        run(client, url, ids, 500, headers)  # warm-up
+        rps = run(client, url, ids, args.requests, headers)
+        baseline = baseline or rps
+        print(f"   {name:<28} {rps:>10,.0f} req/s  ({rps / baseline:.2f}x)")
+
+    # Riêng phần serialize (không tính chi phí WSGI của test client)
+    print("\nserialization only (per response):")
+    with backend.app.test_request_context('/', headers={'Accept-Encoding': 'gzip, br'}):
+        for name, build in (
+            ('jsonify(dict)', lambda pid: backend.jsonify(dict(snapshot.get(pid)))),
+            ('payload_response', lambda pid: backend.payload_response(snapshot.payloads[pid])),
+        ):
+            started = time.perf_counter()
+            for i in range(args.requests):
+                build(ids[i % len(ids)]).get_data()
+            elapsed = (time.perf_counter() - started) / args.requests
+            print(f"   {name:<28} {elapsed * 1e6:>10.2f} µs")
+
+    sizes = [len(p.identity) for p in snapshot.payloads.values()]
+    compressed = sum(1 for p in snapshot.payloads.values() if p.gzip or p.br)
+    print(f"\navg body: {sum(sizes) / len(sizes):.0f} bytes, compressed variants kept: {compressed}/{len(sizes)}")
+
+
+if __name__ == '__main__':
+    main()
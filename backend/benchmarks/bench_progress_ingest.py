@@ -0,0 +1,97 @@
+"""
+Benchmark: ghi tiến độ đồng bộ (mỗi request một commit) vs hàng đợi write-behind
+
+Nhiều thread (giống các thread của một worker) cùng gửi lượt giải. Đo độ trễ
+phía request (thời gian endpoint bị chặn), thông lượng đến khi mọi lượt đã
+commit, số transaction và số lượt được ghi nhận.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_progress_ingest.py [--threads 8] [--writes 2000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_progress_writes import POSITIONS, USERS, build_db, percentile  # noqa: E402
+from config.database import ConnectionManager  # noqa: E402
+from config.migrations import migrate  # noqa: E402
+from models.ingest import ProgressIngestQueue  # noqa: E402
+from models.progress import record_progress  # noqa: E402
+
+
+def run(mode: str, threads: int, writes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_db(path)
+        db = ConnectionManager(path)
+        with db.connection() as conn:
+            migrate(conn)  # ingest_checkpoints + trigger như database thật
+        queue = ProgressIngestQueue(db, os.path.join(tmp, 'journal')) if mode == 'queue' else None
+        latencies = []
+        lock = threading.Lock()
+
+        def client(seed):
+            rng = random.Random(seed)
+            samples = []
+            for _ in range(writes):
+                record = (rng.randint(1, USERS), rng.randint(1, POSITIONS), rng.random() < 0.6, 1,
+                          rng.randint(5, 120))
+                started = time.perf_counter()
+                if queue is None or not queue.submit(record):
+                    with db.connection() as conn:
+                        record_progress(conn, record[0], record[1], record[2], record[4])
+                        conn.commit()
+                samples.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(samples)
+
+        workers = [threading.Thread(target=client, args=(seed,)) for seed in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if queue is not None:
+            queue.close()  # chờ lượt cuối cùng commit
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(path)
+        recorded = conn.execute('SELECT COALESCE(SUM(attempts), 0) FROM user_progress').fetchone()[0]
+        conn.close()
+        db.close_all()
+
+        latencies.sort()
+        total = threads * writes
+        transactions = queue.metrics()['batches'] if queue is not None else total
+        print(f"   {mode:<5} {total / elapsed:>9,.0f} writes/s | request p50 {percentile(latencies, 0.5):7.3f} ms"
+              f"  p99 {percentile(latencies, 0.99):7.3f} ms | transactions {transactions:,}"
+              f" | recorded {recorded:,}/{total:,}")
+        if queue is not None:
+            metrics = queue.metrics()
+            print(f"         avg batch {metrics['avg_batch_size']}, max queue depth {metrics['max_depth']:,}, "
+                  f"commit p50 {metrics['commit_latency_p50_ms']} ms  p99 {metrics['commit_latency_p99_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='Số thread gửi đồng thời')
+    parser.add_argument('--writes', type=int, default=2000, help='Số lượt ghi mỗi thread')
+    args = parser.parse_args()
+
+    print(f"threads: {args.threads}, writes per thread: {args.writes:,}, cpus: {os.cpu_count()}")
+    for mode in ('sync', 'queue'):
+        run(mode, args.threads, args.writes)
+
+
+if __name__ == '__main__':
+    main()
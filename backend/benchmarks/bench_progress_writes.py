@@ -0,0 +1,170 @@
+"""
+Benchmark: ghi tiến độ đồng thời - 4 round trip cũ vs UPSERT
+
+Nhiều process ghi (giống nhiều gunicorn worker) cùng ghi lượt giải vào một
+database WAL. Đo thông lượng, thời gian giữ write lock (từ câu lệnh ghi đầu
+tiên đến khi commit xong), độ trễ mỗi transaction và số lượt thử được ghi
+nhận ở user_progress / user_stats so với số lượt đã gửi.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_progress_writes.py [--writers 8] [--writes 2000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.database import PRAGMAS  # noqa: E402
+from models.progress import record_progress  # noqa: E402
+
+USERS = 1000
+POSITIONS = 702
+
+
+def build_db(path: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript('''
+        CREATE TABLE user_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            position_id INTEGER NOT NULL,
+            solved BOOLEAN DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            time_spent INTEGER DEFAULT 0,
+            last_attempt TIMESTAMP,
+            UNIQUE(user_id, position_id)
+        );
+        CREATE TABLE user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_solved INTEGER DEFAULT 0,
+            total_attempts INTEGER DEFAULT 0,
+            success_rate REAL DEFAULT 0.0,
+            avg_time INTEGER DEFAULT 0,
+            streak INTEGER DEFAULT 0,
+            last_solved_date DATE
+        );
+    ''')
+    conn.executemany('INSERT INTO user_stats (user_id) VALUES (?)', [(i,) for i in range(1, USERS + 1)])
+    conn.commit()
+    conn.close()
+
+
+def legacy_record(conn, user_id, position_id, solved, time_spent):
+    """Đường ghi cũ của update_progress: SELECT rồi UPDATE/INSERT, 2 UPDATE user_stats"""
+    row = conn.execute('SELECT attempts FROM user_progress WHERE user_id = ? AND position_id = ?',
+                       (user_id, position_id)).fetchone()
+    lock_started = time.perf_counter()  # lệnh ghi đầu tiên => lấy write lock
+    if row:
+        conn.execute('''
+            UPDATE user_progress
+            SET solved = ?, attempts = ?, time_spent = time_spent + ?, last_attempt = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND position_id = ?
+        ''', (solved, row[0] + 1, time_spent, user_id, position_id))
+    else:
+        conn.execute('''
+            INSERT INTO user_progress (user_id, position_id, solved, attempts, time_spent, last_attempt)
+            VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
+        ''', (user_id, position_id, solved, time_spent))
+    if solved:
+        conn.execute('''
+            UPDATE user_stats
+            SET total_solved = total_solved + 1, total_attempts = total_attempts + 1,
+                last_solved_date = DATE('now')
+            WHERE user_id = ?
+        ''', (user_id,))
+        conn.execute('UPDATE user_stats SET success_rate = (total_solved * 100.0 / total_attempts) WHERE user_id = ?',
+                     (user_id,))
+    return lock_started
+
+
+def upsert_record(conn, user_id, position_id, solved, time_spent):
+    lock_started = time.perf_counter()
+    record_progress(conn, user_id, position_id, solved, time_spent)
+    return lock_started
+
+
+def writer(path: str, mode: str, writes: int, seed: int, results) -> None:
+    conn = sqlite3.connect(path, timeout=30)
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    record = legacy_record if mode == 'legacy' else upsert_record
+    rng = random.Random(seed)
+
+    holds, latencies, busy = [], [], 0
+    for _ in range(writes):
+        args = (rng.randint(1, USERS), rng.randint(1, POSITIONS), rng.random() < 0.6, rng.randint(5, 120))
+        while True:
+            started = time.perf_counter()
+            try:
+                lock_started = record(conn, *args)
+                conn.commit()
+                break
+            except sqlite3.OperationalError:  # database is locked
+                conn.rollback()
+                busy += 1
+        finished = time.perf_counter()
+        holds.append(finished - lock_started)
+        latencies.append(finished - started)
+    conn.close()
+    results.put((holds, latencies, busy))
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+
+def run(mode: str, writers: int, writes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_db(path)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer, args=(path, mode, writes, seed, results))
+                     for seed in range(writers)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        # Kế toán: mỗi lượt ghi phải được tính đúng một lần ở cả hai bảng
+        conn = sqlite3.connect(path)
+        progress_attempts = conn.execute('SELECT COALESCE(SUM(attempts), 0) FROM user_progress').fetchone()[0]
+        stats_attempts = conn.execute('SELECT COALESCE(SUM(total_attempts), 0) FROM user_stats').fetchone()[0]
+        conn.close()
+
+        holds = sorted(h for c in collected for h in c[0])
+        latencies = sorted(l for c in collected for l in c[1])
+        busy = sum(c[2] for c in collected)
+        total = writers * writes
+        print(f"   {mode:<7} {total / elapsed:>9,.0f} writes/s | lock hold p50 {percentile(holds, 0.5):6.3f} ms"
+              f"  p99 {percentile(holds, 0.99):6.3f} ms | txn p50 {percentile(latencies, 0.5):6.3f} ms"
+              f"  p99 {percentile(latencies, 0.99):7.3f} ms | busy retries {busy}")
+        print(f"           attempts recorded: user_progress {progress_attempts:,}/{total:,}, "
+              f"user_stats {stats_attempts:,}/{total:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8, help='Số process ghi đồng thời')
+    parser.add_argument('--writes', type=int, default=2000, help='Số lượt ghi mỗi process')
+    args = parser.parse_args()
+
+    print(f"writers: {args.writers}, writes per writer: {args.writes:,}, cpus: {os.cpu_count()}")
+    for mode in ('legacy', 'upsert'):
+        run(mode, args.writers, args.writes)
+
+
+if __name__ == '__main__':
+    main()
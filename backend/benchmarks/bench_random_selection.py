@@ -0,0 +1,108 @@
+"""
+Benchmark: ORDER BY RANDOM() vs RandomSelector
+
+So sánh truy vấn cũ của /api/positions/random với bộ chọn dựa trên mảng id
+dày đặc, ở 700, 100k và 1M positions.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_random_selection.py [--sizes 700,100000,1000000]
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.position import PositionCatalog  # noqa: E402
+from models.selection import RandomSelector  # noqa: E402
+
+FEN = 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3'
+
+
+def build_db(path: str, size: int) -> None:
+    """Tạo database giả lập với `size` positions"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE positions (
+            id INTEGER PRIMARY KEY,
+            fen TEXT NOT NULL,
+            solution TEXT,
+            difficulty TEXT,
+            source TEXT,
+            tags TEXT,
+            board_notation TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO positions (id, fen, solution, difficulty, source, tags) VALUES (?, ?, ?, ?, ?, ?)',
+        ((i, FEN, '1. Qh5', 'mate_in_2', 'bench', 'tactics,checkmate,puzzle') for i in range(1, size + 1))
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench_order_by_random(path: str, iterations: int) -> float:
+    """Thời gian trung bình (ms) của truy vấn cũ, gồm cả connect như get_db()"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute('''
+            SELECT id, fen, difficulty, tags
+            FROM positions
+            WHERE difficulty = ?
+            ORDER BY RANDOM()
+            LIMIT 1
+        ''', ('mate_in_2',)).fetchone()
+        conn.close()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def bench_selector(selector: RandomSelector, iterations: int, **kwargs) -> float:
+    """Thời gian trung bình (ms) của RandomSelector.pick"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        selector.pick('mate_in_2', **kwargs)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='700,100000,1000000')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'positions':>10} | {'ORDER BY RANDOM()':>18} | {'uniform':>10} | {'weighted':>10} | {'+exclude 50':>11} | {'speedup':>8}")
+    print('-' * 84)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(',')):
+            path = str(Path(tmp) / f'bench_{size}.db')
+            build_db(path, size)
+
+            catalog = PositionCatalog(path)
+            counts = {i: random.randint(0, 50) for i in range(1, size + 1, 3)}
+            selector = RandomSelector(catalog, solve_counts_loader=lambda: counts)
+            catalog.snapshot()  # nạp trước, không tính vào thời gian chọn
+            selector.pick('mate_in_2', weighted=True)
+
+            # ORDER BY RANDOM() rất chậm ở 1M, giới hạn số lần lặp
+            sql_iterations = max(5, min(2000, 2_000_000 // size))
+            sql_ms = bench_order_by_random(path, sql_iterations)
+            uniform_ms = bench_selector(selector, args.iterations)
+            weighted_ms = bench_selector(selector, args.iterations, weighted=True)
+            exclude = random.sample(range(1, size + 1), min(50, size))
+            exclude_ms = bench_selector(selector, args.iterations, weighted=True, exclude=exclude)
+
+            print(f"{size:>10,} | {sql_ms:>15.3f} ms | {uniform_ms * 1000:>7.2f} µs | "
+                  f"{weighted_ms * 1000:>7.2f} µs | {exclude_ms * 1000:>8.2f} µs | {sql_ms / uniform_ms:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
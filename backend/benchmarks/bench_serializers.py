@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: backend JSON cho từng endpoint
+
+Với mỗi endpoint GET: đo thời gian serialize body của nó bằng từng backend
+(json / ujson / orjson - backend nào đã cài) và thời gian cả request qua Flask
+test client khi app dùng backend đó.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_serializers.py [--iterations 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(BACKEND_DIR)  # DATABASE là đường dẫn tương đối
+
+import app as backend  # noqa: E402
+from utils import serializer  # noqa: E402
+
+ENDPOINTS = [
+    '/api/health',
+    '/api/positions/count',
+    '/api/positions/random',
+    '/api/positions/by-index/10',
+    '/api/positions/10',
+    '/api/positions/10/solution',
+    '/api/positions/batch?ids=' + ','.join(str(i) for i in range(1, 51)),
+    '/api/positions/batch?from=0&count=500',
+    '/api/packs/next?size=20',
+    '/api/leaderboard?limit=10',
+    '/api/stats/global',
+]
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """µs trung bình mỗi lần gọi"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) * 1e6 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    client = backend.app.test_client()
+    names = [name for name in serializer.PREFERENCE[::-1] if name in serializer.BACKENDS]
+    print(f"backends: {', '.join(names)} | iterations: {args.iterations:,}\n")
+
+    header = f"{'endpoint':<44} {'bytes':>7}"
+    for name in names:
+        header += f" | {name + ' dumps':>13} {name + ' req':>12}"
+    print(header)
+    print('-' * len(header))
+
+    for url in ENDPOINTS:
+        response = client.get(url)
+        if response.status_code != 200:
+            print(f"{url[:44]:<44} skipped (HTTP {response.status_code})")
+            continue
+        body = json.loads(response.get_data())
+
+        line = f"{url[:44]:<44} {len(response.get_data()):>7}"
+        for name in names:
+            serializer.use_backend(name)
+            dumps = serializer.BACKENDS[name].dumps
+            dumps_us = time_per_call(lambda: dumps(body), args.iterations)
+            request_us = time_per_call(lambda: client.get(url).get_data(), max(1, args.iterations // 10))
+            line += f" | {dumps_us:>10.2f} µs {request_us:>9.0f} µs"
+        print(line)
+
+    serializer.use_backend(None)
+
+
+if __name__ == '__main__':
+    main()
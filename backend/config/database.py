@@ -0,0 +1,212 @@
+"""
+Database Connection Manager
+Quản lý kết nối SQLite dùng lại theo thread cho mỗi gunicorn worker
+
+- Mỗi thread giữ một kết nối đã cấu hình PRAGMA (WAL, synchronous=NORMAL, mmap...)
+- Kết nối sống lâu => cache prepared statement của sqlite3 được tận dụng
+- Tự phát hiện fork (gunicorn) và bỏ các kết nối kế thừa từ tiến trình cha
+- Thống kê pool: số lần checkout, thời gian chờ, số kết nối đang dùng
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# PRAGMA áp dụng cho mọi kết nối mới
+PRAGMAS = {
+    'journal_mode': 'WAL',        # reader không chặn writer
+    'synchronous': 'NORMAL',      # an toàn với WAL, ít fsync hơn FULL
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -16000,         # ~16MB page cache (số âm = KiB)
+    'busy_timeout': 5000,         # ms chờ khi database đang bị khóa
+}
+
+# app.py dùng khoảng 20 câu SQL cố định => 64 đủ chỗ cho tất cả
+STATEMENT_CACHE_SIZE = 64
+
+
+class PooledConnection(sqlite3.Connection):
+    """Kết nối trong pool: close() trả kết nối về pool thay vì đóng thật"""
+
+    manager: Optional['ConnectionManager'] = None
+
+    def close(self):
+        if self.manager is not None:
+            self.manager.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        super().close()
+
+
+class ConnectionManager:
+    """
+    Pool kết nối SQLite theo thread
+
+    Args:
+        db_path: Đường dẫn file SQLite
+        max_connections: Giới hạn số kết nối được checkout cùng lúc (None = không giới hạn)
+        pragmas: PRAGMA áp dụng khi mở kết nối
+    """
+
+    def __init__(self, db_path: str, max_connections: Optional[int] = None,
+                 pragmas: Dict = None):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._slots = threading.BoundedSemaphore(self.max_connections) if self.max_connections else None
+        self._connections = weakref.WeakSet()
+        self._metrics = {
+            'checkouts': 0,
+            'connects': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'wait_time_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'health_checks': 0,
+            'fork_resets': 0
+        }
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            factory=PooledConnection,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            # Kết nối vẫn gắn với một thread (thread-local), nhưng close_all() lúc
+            # shutdown đóng cả kết nối của các thread nền (vd. writer của hàng đợi tiến độ)
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row  # Trả về dict thay vì tuple
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.manager = self
+        with self._lock:
+            self._connections.add(conn)
+            self._metrics['connects'] += 1
+        return conn
+
+    def _check_fork(self) -> None:
+        """Sau fork, kết nối kế thừa không được dùng (cũng không được đóng)"""
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    fork_resets = self._metrics['fork_resets']
+                    self._reset_state()
+                    self._metrics['fork_resets'] = fork_resets + 1
+
+    def acquire(self) -> PooledConnection:
+        """Lấy kết nối của thread hiện tại (mở mới nếu chưa có)"""
+        self._check_fork()
+
+        depth = getattr(self._local, 'depth', 0)
+        waited = 0.0
+        if depth == 0 and self._slots is not None:
+            started = time.perf_counter()
+            self._slots.acquire()
+            waited = (time.perf_counter() - started) * 1000
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                if depth == 0 and self._slots is not None:
+                    self._slots.release()
+                raise
+            self._local.conn = conn
+        self._local.depth = depth + 1
+
+        with self._lock:
+            m = self._metrics
+            m['checkouts'] += 1
+            m['wait_time_ms'] += waited
+            m['max_wait_ms'] = max(m['max_wait_ms'], waited)
+            if depth == 0:
+                m['in_use'] += 1
+                m['peak_in_use'] = max(m['peak_in_use'], m['in_use'])
+        return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        """Trả kết nối về pool; rollback nếu còn transaction dang dở"""
+        if getattr(self._local, 'conn', None) is not conn or not getattr(self._local, 'depth', 0):
+            return
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._metrics['in_use'] -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def release_current(self) -> None:
+        """Trả mọi checkout còn sót của thread hiện tại (gọi khi kết thúc request)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or os.getpid() != self._pid:
+            return
+        if getattr(self._local, 'depth', 0) > 1:
+            self._local.depth = 1
+        self.release(conn)
+
+    @contextmanager
+    def connection(self):
+        """with db.connection() as conn: ..."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def health_check(self) -> Dict:
+        """Kiểm tra kết nối hoạt động và PRAGMA đã được áp dụng"""
+        started = time.perf_counter()
+        with self.connection() as conn:
+            conn.execute('SELECT 1').fetchone()
+            journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        with self._lock:
+            self._metrics['health_checks'] += 1
+        return {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'journal_mode': journal_mode,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def after_fork(self) -> Dict:
+        """Gọi từ hook post_fork của gunicorn: bỏ kết nối kế thừa và kiểm tra sức khỏe"""
+        self._check_fork()
+        return self.health_check()
+
+    def metrics(self) -> Dict:
+        """Thống kê pool của worker hiện tại"""
+        with self._lock:
+            result = dict(self._metrics)
+            result['open_connections'] = len(self._connections)
+        result['pid'] = os.getpid()
+        result['max_connections'] = self.max_connections
+        result['avg_wait_ms'] = round(result['wait_time_ms'] / result['checkouts'], 4) if result['checkouts'] else 0.0
+        result['wait_time_ms'] = round(result['wait_time_ms'], 3)
+        result['max_wait_ms'] = round(result['max_wait_ms'], 3)
+        return result
+
+    def close_all(self) -> None:
+        """Đóng mọi kết nối của tiến trình hiện tại (dùng khi shutdown)"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            conn.close_for_real()
+        self._local = threading.local()
@@ -0,0 +1,404 @@
+"""
+Schema Migrations
+Migration có version, chạy khi khởi động (mọi gunicorn worker, chỉ một worker thực sự áp dụng)
+
+- schema_migrations ghi lại version đã áp dụng; migration mới chỉ cần thêm vào MIGRATIONS
+- Toàn bộ migration còn thiếu chạy trong MỘT transaction BEGIN IMMEDIATE => worker
+  khác chờ lock rồi thấy đã áp dụng; lỗi giữa chừng thì rollback hết
+- Mỗi migration khai báo các truy vấn nóng + index chúng phải dùng; EXPLAIN QUERY PLAN
+  được kiểm tra sau khi áp dụng (cảnh báo) và bằng `--check` (exit code 1 nếu sai)
+
+CLI (từ thư mục backend):
+    python -m config.migrations [data/chess_puzzles.db] [--check] [--status]
+"""
+
+import argparse
+import sqlite3
+import sys
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+
+from models.stats import rollup
+
+
+class QueryPlan(NamedTuple):
+    """Truy vấn phải dùng `index` và không được sắp xếp bằng TEMP B-TREE"""
+    query: str
+    params: Tuple
+    index: str
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+    plans: Sequence[QueryPlan] = ()
+
+
+def columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def rename_or_add(conn: sqlite3.Connection, table: str, column: str, legacy: Sequence[str], decl: str) -> None:
+    """Đảm bảo `column` tồn tại: đổi tên từ cột cũ nếu có (giữ dữ liệu), không thì thêm mới"""
+    existing = columns(conn, table)
+    if column in existing:
+        return
+    for old in legacy:
+        if old in existing:
+            conn.execute(f'ALTER TABLE {table} RENAME COLUMN {old} TO {column}')
+            return
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+
+# ==================== MIGRATIONS ====================
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    """Các bảng gốc (trước đây do init_db tạo)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS positions (
+        id INTEGER PRIMARY KEY,
+        fen TEXT NOT NULL,
+        solution TEXT,
+        difficulty TEXT,
+        source TEXT,
+        tags TEXT,
+        strategy TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        position_id INTEGER NOT NULL,
+        solved BOOLEAN DEFAULT 0,
+        attempts INTEGER DEFAULT 0,
+        time_spent INTEGER DEFAULT 0,
+        last_attempt TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (position_id) REFERENCES positions(id),
+        UNIQUE(user_id, position_id)
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_solved INTEGER DEFAULT 0,
+        total_attempts INTEGER DEFAULT 0,
+        success_rate REAL DEFAULT 0.0,
+        avg_time INTEGER DEFAULT 0,
+        streak INTEGER DEFAULT 0,
+        last_solved_date DATE,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    ''')
+
+
+def _reconcile_columns(conn: sqlite3.Connection) -> None:
+    """
+    Sửa schema lệch giữa các nguồn tạo database:
+    - positions: parser (_save_to_sqlite) ghi `strategy`, init_db cũ khai báo
+      `board_notation` (không code nào đọc) => thống nhất về `strategy`
+    - user_stats: database tạo bởi bản cũ dùng puzzles_solved / average_time /
+      current_streak, code dùng total_solved / avg_time / streak => đổi tên, giữ dữ liệu
+    """
+    rename_or_add(conn, 'positions', 'strategy', ('board_notation',), 'TEXT')
+    rename_or_add(conn, 'user_stats', 'total_solved', ('puzzles_solved',), 'INTEGER DEFAULT 0')
+    rename_or_add(conn, 'user_stats', 'avg_time', ('average_time',), 'INTEGER DEFAULT 0')
+    rename_or_add(conn, 'user_stats', 'streak', ('current_streak',), 'INTEGER DEFAULT 0')
+    for column in ('total_attempts', 'success_rate', 'last_solved_date'):
+        if column not in columns(conn, 'user_stats'):
+            decl = {'total_attempts': 'INTEGER DEFAULT 0', 'success_rate': 'REAL DEFAULT 0.0',
+                    'last_solved_date': 'DATE'}[column]
+            conn.execute(f'ALTER TABLE user_stats ADD COLUMN {column} {decl}')
+
+
+def _performance_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_positions_difficulty_id ON positions(difficulty, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_progress_user_last_attempt '
+                 'ON user_progress(user_id, last_attempt)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_progress_solved_position '
+                 'ON user_progress(position_id) WHERE solved = 1')
+
+
+def _catalog_version(conn: sqlite3.Connection) -> None:
+    """
+    Bộ đếm version của riêng bảng positions (trigger tăng sau mọi insert/update/delete)
+
+    PositionCatalog so sánh số này thay cho mtime của file database => ghi vào
+    user_progress / user_stats / users không làm các worker nạp lại catalog.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_positions_{event.lower()}_version
+        AFTER {event} ON positions
+        BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+        ''')
+
+
+def _leaderboard_log(conn: sqlite3.Connection) -> None:
+    """
+    Log thay đổi điểm cho Leaderboard (models/leaderboard.py) + index thứ hạng
+
+    Trigger có ngay khi migrate => mọi lượt ghi user_stats đều vào log, kể cả trước
+    khi worker nào phục vụ /api/leaderboard.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS leaderboard_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_rank '
+                 'ON user_stats(total_solved DESC, success_rate DESC, user_id)')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_leaderboard_insert AFTER INSERT ON user_stats
+    BEGIN
+        INSERT INTO leaderboard_log (user_id) VALUES (NEW.user_id);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_leaderboard_update AFTER UPDATE ON user_stats
+    WHEN OLD.total_solved IS NOT NEW.total_solved OR OLD.success_rate IS NOT NEW.success_rate
+         OR OLD.streak IS NOT NEW.streak
+    BEGIN
+        INSERT INTO leaderboard_log (user_id) VALUES (NEW.user_id);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_leaderboard_delete AFTER DELETE ON user_stats
+    BEGIN
+        INSERT INTO leaderboard_log (user_id) VALUES (OLD.user_id);
+    END
+    ''')
+
+
+def _ingest_checkpoints(conn: sqlite3.Connection) -> None:
+    """Seq cuối đã commit của từng journal tiến độ (ProgressIngestQueue, models/ingest.py)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+        journal TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL
+    )
+    ''')
+
+
+def _global_counters(conn: sqlite3.Connection) -> None:
+    """
+    Bộ đếm vật chất hóa cho /api/stats/global (models/stats.py)
+
+    Trigger và rollup lần đầu nằm trong cùng transaction của migrate() => không
+    lượt ghi nào lọt vào giữa, bộ đếm khớp bảng gốc ngay từ đầu.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS global_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS position_solve_counts (
+        position_id INTEGER PRIMARY KEY,
+        solve_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_position_solve_counts_rank '
+                 'ON position_solve_counts(solve_count DESC, position_id)')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_user_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE global_counters SET value = value + 1 WHERE name = 'users';
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_user_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE global_counters SET value = value - 1 WHERE name = 'users';
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_progress_insert AFTER INSERT ON user_progress
+    WHEN NEW.solved = 1
+    BEGIN
+        INSERT INTO position_solve_counts (position_id, solve_count) VALUES (NEW.position_id, 1)
+        ON CONFLICT(position_id) DO UPDATE SET solve_count = solve_count + 1;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_progress_update AFTER UPDATE OF solved ON user_progress
+    WHEN (OLD.solved = 1) IS NOT (NEW.solved = 1)
+    BEGIN
+        INSERT INTO position_solve_counts (position_id, solve_count)
+        VALUES (NEW.position_id, CASE WHEN NEW.solved = 1 THEN 1 ELSE 0 END)
+        ON CONFLICT(position_id) DO UPDATE
+        SET solve_count = solve_count + CASE WHEN NEW.solved = 1 THEN 1 ELSE -1 END;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_progress_delete AFTER DELETE ON user_progress
+    WHEN OLD.solved = 1
+    BEGIN
+        UPDATE position_solve_counts SET solve_count = solve_count - 1 WHERE position_id = OLD.position_id;
+    END
+    ''')
+    rollup(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'initial_schema', _initial_schema),
+    Migration(2, 'reconcile_columns', _reconcile_columns),
+    Migration(3, 'performance_indexes', _performance_indexes, plans=(
+        # Danh sách id theo difficulty (catalog / random selector)
+        QueryPlan('SELECT id FROM positions WHERE difficulty = ? ORDER BY id',
+                  ('mate_in_2',), 'idx_positions_difficulty_id'),
+        # 5 lượt gần nhất của user (/api/users/<id>/stats)
+        QueryPlan('''SELECT p.id, p.fen, up.solved, up.attempts, up.last_attempt
+                     FROM user_progress up JOIN positions p ON up.position_id = p.id
+                     WHERE up.user_id = ? ORDER BY up.last_attempt DESC LIMIT 5''',
+                  (1,), 'idx_user_progress_user_last_attempt'),
+        # Số lần giải mỗi position (trọng số random, rollup thống kê)
+        QueryPlan('''SELECT position_id, COUNT(*) FROM user_progress
+                     WHERE solved = 1 GROUP BY position_id''',
+                  (), 'idx_user_progress_solved_position'),
+    )),
+    Migration(4, 'catalog_version', _catalog_version),
+    Migration(5, 'leaderboard_log', _leaderboard_log, plans=(
+        # Nạp bảng xếp hạng theo đúng thứ hạng (Leaderboard._load)
+        QueryPlan('''SELECT s.user_id, u.username, s.total_solved, s.success_rate, s.streak
+                     FROM user_stats s JOIN users u ON s.user_id = u.id
+                     ORDER BY s.total_solved DESC, s.success_rate DESC, s.user_id''',
+                  (), 'idx_user_stats_rank'),
+    )),
+    Migration(6, 'ingest_checkpoints', _ingest_checkpoints, plans=(
+        # Checkpoint của journal khi phát lại (ProgressIngestQueue._replay)
+        QueryPlan('SELECT seq FROM ingest_checkpoints WHERE journal = ?',
+                  ('journal',), 'sqlite_autoindex_ingest_checkpoints_1'),
+    )),
+    Migration(7, 'global_counters', _global_counters, plans=(
+        # "Most solved" của /api/stats/global: đọc vài dòng đầu của index
+        QueryPlan('''SELECT position_id, solve_count FROM position_solve_counts
+                     WHERE solve_count > 0 ORDER BY solve_count DESC, position_id LIMIT ?''',
+                  (5,), 'idx_position_solve_counts_rank'),
+        QueryPlan("SELECT value FROM global_counters WHERE name = 'users'",
+                  (), 'sqlite_autoindex_global_counters_1'),
+    )),
+]
+
+
+# ==================== RUNNER ====================
+
+def applied_versions(conn: sqlite3.Connection) -> List[int]:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return [row[0] for row in conn.execute('SELECT version FROM schema_migrations ORDER BY version')]
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[Migration] = MIGRATIONS) -> List[Migration]:
+    """
+    Áp dụng các migration chưa chạy, trong một transaction
+
+    Returns:
+        Các migration vừa được áp dụng (rỗng nếu database đã mới nhất)
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        done = set(applied_versions(conn))
+        pending = [m for m in sorted(migrations, key=lambda m: m.version) if m.version not in done]
+        for migration in pending:
+            migration.apply(conn)
+            conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)',
+                         (migration.version, migration.name))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if pending:
+        conn.execute('PRAGMA optimize')
+    return pending
+
+
+def explain(conn: sqlite3.Connection, plan: QueryPlan) -> List[str]:
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {plan.query}', plan.params)]
+
+
+def check_plans(conn: sqlite3.Connection, migrations: Sequence[Migration] = MIGRATIONS) -> List[str]:
+    """
+    Kiểm tra EXPLAIN QUERY PLAN của các truy vấn mà migration khai báo
+
+    Returns:
+        Danh sách lỗi (rỗng nếu mọi truy vấn dùng đúng index)
+    """
+    failures = []
+    for migration in migrations:
+        for plan in migration.plans:
+            details = explain(conn, plan)
+            query = ' '.join(plan.query.split())
+            if not any(plan.index in detail for detail in details):
+                failures.append(f"#{migration.version} {migration.name}: '{query}' does not use "
+                                f"{plan.index} ({'; '.join(details)})")
+            elif any('USE TEMP B-TREE' in detail for detail in details):
+                failures.append(f"#{migration.version} {migration.name}: '{query}' sorts with a temp "
+                                f"b-tree ({'; '.join(details)})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply schema migrations and check query plans')
+    parser.add_argument('database', nargs='?', default='data/chess_puzzles.db', help='SQLite database')
+    parser.add_argument('--check', action='store_true', help='Fail if a hot query does not use its index')
+    parser.add_argument('--status', action='store_true', help='Only show applied / pending migrations')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.status:
+            done = set(applied_versions(conn))
+            conn.commit()
+            for migration in MIGRATIONS:
+                mark = '✅' if migration.version in done else '⏳'
+                print(f"{mark} {migration.version:03d} {migration.name}")
+            return
+
+        applied = migrate(conn)
+        for migration in applied:
+            print(f"✅ Applied migration {migration.version:03d} {migration.name}")
+        if not applied:
+            print("✅ Database schema is up to date")
+
+        if args.check:
+            failures = check_plans(conn)
+            for failure in failures:
+                print(f"❌ {failure}")
+            if failures:
+                sys.exit(1)
+            print(f"✅ {sum(len(m.plans) for m in MIGRATIONS)} query plans use their indexes")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+Cấu hình gunicorn (tự động được nạp khi chạy `gunicorn app:app` trong thư mục backend)
+"""
+
+
+def post_fork(server, worker):
+    """Mỗi worker mới: bỏ kết nối kế thừa từ master và kiểm tra database"""
+    from app import db
+
+    status = db.after_fork()
+    server.log.info(f"Worker {worker.pid} database health: {status}")
+
+
+def worker_exit(server, worker):
+    """Ghi tiến độ các session còn mở, xả hàng đợi tiến độ rồi đóng các kết nối của worker"""
+    from app import db, progress_queue, sessions
+
+    sessions.close()
+    if progress_queue is not None:
+        progress_queue.close()
+    db.close_all()
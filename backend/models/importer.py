@@ -0,0 +1,226 @@
+"""
+Position Importer
+Import positions dạng stream: đọc NDJSON từng dòng, ghi bằng executemany theo lô
+
+- Bộ nhớ không đổi: chỉ giữ một lô (BATCH_ROWS dòng) tại một thời điểm
+- Mỗi lô một transaction ngắn => worker khác vẫn ghi được giữa các lô
+- mode 'insert': id đã có bị bỏ qua (skipped); mode 'replace': id đã có được
+  cập nhật (UPSERT - giữ nguyên dòng nên user_progress vẫn trỏ đúng position)
+- dry_run: đọc, kiểm tra và đếm như thật nhưng không ghi gì
+- Đếm chính xác inserted / updated / skipped / failed bằng cách tra id đã có trước mỗi lô
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.serializer import loads
+
+BATCH_ROWS = 5000
+# Lô tra id đã có: dưới giới hạn số tham số của SQLite
+LOOKUP_CHUNK = 900
+# Số lỗi chi tiết trả về (tổng số lỗi vẫn được đếm đủ)
+MAX_ERRORS = 20
+# Import nhỏ: cập nhật catalog tại chỗ; lớn hơn thì để catalog nạp lại
+CATALOG_APPLY_LIMIT = 1000
+
+MODES = ('insert', 'replace')
+
+INSERT_SQL = '''
+    INSERT OR IGNORE INTO positions (id, fen, solution, difficulty, source, tags)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+REPLACE_SQL = '''
+    INSERT INTO positions (id, fen, solution, difficulty, source, tags)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        fen = excluded.fen,
+        solution = excluded.solution,
+        difficulty = excluded.difficulty,
+        source = excluded.source,
+        tags = excluded.tags
+'''
+
+PositionRow = Tuple[int, str, str, str, str, str]
+
+RANK_PIECES = frozenset('pnbrqkPNBRQK')
+RANK_DIGITS = {str(n): n for n in range(1, 9)}
+
+
+def check_fen(fen: str) -> None:
+    """
+    Kiểm tra cấu trúc FEN (8 hàng, mỗi hàng đủ 8 ô, lượt đi w/b); ValueError nếu sai
+
+    Rẻ hơn nhiều so với chess.Board(fen) - importer gọi hàm này cho từng dòng
+    """
+    fields = fen.split()
+    if len(fields) < 2 or fields[1] not in ('w', 'b'):
+        raise ValueError('fen: side to move must be w or b')
+    ranks = fields[0].split('/')
+    if len(ranks) != 8:
+        raise ValueError('fen: expected 8 ranks')
+    for rank in ranks:
+        width = 0
+        for ch in rank:
+            if ch in RANK_PIECES:
+                width += 1
+            elif ch in RANK_DIGITS:
+                width += RANK_DIGITS[ch]
+            else:
+                raise ValueError(f'fen: invalid character {ch!r}')
+        if width != 8:
+            raise ValueError('fen: each rank must have 8 squares')
+
+
+def _optional_str(pos: Dict, key: str, default: str) -> str:
+    value = pos.get(key)
+    if value is None or value == '':
+        return default
+    if type(value) is not str:
+        raise ValueError(f'{key} must be a string')
+    return value
+
+
+def to_row(pos) -> PositionRow:
+    """Dict position -> tuple cột; ValueError nếu thiếu / sai kiểu"""
+    if type(pos) is not dict:
+        raise ValueError('expected a JSON object')
+    pos_id, fen, tags = pos.get('id'), pos.get('fen'), pos.get('tags')
+    if type(pos_id) is not int:  # loại cả bool
+        raise ValueError('id must be an integer')
+    if type(fen) is not str or not fen.strip():
+        raise ValueError('fen required')
+    check_fen(fen)
+    if tags is None:
+        tags = ''
+    elif type(tags) is list:
+        if any(type(tag) is not str for tag in tags):
+            raise ValueError('tags must be strings')
+        tags = ','.join(tags)
+    elif type(tags) is not str:
+        raise ValueError('tags must be a string or a list of strings')
+    return (pos_id, fen, _optional_str(pos, 'solution', ''), _optional_str(pos, 'difficulty', 'mate_in_2'),
+            _optional_str(pos, 'source', ''), tags)
+
+
+def iter_ndjson(lines: Iterable[bytes]) -> Iterable[Tuple[int, Optional[object], Optional[str]]]:
+    """(số dòng, object, lỗi) cho từng dòng khác rỗng của stream NDJSON"""
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, loads(line), None
+        except ValueError as e:
+            yield line_no, None, f'invalid JSON: {e}'
+
+
+class PositionImporter:
+    """
+    Import một stream positions vào database
+
+    Args:
+        conn: Kết nối database (importer tự commit theo lô)
+        mode: 'insert' (bỏ qua id đã có) hoặc 'replace' (cập nhật id đã có)
+        dry_run: Chỉ đếm, không ghi
+        batch_rows: Số dòng mỗi lô / transaction
+    """
+
+    def __init__(self, conn: sqlite3.Connection, mode: str = 'insert', dry_run: bool = False,
+                 batch_rows: int = BATCH_ROWS):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}')
+        self.conn = conn
+        self.mode = mode
+        self.dry_run = dry_run
+        self.batch_rows = batch_rows
+        self.counts = {'total': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        self.errors: List[Dict] = []
+        # Dòng đã ghi, để cập nhật catalog; None khi vượt CATALOG_APPLY_LIMIT
+        self.changed_rows: Optional[List[Dict]] = []
+        self._batch: List[PositionRow] = []
+
+    def _fail(self, line_no: int, error: str) -> None:
+        self.counts['failed'] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line_no, 'error': error})
+
+    def add(self, line_no: int, pos, error: Optional[str] = None) -> None:
+        """Thêm một position (hoặc ghi nhận dòng lỗi); tự flush khi đủ lô"""
+        self.counts['total'] += 1
+        if error is None:
+            try:
+                self._batch.append(to_row(pos))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            self._fail(line_no, error)
+        if len(self._batch) >= self.batch_rows:
+            self.flush()
+
+    def _existing_ids(self, ids: List[int]) -> set:
+        existing = set()
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in self.conn.execute(
+                f'SELECT id FROM positions WHERE id IN ({placeholders})', chunk))
+        return existing
+
+    def flush(self) -> None:
+        """Ghi lô hiện tại trong một transaction"""
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        if not self.dry_run:
+            # Tra id và ghi trong cùng transaction ghi => worker khác không chen vào giữa
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute('BEGIN IMMEDIATE')
+        # Phân loại trước khi ghi: id đã có (trong DB hoặc xuất hiện sớm hơn trong lô)
+        existing = self._existing_ids(sorted({row[0] for row in batch}))
+        seen = set()
+        written = []
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        for row in batch:
+            known = row[0] in existing or row[0] in seen
+            seen.add(row[0])
+            if not known:
+                counts['inserted'] += 1
+                written.append(row)
+            elif self.mode == 'replace':
+                counts['updated'] += 1
+                written.append(row)
+            else:
+                counts['skipped'] += 1
+
+        if not self.dry_run:
+            try:
+                if written:
+                    self.conn.executemany(REPLACE_SQL if self.mode == 'replace' else INSERT_SQL, written)
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+        # Chỉ cộng sau khi lô đã commit => số đếm luôn khớp với database
+        for name, value in counts.items():
+            self.counts[name] += value
+        if self.dry_run:
+            return
+
+        if self.changed_rows is not None:
+            if len(self.changed_rows) + len(written) > CATALOG_APPLY_LIMIT:
+                self.changed_rows = None
+            else:
+                self.changed_rows.extend(
+                    {'id': r[0], 'fen': r[1], 'solution': r[2], 'difficulty': r[3], 'tags': r[5]}
+                    for r in written)
+
+    def finish(self) -> Dict:
+        """Flush lô cuối và trả về kết quả"""
+        self.flush()
+        return {
+            **self.counts,
+            'mode': self.mode,
+            'dry_run': self.dry_run,
+            'errors': self.errors
+        }
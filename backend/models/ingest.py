@@ -0,0 +1,312 @@
+"""
+Progress Ingestion Queue
+Ghi tiến độ kiểu write-behind: endpoint chỉ xếp hàng rồi trả về ngay
+
+- Mỗi lượt giải được ghi nối vào journal cục bộ (append-only) trước khi vào hàng đợi
+- Một writer thread gom hàng đợi thành group commit: mỗi FLUSH_INTERVAL giây
+  hoặc khi đủ MAX_BATCH lượt, tất cả trong một transaction
+- Cùng transaction đó lưu checkpoint (journal, seq cuối cùng đã ghi) => khi worker
+  chết, worker khác phát lại phần journal chưa commit đúng một lần
+- close() xả hết hàng đợi (gọi khi gunicorn worker thoát)
+
+Mỗi worker có journal riêng và giữ flock trên nó; journal không còn ai giữ lock
+là của worker đã chết và được phát lại khi worker khác khởi động writer.
+Bảng ingest_checkpoints do migration 006 tạo (config/migrations.py).
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.database import ConnectionManager
+from models.progress import ProgressRecord, record_many
+
+try:
+    import fcntl  # Unix; trên Windows chỉ phát lại journal của pid không còn chạy
+except ImportError:
+    fcntl = None
+
+FLUSH_INTERVAL = 0.05  # giây
+MAX_BATCH = 500
+# Hàng đợi đầy => submit() trả False và caller ghi đồng bộ
+MAX_QUEUE = 100000
+# Journal lớn hơn ngưỡng này được cắt về 0 khi mọi thứ đã commit
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+RETRY_DELAY = 0.5
+
+CHECKPOINT_UPSERT = '''
+    INSERT INTO ingest_checkpoints (journal, seq) VALUES (?, ?)
+    ON CONFLICT(journal) DO UPDATE SET seq = MAX(seq, excluded.seq)
+'''
+
+
+def read_journal(path: Path) -> List[Tuple[int, ProgressRecord]]:
+    """Các lượt trong journal; dòng cuối ghi dở (crash giữa chừng) bị bỏ qua"""
+    entries = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                seq, payload = line.split(b'\t', 1)
+                entries.append((int(seq), tuple(json.loads(payload))))
+            except ValueError:
+                continue
+    return entries
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class ProgressIngestQueue:
+    """
+    Hàng đợi ghi tiến độ với journal và group commit
+
+    Args:
+        db: ConnectionManager của database đích
+        journal_dir: Thư mục chứa journal của các worker
+        flush_interval: Thời gian tối đa một lượt nằm trong hàng đợi (giây)
+        max_batch: Số lượt tối đa mỗi transaction
+        fsync: fsync journal sau mỗi lượt (chống mất điện; mặc định chỉ chống crash process)
+    """
+
+    def __init__(self, db: ConnectionManager, journal_dir: str, flush_interval: float = FLUSH_INTERVAL,
+                 max_batch: int = MAX_BATCH, max_queue: int = MAX_QUEUE, fsync: bool = False):
+        self.db = db
+        self.journal_dir = Path(journal_dir)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.fsync = fsync
+
+        self._cond = threading.Condition()
+        self._buffer: deque = deque()
+        self._seq = 0
+        self._pid = None
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._journal_id = None
+        self._journal_fd = None
+        self._latencies = deque(maxlen=10000)
+        self._metrics = {'submitted': 0, 'committed': 0, 'batches': 0, 'rejected': 0,
+                         'commit_errors': 0, 'replayed': 0, 'max_depth': 0, 'last_batch_size': 0}
+
+    # ---------- vòng đời ----------
+
+    def _ensure_started(self):
+        """Mở journal và khởi động writer thread (lười, một lần cho mỗi process)"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # Sau fork: bỏ trạng thái kế thừa từ process cha
+            self._buffer.clear()
+            self._closing = False
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+
+            self._journal_id = f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+            path = self.journal_dir / f'{self._journal_id}.journal'
+            self._journal_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._journal_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._seq = 0
+            self._pid = os.getpid()
+
+            self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+            self._thread.start()
+        self.recover()
+
+    def close(self, timeout: float = 10.0):
+        """Xả hết hàng đợi rồi dừng writer (flush-on-shutdown)"""
+        if self._pid != os.getpid() or self._thread is None or self._closing:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+        with self._cond:
+            if self._thread.is_alive():
+                # Writer còn giữ một batch đã lấy khỏi buffer nhưng chưa commit => giữ journal
+                # (và lock của nó tới khi process thoát) để worker khác phát lại theo checkpoint
+                print(f"⚠️  Progress writer still busy after {timeout}s - journal kept for replay")
+                return
+            drained = not self._buffer
+            if self._journal_fd is not None:
+                os.close(self._journal_fd)
+                self._journal_fd = None
+        if drained:
+            # Mọi lượt đã commit => journal và checkpoint không còn cần
+            self._discard_journal(self._journal_id)
+
+    # ---------- ghi ----------
+
+    def submit(self, record: ProgressRecord) -> bool:
+        """
+        Xếp hàng một lượt giải (đã ghi journal khi hàm trả về)
+
+        Returns:
+            False nếu hàng đợi đầy - caller nên ghi đồng bộ
+        """
+        self._ensure_started()
+        with self._cond:
+            if len(self._buffer) >= self.max_queue or self._closing:
+                self._metrics['rejected'] += 1
+                return False
+            self._seq += 1
+            line = f"{self._seq}\t{json.dumps(list(record), separators=(',', ':'))}\n".encode('utf-8')
+            os.write(self._journal_fd, line)
+            if self.fsync:
+                os.fsync(self._journal_fd)
+            self._buffer.append((self._seq, record))
+            self._metrics['submitted'] += 1
+            depth = len(self._buffer)
+            if depth > self._metrics['max_depth']:
+                self._metrics['max_depth'] = depth
+            if depth == 1 or depth >= self.max_batch:
+                self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if not self._buffer and self._closing:
+                    return
+                # Gom thêm trong cửa sổ group commit
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._buffer) < self.max_batch and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+
+            if not self._commit(self._journal_id, batch):
+                with self._cond:
+                    self._buffer.extendleft(reversed(batch))
+                    if self._closing:
+                        return  # đang shutdown: journal giữ lại, worker sau sẽ phát lại
+                time.sleep(RETRY_DELAY)
+                continue
+            self._maybe_compact()
+
+    def _commit(self, journal_id: str, batch: List[Tuple[int, ProgressRecord]]) -> bool:
+        started = time.perf_counter()
+        try:
+            with self.db.connection() as conn:
+                record_many(conn, (record for _, record in batch))
+                conn.execute(CHECKPOINT_UPSERT, (journal_id, batch[-1][0]))
+                conn.commit()
+        except Exception as e:
+            with self._cond:
+                self._metrics['commit_errors'] += 1
+            print(f"⚠️  Progress group commit failed ({len(batch)} events): {e}")
+            return False
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self._latencies.append(elapsed)
+            self._metrics['committed'] += len(batch)
+            self._metrics['batches'] += 1
+            self._metrics['last_batch_size'] = len(batch)
+        return True
+
+    def _maybe_compact(self):
+        """Cắt journal về 0 khi không còn lượt nào chưa commit"""
+        with self._cond:
+            if self._buffer or self._journal_fd is None:
+                return
+            if os.fstat(self._journal_fd).st_size >= JOURNAL_COMPACT_BYTES:
+                os.ftruncate(self._journal_fd, 0)
+
+    # ---------- phát lại journal của worker đã chết ----------
+
+    def recover(self) -> int:
+        """Phát lại các journal mồ côi; trả về số lượt đã ghi lại"""
+        replayed = 0
+        for path in sorted(self.journal_dir.glob('*.journal')):
+            journal_id = path.stem
+            if journal_id == self._journal_id:
+                continue
+            fd = self._claim(path)
+            if fd is None:
+                continue
+            try:
+                replayed += self._replay(journal_id, path)
+            finally:
+                os.close(fd)
+        if replayed:
+            with self._cond:
+                self._metrics['replayed'] += replayed
+            print(f"♻️  Replayed {replayed} progress events from orphaned journals")
+        return replayed
+
+    def _claim(self, path: Path) -> Optional[int]:
+        """Giữ journal nếu worker sở hữu đã chết; None nếu đang có người dùng"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+                return None
+        pid = int(path.stem.split('-', 1)[0]) if path.stem.split('-', 1)[0].isdigit() else -1
+        if pid > 0 and _pid_alive(pid):
+            os.close(fd)
+            return None
+        return fd
+
+    def _replay(self, journal_id: str, path: Path) -> int:
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT seq FROM ingest_checkpoints WHERE journal = ?', (journal_id,)).fetchone()
+        done = row[0] if row else 0
+        pending = [entry for entry in read_journal(path) if entry[0] > done]
+        for start in range(0, len(pending), self.max_batch):
+            if not self._commit(journal_id, pending[start:start + self.max_batch]):
+                return start  # giữ journal lại cho lần sau
+        self._discard_journal(journal_id)
+        return len(pending)
+
+    def _discard_journal(self, journal_id: Optional[str]):
+        if journal_id is None:
+            return
+        try:
+            (self.journal_dir / f'{journal_id}.journal').unlink()
+        except FileNotFoundError:
+            pass
+        with self.db.connection() as conn:
+            conn.execute('DELETE FROM ingest_checkpoints WHERE journal = ?', (journal_id,))
+            conn.commit()
+
+    # ---------- metrics ----------
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            result = dict(self._metrics)
+            result['queue_depth'] = len(self._buffer)
+            samples = sorted(self._latencies)
+            result['journal_bytes'] = os.fstat(self._journal_fd).st_size if self._journal_fd is not None else 0
+        result['avg_batch_size'] = round(result['committed'] / result['batches'], 1) if result['batches'] else 0.0
+        for name, q in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+            value = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+            result[f'commit_latency_{name}_ms'] = round(value, 3)
+        return result
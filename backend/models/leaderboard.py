@@ -0,0 +1,292 @@
+"""
+Leaderboard
+Bảng xếp hạng trong RAM, cập nhật tăng dần thay vì sắp xếp lại mọi user mỗi request
+
+- RankIndex: danh sách có thứ tự chia bucket + cây Fenwick trên kích thước bucket
+  => thêm/xóa, rank(key) và select(k) đều O(log n)
+- Trigger trên user_stats ghi user_id vào leaderboard_log mỗi khi điểm đổi (mọi đường
+  ghi: update_progress, hàng đợi tiến độ, session...). Mỗi worker nhớ seq cuối đã
+  áp dụng; trước khi phục vụ chỉ đọc các user đổi từ seq đó => mọi gunicorn worker
+  thấy cùng một thứ hạng mà không phải nạp lại cả bảng
+- Index user_stats(total_solved DESC, success_rate DESC, user_id) phục vụ lần nạp
+  đầu theo đúng thứ tự xếp hạng
+- Bảng log, trigger và index do migration 005 tạo (config/migrations.py)
+
+Thứ tự: total_solved giảm dần, success_rate giảm dần, user_id tăng dần (hòa điểm).
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config.database import ConnectionManager
+
+# Log dài hơn ngưỡng này thì xóa bớt phần cũ; worker tụt lại quá xa sẽ nạp lại toàn bộ
+LOG_RETAIN = 10000
+BUCKET_SIZE = 512
+
+ENTRY_QUERY = '''
+    SELECT s.user_id, u.username, s.total_solved, s.success_rate, s.streak
+    FROM user_stats s
+    JOIN users u ON s.user_id = u.id
+'''
+
+# Lần nạp đầu đọc theo idx_user_stats_rank => key đã có thứ tự, sắp xếp chỉ còn O(n)
+LOAD_QUERY = f'{ENTRY_QUERY} ORDER BY s.total_solved DESC, s.success_rate DESC, s.user_id'
+
+RankKey = Tuple[int, float, int]  # (-total_solved, -success_rate, user_id)
+
+
+class RankIndex:
+    """
+    Danh sách key có thứ tự hỗ trợ truy vấn theo vị trí (order-statistic)
+
+    Key nằm trong các bucket đã sắp xếp, mỗi bucket tối đa 2 * bucket_size phần tử;
+    cây Fenwick giữ kích thước bucket để đổi qua lại giữa vị trí toàn cục và
+    (bucket, vị trí trong bucket).
+    """
+
+    def __init__(self, keys: List = (), bucket_size: int = BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self._rebuild(sorted(keys))
+
+    def _rebuild(self, keys: List) -> None:
+        size = self.bucket_size
+        self._buckets = [keys[i:i + size] for i in range(0, len(keys), size)] or [[]]
+        self._maxes = [bucket[-1] for bucket in self._buckets if bucket]
+        self._len = len(keys)
+        self._build_tree()
+
+    def _build_tree(self) -> None:
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index: int, delta: int) -> None:
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, index: int) -> int:
+        """Tổng kích thước các bucket đứng trước bucket `index`"""
+        total, i = 0, index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Vị trí toàn cục -> (bucket, vị trí trong bucket) bằng cách đi xuống cây Fenwick"""
+        index, step = 0, 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                index = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return index, position
+
+    def _bucket_for(self, key) -> int:
+        return min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key) -> None:
+        index = self._bucket_for(key)
+        bucket = self._buckets[index]
+        insort(bucket, key)
+        self._maxes[index:index + 1] = [bucket[-1]]
+        self._len += 1
+        if len(bucket) > 2 * self.bucket_size:
+            # Tách bucket quá lớn; cây Fenwick dựng lại (hiếm, O(số bucket))
+            half = len(bucket) // 2
+            self._buckets[index:index + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[index:index + 1] = [bucket[half - 1], bucket[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(index, 1)
+
+    def remove(self, key) -> bool:
+        index = self._bucket_for(key)
+        bucket = self._buckets[index]
+        i = bisect_left(bucket, key)
+        if i == len(bucket) or bucket[i] != key:
+            return False
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = bucket[-1]
+            self._tree_add(index, -1)
+        elif len(self._buckets) > 1:
+            del self._buckets[index]
+            del self._maxes[index]
+            self._build_tree()
+        else:
+            self._maxes = []
+            self._tree_add(index, -1)
+        return True
+
+    def rank(self, key) -> Optional[int]:
+        """Vị trí (0-based) của key; None nếu không có"""
+        index = self._bucket_for(key)
+        bucket = self._buckets[index]
+        i = bisect_left(bucket, key)
+        if i == len(bucket) or bucket[i] != key:
+            return None
+        return self._prefix(index) + i
+
+    def select(self, position: int):
+        """Key ở vị trí `position` (0-based)"""
+        if not 0 <= position < self._len:
+            raise IndexError(position)
+        index, offset = self._locate(position)
+        return self._buckets[index][offset]
+
+    def slice(self, start: int, stop: int) -> Iterator:
+        """Các key ở vị trí [start, stop) theo thứ tự"""
+        start, stop = max(0, start), min(stop, self._len)
+        if start >= stop:
+            return
+        index, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            bucket = self._buckets[index]
+            chunk = bucket[offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            index, offset = index + 1, 0
+
+
+def rank_key(user_id: int, total_solved, success_rate) -> RankKey:
+    return (-(total_solved or 0), -(success_rate or 0.0), user_id)
+
+
+class Leaderboard:
+    """
+    Bảng xếp hạng dùng chung trong một worker
+
+    Args:
+        db: ConnectionManager của database (đã chạy migration 005)
+    """
+
+    def __init__(self, db: ConnectionManager):
+        self.db = db
+        self._lock = threading.Lock()
+        self._index: Optional[RankIndex] = None
+        self._entries: Dict[int, Dict] = {}
+        self._keys: Dict[int, RankKey] = {}
+        self._seq = 0
+        self.stats = {'loads': 0, 'last_load_ms': 0.0, 'syncs': 0, 'applied': 0, 'trimmed': 0}
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        started = time.perf_counter()
+        # Đọc seq trước khi đọc bảng: thay đổi xen giữa sẽ được áp dụng lại (idempotent)
+        self._seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM leaderboard_log').fetchone()[0]
+        self._entries, self._keys = {}, {}
+        for row in conn.execute(LOAD_QUERY):
+            self._remember(row)
+        self._index = RankIndex(self._keys.values())
+        self.stats['loads'] += 1
+        self.stats['last_load_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _remember(self, row) -> RankKey:
+        user_id = row['user_id']
+        self._entries[user_id] = {
+            'username': row['username'],
+            'total_solved': row['total_solved'] or 0,
+            'success_rate': round(row['success_rate'] or 0.0, 2),
+            'streak': row['streak'] or 0
+        }
+        key = self._keys[user_id] = rank_key(user_id, row['total_solved'], row['success_rate'])
+        return key
+
+    def _apply(self, conn: sqlite3.Connection, first_seq: int, last_seq: int) -> None:
+        changed = [row[0] for row in conn.execute(
+            'SELECT DISTINCT user_id FROM leaderboard_log WHERE seq > ? AND seq <= ?',
+            (self._seq, last_seq))]
+        for start in range(0, len(changed), 500):
+            chunk = changed[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            found = set()
+            for row in conn.execute(f'{ENTRY_QUERY} WHERE s.user_id IN ({placeholders})', chunk):
+                old = self._keys.get(row['user_id'])
+                if old is not None:
+                    self._index.remove(old)
+                self._index.add(self._remember(row))
+                found.add(row['user_id'])
+            for user_id in set(chunk) - found:  # user_stats bị xóa
+                old = self._keys.pop(user_id, None)
+                self._entries.pop(user_id, None)
+                if old is not None:
+                    self._index.remove(old)
+        self._seq = last_seq
+        self.stats['applied'] += len(changed)
+
+        if last_seq - first_seq > 2 * LOG_RETAIN:
+            conn.execute('DELETE FROM leaderboard_log WHERE seq <= ?', (last_seq - LOG_RETAIN,))
+            conn.commit()
+            self.stats['trimmed'] += 1
+
+    def sync(self) -> None:
+        """Áp dụng các thay đổi điểm từ mọi worker kể từ lần sync trước"""
+        with self._lock, self.db.connection() as conn:
+            if self._index is None:
+                self._load(conn)
+                return
+            first_seq, last_seq = conn.execute(
+                'SELECT (SELECT COALESCE(MIN(seq), 0) FROM leaderboard_log), '
+                '(SELECT COALESCE(MAX(seq), 0) FROM leaderboard_log)').fetchone()  # 2 lần tra B-tree
+            if last_seq == self._seq:
+                return
+            self.stats['syncs'] += 1
+            if last_seq < self._seq or self._seq < first_seq - 1:
+                self._load(conn)  # log đã bị cắt qua seq của worker này (hoặc DB bị thay)
+            else:
+                self._apply(conn, first_seq, last_seq)
+
+    def _entry(self, position: int, key: RankKey) -> Dict:
+        return {'rank': position + 1, 'user_id': key[2], **self._entries[key[2]]}
+
+    def top(self, limit: int, offset: int = 0) -> List[Dict]:
+        """Các user ở hạng [offset + 1, offset + limit]"""
+        self.sync()
+        with self._lock:
+            return [self._entry(offset + i, key)
+                    for i, key in enumerate(self._index.slice(offset, offset + max(0, limit)))]
+
+    def around(self, user_id: int, radius: int = 5) -> Optional[Dict]:
+        """
+        Hạng của user cùng `radius` user đứng trên và dưới
+
+        Returns:
+            None nếu user chưa có trong bảng xếp hạng
+        """
+        self.sync()
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is None:
+                return None
+            position = self._index.rank(key)
+            start = max(0, position - radius)
+            neighbours = [self._entry(start + i, k)
+                          for i, k in enumerate(self._index.slice(start, position + radius + 1))]
+            return {
+                **self._entry(position, key),
+                'total': len(self._index),
+                'neighbours': neighbours
+            }
+
+    def __len__(self) -> int:
+        self.sync()
+        return len(self._index)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'users': len(self._keys), 'seq': self._seq}
@@ -0,0 +1,97 @@
+"""
+Puzzle Packs
+Gói N puzzle kế tiếp cho client prefetch (không phải chờ giữa các puzzle)
+
+Pack được chọn theo cùng logic với chế độ random / sequential, bỏ qua các
+puzzle người dùng đã giải. Continuation token (base64 JSON) lưu vị trí con trỏ
+và các id vừa phục vụ để pack tiếp theo không lặp lại.
+"""
+
+import base64
+import json
+from typing import Dict, List, Optional, Set
+
+from models.selection import RandomSelector
+
+MAX_PACK_SIZE = 50
+# Số id gần nhất giữ trong token ở chế độ random (tránh lặp giữa các pack)
+TOKEN_RECENT_LIMIT = 100
+
+
+def encode_token(state: Dict) -> str:
+    """Mã hóa trạng thái pack thành chuỗi an toàn cho URL"""
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_token(token: str) -> Dict:
+    """Giải mã continuation token; ValueError nếu token không hợp lệ"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f'Invalid continuation token: {e}')
+    if not isinstance(state, dict):
+        raise ValueError('Invalid continuation token')
+    # Token đúng base64/JSON nhưng sai kiểu trường => 400 như token hỏng, không phải 500
+    if 'm' in state and state['m'] not in ('random', 'sequential'):
+        raise ValueError('Invalid continuation token: bad mode')
+    if 'd' in state and not isinstance(state['d'], str):
+        raise ValueError('Invalid continuation token: bad difficulty')
+    if 'c' in state and not _is_int(state['c']):
+        raise ValueError('Invalid continuation token: bad cursor')
+    if 'r' in state and not (isinstance(state['r'], list) and all(_is_int(x) for x in state['r'])):
+        raise ValueError('Invalid continuation token: bad recent ids')
+    return state
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def build_pack(selector: RandomSelector, size: int, mode: str, difficulty: str,
+               solved: Set[int], token: Optional[str] = None) -> Dict:
+    """
+    Chọn pack puzzle kế tiếp
+
+    Args:
+        selector: RandomSelector (dùng chung catalog với các endpoint khác)
+        size: Số puzzle trong pack
+        mode: 'random' hoặc 'sequential'
+        difficulty: Độ khó
+        solved: Các id người dùng đã giải (bị bỏ qua)
+        token: Continuation token từ pack trước (nếu có)
+
+    Returns:
+        {'positions': [...], 'next_token': str, 'exhausted': bool}
+    """
+    state = decode_token(token) if token else {}
+    mode = state.get('m', mode)
+    difficulty = state.get('d', difficulty)
+    snapshot = selector.catalog.snapshot()
+
+    if mode == 'sequential':
+        ids = snapshot.ids(difficulty)
+        cursor = max(state.get('c', 0), 0)
+        picked = []
+        while cursor < len(ids) and len(picked) < size:
+            if ids[cursor] not in solved:
+                picked.append((cursor, ids[cursor]))
+            cursor += 1
+        positions = [dict(snapshot.get(pos_id), index=index) for index, pos_id in picked]
+        next_state = {'m': mode, 'd': difficulty, 'c': cursor}
+        exhausted = cursor >= len(ids)
+    else:
+        recent: List[int] = list(state.get('r', []))
+        chosen = selector.sample(difficulty, size, exclude=set(solved).union(recent))
+        positions = [dict(p, index=snapshot.ordinal_of(p['id'])) for p in chosen]
+        recent = (recent + [p['id'] for p in chosen])[-TOKEN_RECENT_LIMIT:]
+        next_state = {'m': mode, 'd': difficulty, 'r': recent}
+        exhausted = len(chosen) < size
+
+    return {
+        'positions': positions,
+        'next_token': encode_token(next_state),
+        'exhausted': exhausted
+    }
+
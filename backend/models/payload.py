@@ -0,0 +1,69 @@
+"""
+Payload Cache
+Response JSON dựng sẵn (và nén sẵn) cho các position
+
+Mỗi position được serialize và nén một lần khi catalog nạp (position không đổi
+thì dùng lại payload của snapshot trước); bản gzip/brotli chỉ được giữ khi thực
+sự nhỏ hơn bản gốc. Endpoint chỉ còn chọn biến thể phù hợp với Accept-Encoding
+rồi trả bytes, không dựng dict, gọi jsonify hay nén nữa.
+
+Body position ~110-150 byte: gzip (header + CRC ~18 byte) không bao giờ nhỏ hơn
+đủ để giữ, brotli (có trong requirements.txt) nhỏ hơn ~12%.
+"""
+
+import gzip
+from typing import Optional, Tuple
+
+from utils.serializer import dumps
+
+try:
+    import brotli  # tùy chọn: pip install brotli
+except ImportError:
+    brotli = None
+
+# Body nhỏ hơn ngưỡng này không đáng nén (phần header của gzip/brotli ăn hết phần tiết kiệm)
+MIN_COMPRESS_SIZE = 100
+# Bản nén phải nhỏ hơn bản gốc ít nhất tỉ lệ này mới được giữ
+MIN_COMPRESS_RATIO = 0.9
+# Mức nén: nén cả catalog mỗi lần nạp; mức tối đa tốn CPU gấp nhiều lần mà chỉ nhỏ hơn vài byte
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class EncodedPayload:
+    """Body JSON của một response cùng các biến thể đã nén (dựng một lần, chỉ đọc)"""
+
+    __slots__ = ('identity', 'gzip', 'br')
+
+    def __init__(self, obj):
+        self.identity = dumps(obj) + b'\n'
+        self.gzip: Optional[bytes] = None
+        self.br: Optional[bytes] = None
+        if len(self.identity) >= MIN_COMPRESS_SIZE:
+            self._encode()
+
+    def _encode(self) -> None:
+        limit = len(self.identity) * MIN_COMPRESS_RATIO
+        compressed = gzip.compress(self.identity, compresslevel=GZIP_LEVEL, mtime=0)
+        if len(compressed) < limit:
+            self.gzip = compressed
+        if brotli is not None:
+            compressed = brotli.compress(self.identity, quality=BROTLI_QUALITY)
+            if len(compressed) < limit:
+                self.br = compressed
+
+    def negotiate(self, accept_encodings) -> Tuple[bytes, Optional[str]]:
+        """
+        Chọn biến thể theo Accept-Encoding của request
+
+        Args:
+            accept_encodings: request.accept_encodings (werkzeug Accept)
+
+        Returns:
+            (body, content_encoding) - content_encoding None nghĩa là không nén
+        """
+        if accept_encodings['br'] and self.br is not None:
+            return self.br, 'br'
+        if accept_encodings['gzip'] and self.gzip is not None:
+            return self.gzip, 'gzip'
+        return self.identity, None
@@ -0,0 +1,279 @@
+"""
+Position Catalog
+Bộ nhớ đệm trong tiến trình cho bảng positions (chỉ đọc)
+
+Mỗi gunicorn worker nạp toàn bộ bảng positions một lần, đánh index theo id
+và theo difficulty, rồi phục vụ mọi endpoint đọc từ RAM. Khi bảng positions thay đổi
+(bộ đếm catalog_version do trigger tăng), catalog nạp lại và thay snapshot một cách
+nguyên tử.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.payload import EncodedPayload
+
+
+class CatalogSnapshot:
+    """Ảnh chụp bất biến của bảng positions tại một version"""
+
+    __slots__ = ('version', 'loaded_at', 'by_id', 'solutions', 'by_difficulty', 'etags',
+                 'payloads', 'solution_payloads')
+
+    def __init__(self, version: Tuple, rows: Iterable = (), previous: Optional['CatalogSnapshot'] = None):
+        self.version = version
+        self.loaded_at = time.time()
+        self.by_id: Dict[int, Dict] = {}
+        self.solutions: Dict[int, str] = {}
+        # Bảng thứ tự (ordinal) mỗi difficulty: by_difficulty[d][index] = id, tăng dần
+        self.by_difficulty: Dict[str, List[int]] = {}
+        # ETag theo nội dung, tính lười ở lần đầu được hỏi
+        self.etags: Dict[int, str] = {}
+        # Body JSON dựng sẵn (kèm bản nén) cho /positions/<id> và /solution
+        self.payloads: Dict[int, EncodedPayload] = {}
+        self.solution_payloads: Dict[int, EncodedPayload] = {}
+
+        # rows đã được sắp xếp theo id => danh sách id mỗi difficulty cũng đã sắp xếp
+        for row in rows:
+            self._store(row, previous)
+            self.by_difficulty.setdefault(row['difficulty'], []).append(row['id'])
+
+    def _store(self, row, previous: Optional['CatalogSnapshot'] = None) -> None:
+        pos_id = row['id']
+        position = self.by_id[pos_id] = {
+            'id': pos_id,
+            'fen': row['fen'],
+            'difficulty': row['difficulty'],
+            'tags': row['tags'].split(',') if row['tags'] else []
+        }
+        self.solutions[pos_id] = row['solution']
+        if (previous is not None and previous.by_id.get(pos_id) == position
+                and previous.solutions.get(pos_id) == row['solution']):
+            # Position không đổi => giữ payload (kể cả bản đã nén) và ETag cũ
+            self.payloads[pos_id] = previous.payloads[pos_id]
+            self.solution_payloads[pos_id] = previous.solution_payloads[pos_id]
+            if pos_id in previous.etags:
+                self.etags[pos_id] = previous.etags[pos_id]
+            return
+        self.payloads[pos_id] = EncodedPayload(position)
+        self.solution_payloads[pos_id] = EncodedPayload({
+            'position_id': pos_id,
+            'solution': row['solution']
+        })
+
+    def with_changes(self, version: Tuple, upserts: Iterable = (),
+                     deleted_ids: Iterable[int] = ()) -> 'CatalogSnapshot':
+        """
+        Tạo snapshot mới sau một lần ghi hàng loạt (copy-on-write)
+
+        Chỉ các difficulty bị ảnh hưởng mới được sao chép và cập nhật bảng
+        thứ tự, nên id_at()/ordinal_of() luôn đúng ngay sau khi insert/delete
+        mà không phải nạp lại toàn bộ bảng positions.
+
+        Args:
+            version: Version stamp của database sau khi ghi
+            upserts: Các dòng positions vừa được thêm hoặc thay thế
+            deleted_ids: Các id vừa bị xóa
+        """
+        new = CatalogSnapshot(version)
+        new.by_id = dict(self.by_id)
+        new.solutions = dict(self.solutions)
+        new.by_difficulty = dict(self.by_difficulty)
+        new.etags = dict(self.etags)
+        new.payloads = dict(self.payloads)
+        new.solution_payloads = dict(self.solution_payloads)
+        copied = set()
+
+        def ordinals(difficulty: str) -> List[int]:
+            if difficulty not in copied:
+                new.by_difficulty[difficulty] = list(new.by_difficulty.get(difficulty, []))
+                copied.add(difficulty)
+            return new.by_difficulty[difficulty]
+
+        def remove(pos_id: int) -> None:
+            old = new.by_id.pop(pos_id, None)
+            new.solutions.pop(pos_id, None)
+            new.etags.pop(pos_id, None)
+            new.payloads.pop(pos_id, None)
+            new.solution_payloads.pop(pos_id, None)
+            if old is not None:
+                ids = ordinals(old['difficulty'])
+                i = bisect_left(ids, pos_id)
+                if i < len(ids) and ids[i] == pos_id:
+                    del ids[i]
+
+        for pos_id in deleted_ids:
+            remove(pos_id)
+        for row in upserts:
+            remove(row['id'])
+            new._store(row)
+            insort(ordinals(row['difficulty']), row['id'])
+
+        for difficulty in copied:
+            if not new.by_difficulty[difficulty]:
+                del new.by_difficulty[difficulty]
+        return new
+
+    def get(self, position_id: int) -> Optional[Dict]:
+        """Lấy payload của position theo id"""
+        return self.by_id.get(position_id)
+
+    def solution(self, position_id: int) -> Optional[str]:
+        """Lấy lời giải theo id (None nếu không có position)"""
+        return self.solutions.get(position_id)
+
+    def etag(self, position_id: int) -> Optional[str]:
+        """
+        Strong ETag của position, suy ra từ nội dung (fen, tags, solution...)
+
+        Chỉ đổi khi chính position đó đổi qua một lần chạy parser/import,
+        không đổi khi các bảng khác (user_progress...) được ghi.
+        """
+        tag = self.etags.get(position_id)
+        if tag is None:
+            position = self.by_id.get(position_id)
+            if position is None:
+                return None
+            content = repr((position['fen'], position['difficulty'], position['tags'],
+                            self.solutions.get(position_id)))
+            digest = hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+            tag = self.etags[position_id] = f'{position_id}-{digest}'
+        return tag
+
+    def ids(self, difficulty: str) -> List[int]:
+        """Danh sách id (đã sắp xếp) của một difficulty"""
+        return self.by_difficulty.get(difficulty, [])
+
+    def id_at(self, difficulty: str, index: int) -> Optional[int]:
+        """Id ở thứ tự `index` (0-based) trong difficulty - O(1)"""
+        ids = self.ids(difficulty)
+        if 0 <= index < len(ids):
+            return ids[index]
+        return None
+
+    def ordinal_of(self, position_id: int) -> Optional[int]:
+        """Thứ tự (0-based) của position trong difficulty của nó - O(log n)"""
+        position = self.by_id.get(position_id)
+        if position is None:
+            return None
+        return bisect_left(self.ids(position['difficulty']), position_id)
+
+    def count(self, difficulty: str) -> int:
+        return len(self.ids(difficulty))
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+
+class PositionCatalog:
+    """
+    Catalog positions dùng chung trong một worker
+
+    Args:
+        db_path: Đường dẫn file SQLite
+        check_interval: Số giây tối thiểu giữa hai lần đọc version của positions
+    """
+
+    def __init__(self, db_path: str, check_interval: float = 1.0):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+        self.stats = {'loads': 0, 'last_load_ms': 0.0}
+
+    def _file_version(self) -> Tuple:
+        """
+        Version stamp của bảng positions
+
+        Database đã migrate: (inode, catalog_version.version) - chỉ đổi khi positions
+        đổi, ghi user_progress / user_stats không làm nạp lại. Database chưa có bảng
+        catalog_version (file parser vừa copy sang): (mtime, size) của file và file -wal.
+        """
+        try:
+            inode = os.stat(self.db_path).st_ino
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+            finally:
+                conn.close()
+            if row is not None:
+                return ('positions', inode, row[0])
+        except (OSError, sqlite3.Error):
+            pass
+        stamp = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return ('file', *stamp)
+
+    def _load(self, version: Tuple) -> CatalogSnapshot:
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('''
+                SELECT id, fen, solution, difficulty, tags
+                FROM positions
+                ORDER BY id
+            ''').fetchall()
+        finally:
+            conn.close()
+
+        snapshot = CatalogSnapshot(version, rows, previous=self._snapshot)
+        self.stats['loads'] += 1
+        self.stats['last_load_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return snapshot
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Trả về snapshot hiện tại, nạp lại nếu database đã thay đổi"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now < self._next_check:
+            return snapshot
+
+        version = self._file_version()
+        if snapshot is not None and not self._stale and snapshot.version == version:
+            self._next_check = now + self.check_interval
+            return snapshot
+
+        with self._lock:
+            # Một thread khác có thể đã nạp xong trong lúc chờ lock
+            snapshot = self._snapshot
+            if snapshot is None or self._stale or snapshot.version != version:
+                self._stale = False
+                snapshot = self._load(version)
+                self._snapshot = snapshot  # thay tham chiếu => nguyên tử với reader
+            self._next_check = time.monotonic() + self.check_interval
+        return snapshot
+
+    def apply_changes(self, upserts: Iterable = (), deleted_ids: Iterable[int] = ()) -> None:
+        """
+        Cập nhật catalog ngay sau khi worker này ghi vào bảng positions
+
+        Các worker khác vẫn tự nạp lại nhờ version stamp của bảng positions.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            version = self._file_version()
+            if snapshot is None or self._stale:
+                # Chưa có snapshot hợp lệ => lần đọc tiếp theo sẽ nạp đầy đủ
+                self._stale = True
+                self._next_check = 0.0
+                return
+            self._snapshot = snapshot.with_changes(version, upserts, deleted_ids)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def invalidate(self) -> None:
+        """Buộc lần đọc tiếp theo kiểm tra lại database (dùng sau khi ghi)"""
+        self._stale = True
+        self._next_check = 0.0
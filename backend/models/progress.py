@@ -0,0 +1,71 @@
+"""
+Progress Writes
+Ghi một lượt giải vào user_progress + user_stats bằng UPSERT
+
+Mỗi lượt giải chỉ còn 2 câu lệnh trong cùng một transaction, không SELECT trước:
+- user_stats: cộng dồn lượt thử; total_solved chỉ tăng khi position được giải
+  lần đầu (kiểm tra bằng subquery trước khi ghi user_progress)
+- user_progress: INSERT ... ON CONFLICT DO UPDATE, solved giữ nguyên một khi đã giải
+
+Câu lệnh đầu đã là lệnh ghi nên SQLite lấy write lock ngay khi bắt đầu và giữ
+đến commit - thời gian giữ lock chỉ còn 2 câu lệnh.
+"""
+
+import sqlite3
+from typing import Iterable, Tuple
+
+# Phải chạy TRƯỚC PROGRESS_UPSERT: subquery cần trạng thái solved cũ
+STATS_UPSERT = '''
+    INSERT INTO user_stats (user_id, total_solved, total_attempts, success_rate, last_solved_date)
+    SELECT :user_id, first_solve, :attempts, first_solve * 100.0 / :attempts,
+           CASE WHEN :solved THEN DATE('now') END
+    FROM (
+        SELECT (:solved AND NOT EXISTS (
+            SELECT 1 FROM user_progress
+            WHERE user_id = :user_id AND position_id = :position_id AND solved = 1
+        )) AS first_solve
+    )
+    WHERE true
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_solved = total_solved + excluded.total_solved,
+        total_attempts = total_attempts + excluded.total_attempts,
+        success_rate = (total_solved + excluded.total_solved) * 100.0
+                       / (total_attempts + excluded.total_attempts),
+        last_solved_date = COALESCE(excluded.last_solved_date, last_solved_date)
+'''
+
+PROGRESS_UPSERT = '''
+    INSERT INTO user_progress (user_id, position_id, solved, attempts, time_spent, last_attempt)
+    VALUES (:user_id, :position_id, :solved, :attempts, :time_spent, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, position_id) DO UPDATE SET
+        solved = MAX(solved, excluded.solved),
+        attempts = attempts + excluded.attempts,
+        time_spent = time_spent + excluded.time_spent,
+        last_attempt = excluded.last_attempt
+'''
+
+# (user_id, position_id, solved, attempts, time_spent)
+ProgressRecord = Tuple[int, int, bool, int, int]
+
+
+def record_progress(conn: sqlite3.Connection, user_id: int, position_id: int, solved: bool,
+                    time_spent: int, attempts: int = 1) -> None:
+    """Ghi một lượt giải (chưa commit - caller quyết định ranh giới transaction)"""
+    params = {
+        'user_id': user_id,
+        'position_id': position_id,
+        'solved': 1 if solved else 0,
+        'attempts': max(1, int(attempts)),
+        'time_spent': max(0, int(time_spent or 0)),
+    }
+    conn.execute(STATS_UPSERT, params)
+    conn.execute(PROGRESS_UPSERT, params)
+
+
+def record_many(conn: sqlite3.Connection, records: Iterable[ProgressRecord]) -> int:
+    """Ghi nhiều lượt giải theo thứ tự (chưa commit); trả về số bản ghi"""
+    count = 0
+    for user_id, position_id, solved, attempts, time_spent in records:
+        record_progress(conn, user_id, position_id, solved, time_spent, attempts)
+        count += 1
+    return count
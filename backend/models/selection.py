@@ -0,0 +1,194 @@
+"""
+Random Selection
+Chọn puzzle ngẫu nhiên O(1) thay cho ORDER BY RANDOM()
+
+Mỗi difficulty giữ một mảng id dày đặc (lấy từ catalog snapshot); chọn đều
+chỉ cần một chỉ số ngẫu nhiên. Chọn có trọng số (ưu tiên puzzle ít người giải)
+dùng mảng tổng tiền tố + bisect. Loại trừ các id vừa phục vụ được xử lý bằng
+cách "nén" không gian chỉ số, không bao giờ quét toàn bộ mảng.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Optional
+
+from models.position import CatalogSnapshot, PositionCatalog
+
+# Giới hạn số id loại trừ trong một lần chọn (client gửi lên qua query string)
+MAX_EXCLUDE = 200
+
+
+class DenseSampler:
+    """
+    Bộ chọn trên một mảng id đã sắp xếp
+
+    Args:
+        ids: Danh sách id tăng dần
+        weights: Trọng số tương ứng từng id (None = chọn đều)
+    """
+
+    __slots__ = ('ids', 'weights', 'prefix', 'total')
+
+    def __init__(self, ids: List[int], weights: Optional[List[float]] = None):
+        self.ids = ids
+        self.weights = weights
+        self.prefix = list(accumulate(weights)) if weights else None
+        self.total = self.prefix[-1] if self.prefix else float(len(ids))
+
+    def _excluded_indexes(self, exclude: Iterable[int]) -> List[int]:
+        """Đổi id loại trừ thành chỉ số trong mảng (bisect, không quét)"""
+        ids = self.ids
+        indexes = set()
+        for pos_id in exclude:
+            i = bisect_left(ids, pos_id)
+            if i < len(ids) and ids[i] == pos_id:
+                indexes.add(i)
+        return sorted(indexes)
+
+    def pick(self, rng: random.Random, exclude: Iterable[int] = ()) -> Optional[int]:
+        """Chọn một id, bỏ qua các id trong exclude; None nếu không còn id nào"""
+        excluded = self._excluded_indexes(exclude) if exclude else []
+        i = self._pick_index(rng, excluded)
+        return self.ids[i] if i is not None else None
+
+    def sample(self, rng: random.Random, k: int, exclude: Iterable[int] = ()) -> List[int]:
+        """Chọn tối đa k id khác nhau (không lặp lại, bỏ qua exclude)"""
+        excluded = self._excluded_indexes(exclude) if exclude else []
+        result = []
+        while len(result) < k:
+            i = self._pick_index(rng, excluded)
+            if i is None:
+                break
+            result.append(self.ids[i])
+            insort(excluded, i)
+        return result
+
+    def _pick_index(self, rng: random.Random, excluded: List[int]) -> Optional[int]:
+        """Chọn một chỉ số không nằm trong `excluded` (danh sách chỉ số đã sắp xếp)"""
+        ids = self.ids
+
+        if self.prefix is None:
+            remaining = len(ids) - len(excluded)
+            if remaining <= 0:
+                return None
+            # r là chỉ số trong mảng đã bỏ các phần tử loại trừ => dịch lại về mảng gốc
+            r = rng.randrange(remaining)
+            for e in excluded:
+                if e > r:
+                    break
+                r += 1
+            return r
+
+        weights = self.weights
+        span = self.total - sum(weights[e] for e in excluded)
+        if span <= 0:
+            return None
+        r = rng.random() * span
+        for e in excluded:
+            if self.prefix[e] - weights[e] > r:
+                break
+            r += weights[e]
+
+        i = min(bisect_right(self.prefix, r), len(ids) - 1)
+        # Sai số dấu phẩy động có thể rơi đúng vào biên của một phần tử bị loại
+        skip = set(excluded)
+        while i in skip or weights[i] <= 0:
+            i = (i + 1) % len(ids)
+        return i
+
+
+class RandomSelector:
+    """
+    Hệ thống chọn puzzle ngẫu nhiên dựa trên catalog
+
+    Args:
+        catalog: PositionCatalog dùng chung
+        solve_counts_loader: Hàm trả về {position_id: số lần được giải}
+        weight_ttl: Số giây giữ bảng trọng số trước khi nạp lại
+    """
+
+    def __init__(self, catalog: PositionCatalog,
+                 solve_counts_loader: Optional[Callable[[], Dict[int, int]]] = None,
+                 weight_ttl: float = 300.0):
+        self.catalog = catalog
+        self.solve_counts_loader = solve_counts_loader
+        self.weight_ttl = weight_ttl
+        self.rng = random.Random()
+        self._samplers: Dict = {}
+        self._solve_counts: Dict[int, int] = {}
+        self._weights_expire = 0.0
+        self._weights_version = 0
+        self._lock = threading.Lock()
+
+    def _refresh_weights(self) -> None:
+        if self.solve_counts_loader is None or time.monotonic() < self._weights_expire:
+            return
+        with self._lock:
+            if time.monotonic() < self._weights_expire:
+                return
+            self._solve_counts = self.solve_counts_loader()
+            self._weights_version += 1
+            self._weights_expire = time.monotonic() + self.weight_ttl
+
+    def _sampler(self, snapshot: CatalogSnapshot, difficulty: str, weighted: bool) -> DenseSampler:
+        key = (difficulty, weighted)
+        weights_version = self._weights_version if weighted else 0
+        cached = self._samplers.get(key)
+        if cached and cached[0] is snapshot and cached[1] == weights_version:
+            return cached[2]
+
+        ids = snapshot.ids(difficulty)
+        weights = None
+        if weighted:
+            counts = self._solve_counts
+            weights = [1.0 / (1 + counts.get(pos_id, 0)) for pos_id in ids]
+        sampler = DenseSampler(ids, weights)
+        self._samplers[key] = (snapshot, weights_version, sampler)
+        return sampler
+
+    def pick(self, difficulty: str, weighted: bool = False,
+             exclude: Iterable[int] = ()) -> Optional[Dict]:
+        """
+        Chọn một position ngẫu nhiên
+
+        Args:
+            difficulty: Độ khó cần chọn
+            weighted: Ưu tiên puzzle ít được giải
+            exclude: Các id vừa phục vụ, không được chọn lại
+
+        Returns:
+            Payload position hoặc None nếu không còn position phù hợp
+        """
+        snapshot = self.catalog.snapshot()
+        if weighted:
+            self._refresh_weights()
+        pos_id = self._sampler(snapshot, difficulty, weighted).pick(self.rng, exclude)
+        return snapshot.get(pos_id) if pos_id is not None else None
+
+    def sample(self, difficulty: str, k: int, weighted: bool = False,
+               exclude: Iterable[int] = ()) -> List[Dict]:
+        """Chọn tối đa k position khác nhau (dùng cho pack prefetch)"""
+        snapshot = self.catalog.snapshot()
+        if weighted:
+            self._refresh_weights()
+        ids = self._sampler(snapshot, difficulty, weighted).sample(self.rng, k, exclude)
+        return [snapshot.get(pos_id) for pos_id in ids]
+
+    def invalidate_weights(self) -> None:
+        """Buộc nạp lại bảng trọng số ở lần chọn có trọng số tiếp theo"""
+        self._weights_expire = 0.0
+
+
+def parse_id_list(raw: Optional[str], limit: int = MAX_EXCLUDE) -> List[int]:
+    """Parse chuỗi "1,2,3" thành danh sách id (bỏ qua giá trị lỗi)"""
+    if not raw:
+        return []
+    result = []
+    for part in raw.split(',')[:limit]:
+        part = part.strip()
+        if part.isdigit():
+            result.append(int(part))
+    return result
@@ -0,0 +1,330 @@
+"""
+Puzzle Sessions
+Giải trọn biến của puzzle ngay trên server, không lộ lời giải cho client
+
+Client mở session cho một position rồi gửi từng nước; server kiểm tra nước đó
+theo biến chính của lời giải (nước cuối chấp nhận mọi nước chiếu hết), trả về
+nước đáp của đối phương. Session chỉ giữ vài số nguyên (bàn cờ lấy từ cache
+của MoveVerifier theo ply), nằm trong OrderedDict theo thứ tự truy cập nên
+dọn session hết hạn chỉ cần xét từ đầu. Session kết thúc hoặc hết hạn của user
+đã đăng nhập được gom lại và ghi vào user_progress theo lô (thread nền ghi định kỳ
+cả khi worker không có request).
+
+Session nằm trong RAM của từng worker: chạy nhiều gunicorn worker thì cần
+sticky routing, không thì client nhận 404 và mở session mới.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import chess
+
+from models.progress import ProgressRecord
+from models.verifier import MoveVerifier
+
+SESSION_TTL = 30 * 60  # giây không hoạt động trước khi session hết hạn
+MAX_SESSIONS = 50000
+# Ghi user_progress khi đủ số session này, hoặc khi lô cũ nhất đã chờ quá lâu
+FLUSH_BATCH_SIZE = 200
+FLUSH_INTERVAL = 5.0
+# Database lỗi kéo dài: giữ tối đa chừng này bản ghi chờ, bỏ bản cũ nhất
+MAX_PENDING = 10000
+
+
+class PuzzleSession:
+    """Trạng thái một lần giải: chỉ id và bộ đếm, không giữ bàn cờ"""
+
+    __slots__ = ('position_id', 'user_id', 'ply', 'mistakes', 'started', 'last_seen', 'solved')
+
+    def __init__(self, position_id: int, user_id: Optional[int], now: float):
+        self.position_id = position_id
+        self.user_id = user_id
+        self.ply = 0  # số nước đã đi trên biến chính
+        self.mistakes = 0
+        self.started = now
+        self.last_seen = now
+        self.solved = False
+
+    @property
+    def played(self) -> bool:
+        """Đã có ít nhất một nước hợp lệ (đúng hoặc sai)"""
+        return self.ply > 0 or self.mistakes > 0
+
+    def record(self, now: float) -> ProgressRecord:
+        # Mỗi nước sai là một lần thử, lần giải đúng tính thêm một; bỏ dở không sai nước nào = 1
+        attempts = max(1, self.mistakes + (1 if self.solved else 0))
+        return (self.user_id, self.position_id, self.solved, attempts, int(now - self.started))
+
+
+class SessionStore:
+    """
+    Kho session trong RAM với TTL và ghi tiến độ theo lô
+
+    Args:
+        verifier: MoveVerifier cung cấp bàn cờ và biến chính của lời giải
+        persist: Hàm nhận danh sách ProgressRecord và ghi vào database
+        ttl: Số giây không hoạt động trước khi session hết hạn
+        max_sessions: Số session tối đa; vượt quá thì bỏ session cũ nhất
+    """
+
+    def __init__(self, verifier: MoveVerifier, persist: Callable[[List[ProgressRecord]], None],
+                 ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS,
+                 batch_size: int = FLUSH_BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.verifier = verifier
+        self.persist = persist
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._sessions: 'OrderedDict[str, PuzzleSession]' = OrderedDict()
+        self._pending: List[ProgressRecord] = []
+        self._pending_since = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+        self._stopped = threading.Event()
+        self._metrics = {'started': 0, 'solved': 0, 'expired': 0, 'evicted': 0,
+                         'moves': 0, 'persisted': 0, 'flushes': 0, 'flush_errors': 0}
+
+    # ---------- vòng đời session ----------
+
+    def start(self, position_id: int, user_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        Mở session mới
+
+        Returns:
+            {'session_id', 'position_id', 'fen', 'turn'}, hoặc None nếu position không tồn tại
+
+        Raises:
+            InvalidPosition: FEN của position không hợp lệ
+        """
+        entry = self.verifier.entry(position_id)
+        if entry is None:
+            return None
+
+        self._ensure_flusher()
+        now = time.monotonic()
+        session_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._expire(now)
+            self._sessions[session_id] = PuzzleSession(position_id, user_id, now)
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                self._retire(oldest, now)
+                self._metrics['evicted'] += 1
+            self._metrics['started'] += 1
+        self._maybe_flush()
+
+        board = entry.board
+        return {
+            'session_id': session_id,
+            'position_id': position_id,
+            'fen': board.fen(),
+            'turn': 'white' if board.turn == chess.WHITE else 'black'
+        }
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Trạng thái hiện tại của session; None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            if session is None:
+                return None
+            position_id, ply, mistakes = session.position_id, session.ply, session.mistakes
+
+        entry = self.verifier.entry(position_id)
+        if entry is None:
+            return None
+        board, _, _ = entry.at_ply(ply)
+        return {
+            'session_id': session_id,
+            'position_id': position_id,
+            'fen': board.fen(),
+            'ply': ply,
+            'mistakes': mistakes
+        }
+
+    def play(self, session_id: str, user_move: str) -> Optional[Dict]:
+        """
+        Kiểm tra một nước của người dùng và đi nước đáp của đối phương
+
+        Returns:
+            Kết quả của nước đi, hoặc None nếu session không có / đã hết hạn
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._touch(session_id, now)
+            if session is None:
+                return None
+            position_id, ply = session.position_id, session.ply
+
+        entry = self.verifier.entry(position_id)
+        if entry is None:
+            return None
+
+        board, _, _ = entry.at_ply(ply)
+        line = entry.line
+        uci = entry.resolve(user_move, ply)
+        correct = False
+        if uci is not None and ply < len(line):
+            correct = uci == line[ply].uci()
+            if not correct and ply == len(line) - 1:
+                # Nước cuối: mọi nước chiếu hết đều đúng
+                after = board.copy(stack=False)
+                after.push(chess.Move.from_uci(uci))
+                correct = after.is_checkmate()
+
+        reply = None
+        next_ply = ply
+        if correct:
+            next_ply = ply + 1
+            if next_ply < len(line):
+                reply = {'uci': line[next_ply].uci(), 'san': entry.at_ply(next_ply)[0].san(line[next_ply])}
+                next_ply += 1
+        solved = correct and next_ply >= len(line)
+
+        with self._lock:
+            self._metrics['moves'] += 1
+            # Session có thể đã bị dọn / đã đi tiếp bởi request khác trong lúc kiểm tra
+            if self._sessions.get(session_id) is not session or session.ply != ply:
+                return None
+            if correct:
+                session.ply = next_ply
+            elif uci is not None:  # nhập sai cú pháp / nước không hợp lệ thì không tính
+                session.mistakes += 1
+            if solved:
+                session.solved = True
+                del self._sessions[session_id]
+                self._retire(session, now)
+                self._metrics['solved'] += 1
+            mistakes = session.mistakes
+        self._maybe_flush()
+
+        result = {
+            'correct': correct,
+            'legal': uci is not None,
+            'move': uci,
+            'reply': reply,
+            'solved': solved,
+            'mistakes': mistakes
+        }
+        if correct and not solved:
+            result['fen'] = entry.at_ply(next_ply)[0].fen()
+        return result
+
+    # ---------- dọn dẹp và ghi tiến độ ----------
+
+    def _touch(self, session_id: str, now: float) -> Optional[PuzzleSession]:
+        """Lấy session và làm mới hạn (gọi khi đang giữ lock)"""
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self, now: float):
+        """Bỏ các session hết hạn; đầu OrderedDict luôn là session cũ nhất"""
+        deadline = now - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen > deadline:
+                break
+            del self._sessions[session_id]
+            self._retire(session, session.last_seen)
+            self._metrics['expired'] += 1
+
+    def _retire(self, session: PuzzleSession, now: float):
+        """Đưa session đã xong vào hàng chờ ghi (chỉ session của user đã đi ít nhất một nước)"""
+        if session.user_id is None or not session.played:
+            return
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.append(session.record(now))
+
+    def _ensure_flusher(self):
+        """
+        Thread nền ghi định kỳ (lười, một lần cho mỗi process - thread không sống qua fork)
+
+        Không có nó thì worker rảnh giữ session đã xong / hết hạn trong RAM cho tới
+        request session tiếp theo hoặc tới khi worker dừng.
+        """
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._stopped.clear()
+            threading.Thread(target=self._run_flusher, name='session-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush(expire=True)
+            except Exception as e:  # không để thread chết vì một lần lỗi
+                print(f"⚠️  Session flush thất bại: {e}")
+
+    def _maybe_flush(self):
+        with self._lock:
+            due = self._pending and (len(self._pending) >= self.batch_size or
+                                     time.monotonic() - self._pending_since >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self, expire: bool = False) -> int:
+        """
+        Ghi các session trong hàng chờ vào database
+
+        Args:
+            expire: Dọn session hết hạn trước khi ghi (thread flusher định kỳ)
+
+        Returns:
+            Số bản ghi đã ghi
+        """
+        # Chỉ một thread ghi cùng lúc; thread khác bỏ qua thay vì chờ
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                if expire:
+                    self._expire(time.monotonic())
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self.persist(batch)
+            except Exception as e:
+                with self._lock:
+                    # Giữ lại để lần sau ghi tiếp
+                    self._pending = (batch + self._pending)[-MAX_PENDING:]
+                    self._pending_since = time.monotonic()
+                    self._metrics['flush_errors'] += 1
+                print(f"⚠️  Không ghi được {len(batch)} session: {e}")
+                return 0
+            with self._lock:
+                self._metrics['persisted'] += len(batch)
+                self._metrics['flushes'] += 1
+            return len(batch)
+        finally:
+            self._flush_lock.release()
+
+    def close(self):
+        """Ghi mọi session còn trong RAM của user (khi worker dừng)"""
+        self._stopped.set()
+        now = time.monotonic()
+        with self._lock:
+            while self._sessions:
+                _, session = self._sessions.popitem(last=False)
+                self._retire(session, now)
+        self.flush()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            result = dict(self._metrics)
+            result['active'] = len(self._sessions)
+            result['pending'] = len(self._pending)
+        return result
@@ -0,0 +1,128 @@
+"""
+Global Stats
+Bộ đếm vật chất hóa cho /api/stats/global thay vì COUNT(*) / GROUP BY mỗi request
+
+- Trigger trên users và user_progress cập nhật global_counters và
+  position_solve_counts trong CÙNG transaction với lệnh ghi => không bao giờ lệch
+- "Most solved" đọc 5 dòng đầu của index (solve_count DESC) => chi phí không đổi
+  dù user_progress có hàng chục triệu dòng
+- Bảng, index và trigger do migration 007 tạo (config/migrations.py); migration đó
+  rollup lần đầu, rollup() tính lại toàn bộ từ bảng gốc khi cần
+- GlobalStats: cache TTL + singleflight - nhiều request cùng lúc chỉ tính một lần;
+  khi đã có giá trị cũ, các request khác trả giá trị cũ trong lúc một thread tính lại
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config.database import ConnectionManager
+
+STATS_TTL = 30.0  # giây, bằng max-age của CACHE_SHORT
+MOST_SOLVED_LIMIT = 5
+
+ROLLUP = '''
+    DELETE FROM global_counters;
+    INSERT INTO global_counters (name, value) SELECT 'users', COUNT(*) FROM users;
+    DELETE FROM position_solve_counts;
+    INSERT INTO position_solve_counts (position_id, solve_count)
+        SELECT position_id, COUNT(*) FROM user_progress WHERE solved = 1 GROUP BY position_id;
+'''
+
+
+def rollup(conn: sqlite3.Connection) -> None:
+    """Tính lại toàn bộ bộ đếm từ bảng gốc (chưa commit)"""
+    for statement in ROLLUP.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+class GlobalStats:
+    """
+    Thống kê toàn hệ thống với cache TTL + singleflight
+
+    Args:
+        db: ConnectionManager của database (đã chạy migration 007)
+        count_positions: Hàm trả về số positions (catalog trong RAM)
+        ttl: Số giây một kết quả còn dùng được
+    """
+
+    def __init__(self, db: ConnectionManager, count_positions: Callable[[], int], ttl: float = STATS_TTL):
+        self.db = db
+        self.count_positions = count_positions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value: Optional[Dict] = None
+        self._expires = 0.0
+        self._inflight: Optional[threading.Event] = None
+        self._error: Optional[BaseException] = None
+        self.stats = {'hits': 0, 'stale_hits': 0, 'waits': 0, 'computes': 0, 'last_compute_ms': 0.0}
+
+    def _compute(self) -> Dict:
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT value FROM global_counters WHERE name = 'users'").fetchone()
+            most_solved = [dict(r) for r in conn.execute('''
+                SELECT position_id, solve_count
+                FROM position_solve_counts
+                WHERE solve_count > 0
+                ORDER BY solve_count DESC, position_id
+                LIMIT ?
+            ''', (MOST_SOLVED_LIMIT,))]
+        return {
+            'total_positions': self.count_positions(),
+            'total_users': row[0] if row else 0,
+            'most_solved': most_solved
+        }
+
+    def get(self) -> Dict:
+        """Thống kê hiện tại (tối đa `ttl` giây tuổi)"""
+        leader = False
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires:
+                self.stats['hits'] += 1
+                return self._value
+            event = self._inflight
+            if event is None:
+                event = self._inflight = threading.Event()
+                leader = True
+            elif self._value is not None:
+                # Đã có thread đang tính lại: trả giá trị cũ thay vì chờ
+                self.stats['stale_hits'] += 1
+                return self._value
+            else:
+                self.stats['waits'] += 1
+        if not leader:
+            event.wait()
+            with self._lock:
+                if self._value is None:
+                    raise self._error or RuntimeError('global stats unavailable')
+                return self._value
+
+        started = time.perf_counter()
+        try:
+            value = self._compute()
+        except BaseException as e:
+            with self._lock:
+                self._error = e
+                self._inflight = None
+            event.set()
+            raise
+        with self._lock:
+            self._value = value
+            self._error = None
+            self._expires = time.monotonic() + self.ttl
+            self._inflight = None
+            self.stats['computes'] += 1
+            self.stats['last_compute_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        event.set()
+        return value
+
+    def invalidate(self) -> None:
+        """Bỏ cache (vd. sau khi import positions)"""
+        with self._lock:
+            self._expires = 0.0
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,246 @@
+"""
+Move Verifier
+Kiểm tra nước đi của người dùng dựa trên luật cờ (python-chess)
+
+FEN của position được parse thành bàn cờ một lần; mọi cách viết hợp lệ của
+từng nước đi (SAN, SAN không có +/#, UCI, LAN, chữ thường...) được đổi sẵn về
+UCI và giữ trong LRU cache theo position id. Đường verify nóng chỉ còn tra dict.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import chess
+
+from models.position import PositionCatalog
+
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+# Ký hiệu chú thích không ảnh hưởng nước đi: + # ! ?
+ANNOTATIONS = re.compile(r'[+#!?]+$')
+
+
+class InvalidPosition(ValueError):
+    """FEN của position không parse được - route trả về 422"""
+
+
+def solution_moves(solution: Optional[str]) -> List[str]:
+    """
+    Tách lời giải thành danh sách nước đi SAN
+
+    "1. h7+ Kh8 2. Rf8"        -> ['h7+', 'Kh8', 'Rf8']
+    "1... Rxg2+ 2. Bxg2 Qxg2"  -> ['Rxg2+', 'Bxg2', 'Qxg2']
+    """
+    moves = []
+    for token in (solution or '').split():
+        token = MOVE_NUMBER.sub('', token)
+        if token and token not in ('1-0', '0-1', '1/2-1/2', '*'):
+            moves.append(token)
+    return moves
+
+
+def normalize_input(move: str) -> str:
+    """Chuẩn hóa chuỗi người dùng nhập: bỏ khoảng trắng, chú thích, 0-0 -> O-O"""
+    move = ANNOTATIONS.sub('', move.strip())
+    return move.replace('0-0-0', 'O-O-O').replace('0-0', 'O-O')
+
+
+def load_board(fen: str) -> chess.Board:
+    """Parse FEN; bỏ quyền nhập thành sai (parser luôn ghi KQkq)"""
+    board = chess.Board(fen)
+    board.castling_rights = board.clean_castling_rights()
+    return board
+
+
+def build_lookup(board: chess.Board) -> Tuple[Dict[str, str], Dict[str, Optional[str]]]:
+    """
+    Bảng tra mọi cách viết của các nước đi hợp lệ -> UCI
+
+    Returns:
+        (exact, folded) - folded là bảng chữ thường, None nếu cách viết bị trùng
+    """
+    exact: Dict[str, str] = {}
+    folded: Dict[str, Optional[str]] = {}
+    for move in board.legal_moves:
+        uci = move.uci()
+        san = ANNOTATIONS.sub('', board.san(move))
+        lan = ANNOTATIONS.sub('', board.lan(move))
+        for key in {uci, san, lan, san.replace('x', '')}:
+            exact.setdefault(key, uci)
+            # Chữ thường có thể trùng (bxc3 tốt vs Bxc3 tượng) => trùng thì bỏ
+            lower = key.lower()
+            if folded.get(lower, uci) != uci:
+                folded[lower] = None
+            else:
+                folded[lower] = uci
+    return exact, folded
+
+
+class VerifyEntry:
+    """Bàn cờ đã parse cùng bảng tra nước đi hợp lệ của một position"""
+
+    __slots__ = ('etag', 'board', 'exact', 'folded', 'line', '_plies')
+
+    def __init__(self, etag: str, fen: str, solution: Optional[str]):
+        self.etag = etag
+        self.board = load_board(fen)
+        # Biến chính của lời giải (dừng ở nước đầu tiên không hợp lệ)
+        self.line: List[chess.Move] = self._parse_line(solution_moves(solution))
+        self.exact, self.folded = build_lookup(self.board)
+        # Bàn cờ + bảng tra theo từng ply của biến chính (dựng lười, cho session)
+        self._plies = {0: (self.board, self.exact, self.folded)}
+
+    @property
+    def expected(self) -> Optional[chess.Move]:
+        return self.line[0] if self.line else None
+
+    def _parse_line(self, moves: List[str]) -> List[chess.Move]:
+        if not moves:
+            return []
+
+        # Thử đổi lượt đi nếu FEN ghi sai bên đi trước
+        first = None
+        for _ in range(2):
+            try:
+                first = self.board.parse_san(moves[0])
+                break
+            except ValueError:
+                self.board.turn = not self.board.turn
+        if first is None:
+            return []
+
+        line = [first]
+        board = self.board.copy(stack=False)
+        board.push(first)
+        for san in moves[1:]:
+            try:
+                move = board.parse_san(san)
+            except ValueError:
+                break
+            line.append(move)
+            board.push(move)
+        return line
+
+    def at_ply(self, ply: int) -> Tuple[chess.Board, Dict[str, str], Dict[str, Optional[str]]]:
+        """Bàn cờ và bảng tra sau `ply` nước đầu của biến chính"""
+        cached = self._plies.get(ply)
+        if cached is None:
+            board = self.board.copy(stack=False)
+            for move in self.line[:ply]:
+                board.push(move)
+            cached = self._plies[ply] = (board,) + build_lookup(board)
+        return cached
+
+    def resolve(self, user_move: str, ply: int = 0) -> Optional[str]:
+        """Đổi nước đi người dùng nhập về UCI; None nếu không hợp lệ"""
+        _, exact, folded = self.at_ply(ply)
+        move = normalize_input(user_move)
+        uci = exact.get(move)
+        if uci is None:
+            uci = folded.get(move.lower())
+        return uci
+
+
+class MoveVerifier:
+    """
+    Verify nước đi với LRU cache bàn cờ theo position id
+
+    Args:
+        catalog: PositionCatalog cung cấp FEN và lời giải
+        max_entries: Số position tối đa giữ trong cache
+        latency_samples: Số mẫu thời gian gần nhất dùng tính percentile
+    """
+
+    def __init__(self, catalog: PositionCatalog, max_entries: int = 4096,
+                 latency_samples: int = 10000):
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[int, VerifyEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_samples)
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'verifications': 0,
+                         'invalid_positions': 0}
+
+    def entry(self, position_id: int) -> Optional[VerifyEntry]:
+        """
+        Lấy entry từ cache, dựng mới nếu chưa có hoặc position đã đổi
+
+        Raises:
+            InvalidPosition: FEN không hợp lệ (không đưa gì vào cache)
+        """
+        snapshot = self.catalog.snapshot()
+        etag = snapshot.etag(position_id)
+        if etag is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(position_id)
+            if entry is not None and entry.etag == etag:
+                self._entries.move_to_end(position_id)
+                self._metrics['hits'] += 1
+                return entry
+            self._metrics['misses'] += 1
+
+        try:
+            entry = VerifyEntry(etag, snapshot.get(position_id)['fen'], snapshot.solution(position_id))
+        except ValueError as e:
+            with self._lock:
+                self._metrics['invalid_positions'] += 1
+            raise InvalidPosition(f'invalid position {position_id}: {e}') from e
+        with self._lock:
+            self._entries[position_id] = entry
+            self._entries.move_to_end(position_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+        return entry
+
+    def verify(self, position_id: int, user_move: str) -> Optional[Dict]:
+        """
+        Kiểm tra nước đầu tiên của người dùng
+
+        Returns:
+            Kết quả verify, hoặc None nếu position không tồn tại
+
+        Raises:
+            InvalidPosition: FEN của position không hợp lệ
+        """
+        started = time.perf_counter()
+        entry = self.entry(position_id)
+        if entry is None:
+            return None
+
+        uci = entry.resolve(user_move)
+        expected = entry.expected
+        is_correct = uci is not None and expected is not None and uci == expected.uci()
+
+        result = {
+            'correct': is_correct,
+            'user_move': user_move,
+            'legal': uci is not None,
+            'move': uci,
+            'expected_move': None
+        }
+        if not is_correct and expected is not None:
+            result['expected_move'] = entry.board.san(expected)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._metrics['verifications'] += 1
+            self._latencies.append(elapsed)
+        return result
+
+    def metrics(self) -> Dict:
+        """Tỉ lệ cache hit và percentile thời gian verify (ms)"""
+        with self._lock:
+            result = dict(self._metrics)
+            samples = sorted(self._latencies)
+            result['cached_positions'] = len(self._entries)
+        lookups = result['hits'] + result['misses']
+        result['hit_rate'] = round(result['hits'] / lookups, 4) if lookups else 0.0
+        for name, q in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+            value = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+            result[f'latency_{name}_ms'] = round(value, 4)
+        return result
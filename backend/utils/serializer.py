@@ -0,0 +1,161 @@
+"""
+JSON Serializer
+Lớp serialize JSON có thể thay backend cho toàn bộ API
+
+- Dùng orjson hoặc ujson nếu đã cài, không thì dùng json của stdlib
+- JSON_BACKEND=json|orjson|ujson để ép chọn một backend
+- FastJSONProvider gắn vào Flask => jsonify() cũng đi qua backend nhanh
+- iter_json_object() stream response có danh sách lớn mà không dựng cả chuỗi
+"""
+
+import datetime
+import decimal
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # tùy chọn: pip install orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson  # tùy chọn: pip install ujson
+except ImportError:
+    ujson = None
+
+# Số phần tử gom lại thành một chunk khi stream danh sách
+STREAM_CHUNK_ITEMS = 100
+
+
+def _default(obj: Any) -> Any:
+    """Kiểu dữ liệu mà backend JSON không tự xử lý được"""
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(obj: Any) -> bytes:
+    return ujson.dumps(obj, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+class Serializer:
+    """Một backend JSON: tên, hàm dumps (trả bytes) và loads"""
+
+    __slots__ = ('name', 'dumps', 'loads')
+
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+BACKENDS: Dict[str, Serializer] = {'json': Serializer('json', _stdlib_dumps, json.loads)}
+if ujson is not None:
+    BACKENDS['ujson'] = Serializer('ujson', _ujson_dumps, ujson.loads)
+if orjson is not None:
+    BACKENDS['orjson'] = Serializer('orjson', _orjson_dumps, orjson.loads)
+
+# Thứ tự ưu tiên khi không chỉ định
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+
+def get_serializer(name: Optional[str] = None) -> Serializer:
+    """Lấy backend theo tên; backend không có sẵn => backend tốt nhất đã cài"""
+    if name in BACKENDS:
+        return BACKENDS[name]
+    for candidate in PREFERENCE:
+        if candidate in BACKENDS:
+            return BACKENDS[candidate]
+
+
+serializer = get_serializer(os.environ.get('JSON_BACKEND'))
+
+
+def use_backend(name: Optional[str]) -> Serializer:
+    """Đổi backend đang dùng (benchmark / cấu hình lúc chạy)"""
+    global serializer
+    serializer = get_serializer(name)
+    return serializer
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize bằng backend hiện tại (compact, UTF-8)"""
+    return serializer.dumps(obj)
+
+
+def loads(data):
+    return serializer.loads(data)
+
+
+def iter_json_object(key: str, items: Iterable[Any], head: Optional[Dict] = None,
+                     tail: Optional[Callable[[], Dict]] = None) -> Iterator[bytes]:
+    """
+    Stream một object JSON có một danh sách lớn, từng chunk một
+
+    Args:
+        key: Tên trường chứa danh sách
+        items: Iterable các phần tử (được tiêu thụ dần, không giữ lại)
+        head: Các trường đứng trước danh sách
+        tail: Hàm trả về các trường đứng sau danh sách, gọi khi đã duyệt hết items
+
+    Yields:
+        Các đoạn bytes, ghép lại là JSON hợp lệ: {...head, key: [...], ...tail}
+    """
+    out = [b'{']
+    for name, value in (head or {}).items():
+        out.append(dumps(name) + b':' + dumps(value) + b',')
+    out.append(dumps(key) + b':[')
+
+    first = True
+    for item in items:
+        if not first:
+            out.append(b',')
+        out.append(dumps(item))
+        first = False
+        if len(out) >= STREAM_CHUNK_ITEMS:
+            yield b''.join(out)
+            out = []
+
+    out.append(b']')
+    for name, value in (tail() if tail else {}).items():
+        out.append(b',' + dumps(name) + b':' + dumps(value))
+    out.append(b'}\n')
+    yield b''.join(out)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider của Flask dùng backend serialize hiện tại"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:  # indent/sort_keys... => để stdlib xử lý như mặc định
+            return super().dumps(obj, **kwargs)
+        return serializer.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return serializer.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serializer.dumps(obj) + b'\n', mimetype=self.mimetype)
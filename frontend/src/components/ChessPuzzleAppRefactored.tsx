@@ -21,7 +21,12 @@ import { StatsPanel } from './StatsPanel';
 import { PuzzleInfo } from './PuzzleInfo';
 import { ActionButtons } from './ActionButtons';
 
-const ChessPuzzleApp = () => {
+interface ChessPuzzleAppProps {
+  // Logged-in user: random packs skip the puzzles they have already solved
+  userId?: number;
+}
+
+const ChessPuzzleApp = ({ userId }: ChessPuzzleAppProps = {}) => {
   // Hooks
   const { timer, startTimer, stopTimer, resetTimer } = useTimer();
   const { stats, incrementSolved, incrementAttempts } = useStats();
@@ -48,7 +53,7 @@ const ChessPuzzleApp = () => {
     resetToInitialPosition,
     goToPreviousPuzzle,
     goToNextPuzzle
-  } = usePuzzle();
+  } = usePuzzle(userId);
 
   // Local state
   const [showSolution, setShowSolution] = useState(false);
@@ -1,10 +1,14 @@
-import { useState, useCallback } from 'react';
+import { useState, useCallback, useRef } from 'react';
 import { Chess } from 'chess.js';
 import { PuzzlePosition, Player, PuzzleMode } from '../types/chess';
 import { PuzzleAPI } from '../services/puzzleAPI';
 import { ChessUtils } from '../utils/chessUtils';
 
-export const usePuzzle = () => {
+// Random mode keeps a local queue of prefetched puzzles and refills it in the background
+const PACK_SIZE = 10;
+const PREFETCH_THRESHOLD = 3;
+
+export const usePuzzle = (userId?: number) => {
   const [game, setGame] = useState(new Chess());
   const [position, setPosition] = useState<PuzzlePosition | null>(null);
   const [currentPlayer, setCurrentPlayer] = useState<Player>('w');
@@ -14,6 +18,53 @@ export const usePuzzle = () => {
   const [freePlayMode, setFreePlayMode] = useState(false);
   const [solutionMoveIndex, setSolutionMoveIndex] = useState(0);
   const [moveCount, setMoveCount] = useState(0);
+  const puzzleQueue = useRef<PuzzlePosition[]>([]);
+  const packToken = useRef<string | null>(null);
+  const pendingPack = useRef<Promise<void> | null>(null);
+  const currentUserId = useRef(userId);
+
+  // Packs are filtered per user: drop the queue, token and in-flight pack of the previous user
+  if (currentUserId.current !== userId) {
+    currentUserId.current = userId;
+    puzzleQueue.current = [];
+    packToken.current = null;
+    pendingPack.current = null;
+  }
+
+  // Fetch the next pack into the queue (only one request in flight at a time)
+  const prefetchPack = useCallback(() => {
+    if (!pendingPack.current) {
+      const requestUserId = currentUserId.current;
+      const request: Promise<void> = PuzzleAPI.getPuzzlePack(PACK_SIZE, packToken.current, requestUserId)
+        .then((pack) => {
+          if (currentUserId.current !== requestUserId) {
+            return; // user changed while the pack was loading
+          }
+          puzzleQueue.current.push(...pack.positions);
+          // Start over with a fresh token once every puzzle has been served
+          packToken.current = pack.exhausted ? null : pack.nextToken;
+        })
+        .finally(() => {
+          if (pendingPack.current === request) {
+            pendingPack.current = null;
+          }
+        });
+      pendingPack.current = request;
+    }
+    return pendingPack.current;
+  }, []);
+
+  // Take the next puzzle from the queue, waiting only if it is empty
+  const nextQueuedPuzzle = useCallback(async () => {
+    if (puzzleQueue.current.length === 0) {
+      await prefetchPack();
+    }
+    const data = puzzleQueue.current.shift();
+    if (puzzleQueue.current.length < PREFETCH_THRESHOLD) {
+      prefetchPack().catch((error) => console.error('Error prefetching puzzles:', error));
+    }
+    return data || PuzzleAPI.getRandomPuzzle();
+  }, [prefetchPack]);
 
   // Load puzzle by index
   const loadPuzzleByIndex = useCallback(async (index: number) => {
@@ -43,7 +94,7 @@ export const usePuzzle = () => {
         const randomIndex = Math.floor(Math.random() * totalPuzzles);
         return await loadPuzzleByIndex(randomIndex);
       } else {
-        const data = await PuzzleAPI.getRandomPuzzle();
+        const data = await nextQueuedPuzzle();
         setPosition(data);
         setSolutionMoveIndex(0);
         setMoveCount(0);
@@ -59,7 +110,7 @@ export const usePuzzle = () => {
     } catch (error: any) {
       return { success: false, message: error.message || 'Lỗi kết nối đến server.' };
     }
-  }, [puzzleMode, totalPuzzles, loadPuzzleByIndex]);
+  }, [puzzleMode, totalPuzzles, loadPuzzleByIndex, nextQueuedPuzzle]);
 
   // Load total puzzles count
   const loadTotalPuzzles = useCallback(async () => {
@@ -1,4 +1,4 @@
-import { PuzzlePosition } from '../types/chess';
+import { PuzzlePack, PuzzlePosition, PuzzleSession, SessionMoveResult } from '../types/chess';
 
 // Use environment variable for API URL, fallback to render.com deployment
 export const API_BASE_URL = (import.meta as any).env?.VITE_API_URL || 'https://chess-app-backend-cagt.onrender.com/api';
@@ -42,6 +42,87 @@ export class PuzzleAPI {
     return data;
   }
 
+  // Get many puzzles in one request (by id list)
+  static async getPuzzlesByIds(ids: Array<string | number>): Promise<PuzzlePosition[]> {
+    const response = await fetch(`${API_BASE_URL}/positions/batch?ids=${ids.join(',')}`);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.positions || [];
+  }
+
+  // Get a range of puzzles by index (same order as getPuzzleByIndex)
+  // count must stay <= 500: larger ranges are streamed back as NDJSON
+  static async getPuzzleRange(from: number, count: number): Promise<PuzzlePosition[]> {
+    const response = await fetch(`${API_BASE_URL}/positions/batch?from=${from}&count=${count}`);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.positions || [];
+  }
+
+  // Get the next pack of puzzles for prefetching (pass back nextToken to continue)
+  // With a userId the server skips puzzles that user has already solved
+  static async getPuzzlePack(size: number, token?: string | null, userId?: number): Promise<PuzzlePack> {
+    const params = new URLSearchParams({ size: String(size), mode: 'random' });
+    if (token) {
+      params.set('token', token);
+    }
+    if (userId !== undefined) {
+      params.set('user_id', String(userId));
+    }
+
+    const response = await fetch(`${API_BASE_URL}/packs/next?${params.toString()}`);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return {
+      positions: data.positions || [],
+      nextToken: data.next_token || null,
+      exhausted: Boolean(data.exhausted)
+    };
+  }
+
+  // Start a server-side solving session (the solution never leaves the server)
+  static async startSession(positionId: string | number, userId?: number): Promise<PuzzleSession> {
+    const response = await fetch(`${API_BASE_URL}/sessions`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ position_id: Number(positionId), user_id: userId })
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return { sessionId: data.session_id, positionId: data.position_id, fen: data.fen };
+  }
+
+  // Submit one move of the session; returns correctness and the opponent's reply
+  static async playSessionMove(sessionId: string, move: string): Promise<SessionMoveResult> {
+    const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}/moves`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ move })
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  }
+
   // Get total puzzle count
   static async getTotalPuzzles(): Promise<number> {
     const response = await fetch(`${API_BASE_URL}/positions/count`);
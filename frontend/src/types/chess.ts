@@ -10,6 +10,28 @@ export interface PuzzlePosition {
   solution: string;
 }
 
+export interface PuzzlePack {
+  positions: PuzzlePosition[];
+  nextToken: string | null;
+  exhausted: boolean;
+}
+
+export interface PuzzleSession {
+  sessionId: string;
+  positionId: string | number;
+  fen: string;
+}
+
+export interface SessionMoveResult {
+  correct: boolean;
+  legal: boolean;
+  move: string | null;
+  reply: { uci: string; san: string } | null;
+  solved: boolean;
+  mistakes: number;
+  fen?: string;
+}
+
 export interface MoveSquares {
   [key: string]: {
     background?: string;
@@ -0,0 +1,346 @@
+"""
+Batch Ingest - parse nhiều PDF song song rồi gộp vào một database puzzle
+
+- Input: file PDF, thư mục (mọi *.pdf bên trong) hoặc glob; file trùng chỉ chạy một lần
+- Mỗi PDF chạy parse_pdf trong một process riêng (process mới cho mỗi file), output riêng
+  ở <output>/files/<namespace>-<tên file>/ kèm parse.log; page cache dùng chung
+- Metadata theo file: <tên pdf>.json cạnh PDF (source, difficulty, tags, target, max_id),
+  không có thì source lấy từ tên file
+- Namespace id: mỗi nguồn một namespace cố định trong bảng sources của database gộp
+  (nhận lại theo hash nội dung, đường dẫn, rồi tên file - mỗi namespace chỉ cho một file
+  trong một lần chạy); id gộp = namespace * ID_BLOCK + số
+  bài trong sách => nguồn đầu tiên (namespace 0) giữ nguyên id gốc
+- Một file lỗi (exception, không parse được position, process chết) không dừng batch:
+  dữ liệu cũ của nguồn đó được giữ, lỗi ghi vào sources và batch_report.json, exit code 1
+
+Usage (từ thư mục scripts):
+    python batch_ingest.py ../data "incoming/*.pdf" [--output output/batch] [--jobs 4]
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+from page_cache import file_hash
+from pipeline import POSITION_COLUMNS, POSITIONS_DDL
+from ultimate_chess_parser import (DEFAULT_DIFFICULTY, DEFAULT_ID_RANGE, DEFAULT_TAGS,
+                                   UltimateChessPDFParser)
+
+# Số id dành cho mỗi nguồn: id gộp = namespace * ID_BLOCK + id trong sách
+ID_BLOCK = 10000
+METADATA_KEYS = ('source', 'difficulty', 'tags', 'target', 'max_id')
+
+
+class IngestJob(NamedTuple):
+    pdf_path: str
+    namespace: int
+    output_dir: str
+    cache_dir: Optional[str]
+    workers: int
+    metadata: Dict
+
+
+def find_pdfs(inputs: Iterable[str]) -> List[Path]:
+    """File PDF từ danh sách file / thư mục / glob, giữ thứ tự, bỏ trùng"""
+    found: Dict[Path, None] = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(p for p in path.iterdir() if p.suffix.lower() == '.pdf')
+        elif any(ch in item for ch in '*?['):
+            matches = [Path(p) for p in sorted(glob.glob(item, recursive=True))]
+        else:
+            matches = [path] if path.exists() else []
+        if not matches:
+            print(f"⚠️  No PDF found for: {item}")
+        for match in matches:
+            found.setdefault(match.resolve(), None)
+    return list(found)
+
+
+def load_metadata(pdf_path: Path) -> Dict:
+    """
+    Metadata của một PDF: file <tên pdf>.json cạnh nó, còn thiếu thì dùng mặc định
+
+    Raises:
+        ValueError: File metadata sai (key lạ, max_id ngoài namespace)
+    """
+    metadata = {
+        'source': pdf_path.stem.replace('_', ' ').replace('-', ' '),
+        'difficulty': DEFAULT_DIFFICULTY,
+        'tags': list(DEFAULT_TAGS),
+        'target': None,
+        'max_id': DEFAULT_ID_RANGE[1],
+    }
+    sidecar = pdf_path.with_suffix('.json')
+    if sidecar.exists():
+        with open(sidecar, encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(METADATA_KEYS)
+        if unknown:
+            raise ValueError(f"{sidecar.name}: unknown keys {sorted(unknown)}")
+        metadata.update(overrides)
+    if not 1 <= int(metadata['max_id']) < ID_BLOCK:
+        raise ValueError(f"max_id must be between 1 and {ID_BLOCK - 1}, got {metadata['max_id']}")
+    return metadata
+
+
+def open_merged(db_path: str) -> sqlite3.Connection:
+    """Database gộp: bảng positions (schema của parser) + sources (namespace theo nguồn)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(POSITIONS_DDL)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sources (
+        namespace INTEGER PRIMARY KEY,
+        id_offset INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        file_path TEXT,
+        file_hash TEXT NOT NULL,
+        positions INTEGER DEFAULT 0,
+        status TEXT,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # Database gộp tạo trước khi có cột file_path
+    if 'file_path' not in [row[1] for row in conn.execute('PRAGMA table_info(sources)')]:
+        conn.execute('ALTER TABLE sources ADD COLUMN file_path TEXT')
+    conn.commit()
+    return conn
+
+
+def assign_namespace(conn: sqlite3.Connection, pdf_path: Path, digest: str, name: str,
+                     claimed: Set[int]) -> int:
+    """
+    Namespace của nguồn, nhận lại theo thứ tự: cùng nội dung, cùng đường dẫn, cùng tên
+    file (bản PDF mới). Namespace đã thuộc về file khác trong lần chạy này (`claimed`)
+    không bao giờ được dùng lại => hai PDF khác nhau luôn có namespace khác nhau.
+    """
+    namespace = None
+    for column, value in (('file_hash', digest), ('file_path', str(pdf_path)), ('file_name', pdf_path.name)):
+        for (candidate,) in conn.execute(f'SELECT namespace FROM sources WHERE {column} = ? ORDER BY namespace',
+                                         (value,)):
+            if candidate not in claimed:
+                namespace = candidate
+                break
+        if namespace is not None:
+            break
+    with conn:
+        if namespace is not None:
+            conn.execute('UPDATE sources SET name = ?, file_name = ?, file_path = ?, file_hash = ? '
+                         'WHERE namespace = ?', (name, pdf_path.name, str(pdf_path), digest, namespace))
+        else:
+            namespace = conn.execute('SELECT COALESCE(MAX(namespace) + 1, 0) FROM sources').fetchone()[0]
+            conn.execute('''INSERT INTO sources (namespace, id_offset, name, file_name, file_path, file_hash,
+                                                 status)
+                            VALUES (?, ?, ?, ?, ?, ?, 'pending')''',
+                         (namespace, namespace * ID_BLOCK, name, pdf_path.name, str(pdf_path), digest))
+    claimed.add(namespace)
+    return namespace
+
+
+def ingest_file(job: IngestJob) -> Dict:
+    """Worker: parse một PDF vào thư mục riêng (stdout ghi vào parse.log)"""
+    started = time.perf_counter()
+    meta = job.metadata
+    result = {'file': job.pdf_path, 'source': meta['source'], 'namespace': job.namespace,
+              'output_dir': job.output_dir, 'positions': 0, 'status': 'failed', 'error': None}
+    os.makedirs(job.output_dir, exist_ok=True)
+    with open(Path(job.output_dir) / 'parse.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            parser = UltimateChessPDFParser(source=meta['source'], difficulty=meta['difficulty'],
+                                            tags=meta['tags'], target=meta['target'],
+                                            id_range=(1, int(meta['max_id'])))
+            result['positions'] = parser.parse_pdf(job.pdf_path, job.output_dir, job.workers,
+                                                   use_cache=job.cache_dir is not None,
+                                                   cache_dir=job.cache_dir, publish=False)
+            if result['positions']:
+                result['status'] = 'ok'
+        except Exception as e:
+            print(f"❌ Error: {e!r}")
+            result['error'] = repr(e)
+    if result['status'] != 'ok' and not result['error']:
+        # parse_pdf tự bắt lỗi và in ra log => lấy dòng lỗi cuối cùng
+        with open(Path(job.output_dir) / 'parse.log', encoding='utf-8') as log:
+            errors = [line.strip('❌ \n') for line in log if line.startswith('❌')]
+        result['error'] = errors[-1] if errors else 'no positions parsed (see parse.log)'
+    result['seconds'] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def _crashed(job: IngestJob, error: BaseException) -> Dict:
+    return {'file': job.pdf_path, 'source': job.metadata['source'], 'namespace': job.namespace,
+            'output_dir': job.output_dir, 'positions': 0, 'status': 'failed',
+            'error': f"worker process died: {error!r}"}
+
+
+def run_jobs(jobs: List[IngestJob], processes: int) -> Iterator[Dict]:
+    """
+    Chạy các job trên process pool, trả kết quả theo thứ tự hoàn thành
+
+    Một process chết (segfault, OOM kill) làm hỏng cả pool: các job chưa xong được chạy
+    lại từng file một trong pool riêng để chỉ file gây lỗi bị đánh dấu failed.
+    """
+    retry = []
+    with ProcessPoolExecutor(max_workers=processes, max_tasks_per_child=1) as pool:
+        futures = {pool.submit(ingest_file, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                retry.append(futures[future])
+    for job in retry:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            try:
+                yield pool.submit(ingest_file, job).result()
+            except BrokenProcessPool as e:
+                yield _crashed(job, e)
+
+
+def merge_source(conn: sqlite3.Connection, result: Dict) -> int:
+    """
+    Thay các position của một nguồn trong database gộp bằng kết quả mới (một transaction)
+
+    Returns:
+        Số position đã gộp
+    """
+    offset = result['namespace'] * ID_BLOCK
+    db_file = str(Path(result['output_dir']) / 'chess_puzzles.db')
+    columns = ', '.join(POSITION_COLUMNS)
+    selected = ', '.join('id + ?' if column == 'id' else column for column in POSITION_COLUMNS)
+    conn.execute('ATTACH DATABASE ? AS source_db', (db_file,))
+    try:
+        with conn:
+            conn.execute('DELETE FROM positions WHERE id >= ? AND id < ?', (offset, offset + ID_BLOCK))
+            merged = conn.execute(f'INSERT INTO positions ({columns}) SELECT {selected} FROM source_db.positions',
+                                  (offset,)).rowcount
+            conn.execute('''UPDATE sources SET positions = ?, status = 'ok', error = NULL,
+                            updated_at = CURRENT_TIMESTAMP WHERE namespace = ?''',
+                         (merged, result['namespace']))
+    finally:
+        conn.execute('DETACH DATABASE source_db')
+    return merged
+
+
+def record_failure(conn: sqlite3.Connection, result: Dict) -> None:
+    """Ghi lỗi của một nguồn; position đã gộp từ lần chạy trước được giữ nguyên"""
+    with conn:
+        conn.execute('''UPDATE sources SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE namespace = ?''', (result['error'], result['namespace']))
+
+
+def main():
+    """Main function"""
+    cli = argparse.ArgumentParser(description='Parse many puzzle PDFs in parallel into one database')
+    cli.add_argument('inputs', nargs='+', help='PDF files, directories or glob patterns')
+    cli.add_argument('--output', default='output/batch', help='Output directory (merged DB, per-file results)')
+    cli.add_argument('--jobs', type=int, default=None, help='PDFs parsed at once (default: CPU count)')
+    cli.add_argument('--workers', type=int, default=1, help='Worker processes inside each PDF job')
+    cli.add_argument('--no-cache', action='store_true', help='Ignore and do not update the shared page cache')
+    cli.add_argument('--no-publish', action='store_true', help='Do not copy the merged DB to backend/')
+    args = cli.parse_args()
+
+    # Check dependencies
+    try:
+        import pdfplumber  # noqa: F401
+    except ImportError:
+        print("❌ Missing dependency: pdfplumber")
+        print("💡 Install with: pip install pdfplumber")
+        sys.exit(1)
+
+    pdfs = find_pdfs(args.inputs)
+    if not pdfs:
+        print("❌ No PDF files to ingest")
+        sys.exit(1)
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    db_file = output / 'chess_puzzles.db'
+    cache_dir = None if args.no_cache else str(output / 'page_cache')
+    jobs_count = max(1, min(args.jobs or os.cpu_count() or 1, len(pdfs)))
+
+    print("\n" + "=" * 80)
+    print(f"📚 BATCH INGEST - {len(pdfs)} PDF files, {jobs_count} at a time")
+    print("=" * 80)
+
+    started = time.perf_counter()
+    conn = open_merged(str(db_file))
+    jobs, results = [], []
+    seen: Dict[str, Path] = {}
+    claimed: Set[int] = set()
+    for pdf in pdfs:
+        try:
+            metadata = load_metadata(pdf)
+            digest = file_hash(str(pdf))
+        except (OSError, ValueError) as e:
+            print(f"❌ {pdf.name}: {e}")
+            results.append({'file': str(pdf), 'source': None, 'namespace': None, 'positions': 0,
+                            'status': 'failed', 'error': str(e)})
+            continue
+        if digest in seen:
+            print(f"⚠️  {pdf.name}: same content as {seen[digest].name} - skipped")
+            continue
+        seen[digest] = pdf
+        namespace = assign_namespace(conn, pdf, digest, metadata['source'], claimed)
+        jobs.append(IngestJob(str(pdf), namespace, str(output / 'files' / f'{namespace:04d}-{pdf.stem}'),
+                              cache_dir, args.workers, metadata))
+
+    files = len(results) + len(jobs)
+    try:
+        for result in run_jobs(jobs, jobs_count) if jobs else ():
+            if result['status'] == 'ok':
+                try:
+                    result['positions'] = merge_source(conn, result)
+                except sqlite3.Error as e:
+                    result.update(status='failed', error=f"merge failed: {e}")
+            if result['status'] != 'ok':
+                record_failure(conn, result)
+            results.append(result)
+            name = Path(result['file']).name
+            if result['status'] == 'ok':
+                print(f"✅ [{len(results)}/{files}] {name}: {result['positions']} positions "
+                      f"(ids {result['namespace'] * ID_BLOCK + 1}+, {result.get('seconds', 0):.1f}s)")
+            else:
+                print(f"❌ [{len(results)}/{files}] {name}: {result['error']}")
+        sources = conn.execute('SELECT namespace, name, positions, status FROM sources ORDER BY namespace').fetchall()
+        total = conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+    finally:
+        conn.close()
+
+    failed = [r for r in results if r['status'] != 'ok']
+    report_file = output / 'batch_report.json'
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump({'files': len(results), 'ok': len(results) - len(failed), 'failed': len(failed),
+                   'seconds': round(time.perf_counter() - started, 2), 'results': results},
+                  f, indent=2, ensure_ascii=False)
+
+    print(f"\n📊 MERGED DATABASE: {db_file} ({total:,} positions)")
+    for namespace, name, positions, status in sources:
+        print(f"   {'✅' if status == 'ok' else '❌'} [{namespace:>3}] {name}: {positions:,} positions ({status})")
+    print(f"✅ Batch report saved: {report_file}")
+
+    if not args.no_publish and total:
+        backend_path = Path('backend')
+        backend_path.mkdir(exist_ok=True)
+        shutil.copy(str(db_file), str(backend_path / 'chess_puzzles.db'))
+        print(f"✅ Copied to backend: {backend_path / 'chess_puzzles.db'}")
+
+    if failed:
+        print(f"\n⚠️  {len(failed)} of {len(results)} files failed - see {report_file}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
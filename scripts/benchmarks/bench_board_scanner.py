@@ -0,0 +1,199 @@
+"""
+Benchmark + regression: BoardScanner (một lượt, state machine) vs strategy 1 cũ
+
+- Đo thời gian parse_positions_strategy1 cũ (re.match chưa compile, quét lại tối đa 50
+  dòng và dựng context 18 dòng cho mỗi dòng số) và bản mới trên dòng text của PDF,
+  lặp lại --copies lần để thấy độ phức tạp; mỗi lần so output giống hệt. "blocks only"
+  là riêng phần tách block (FEN + determine_turn là chi phí chung của hai bản)
+- Regression corpus (benchmarks/corpus):
+  * ramakrishnan_strategy1.jsonl: [id, fen, strategy] của PDF kèm repo, sinh bằng bản cũ
+  * scanner_cases.json: ca nhỏ (thiếu footer, bàn lẻ, nhãn hàng, 3 bàn cạnh nhau,
+    dòng lời giải trong block...); ca "legacy" phải khớp cả bản cũ
+  Sai khác => exit code 1. --write-corpus sinh lại corpus (PDF và ca legacy từ bản cũ).
+
+Usage (từ thư mục scripts):
+    python benchmarks/bench_board_scanner.py [../data/RAMAKRISHNAN-MATE-IN-2.pdf] [--copies 1 10] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from board_scanner import BoardScanner  # noqa: E402
+from page_cache import PageTextCache  # noqa: E402
+from ultimate_chess_parser import UltimateChessPDFParser  # noqa: E402
+
+DEFAULT_PDF = Path(__file__).resolve().parents[2] / 'data' / 'RAMAKRISHNAN-MATE-IN-2.pdf'
+DEFAULT_CACHE = Path(__file__).resolve().parents[1] / 'output' / 'page_cache'
+CORPUS = Path(__file__).resolve().parent / 'corpus'
+PDF_CORPUS = CORPUS / 'ramakrishnan_strategy1.jsonl'
+CASES = CORPUS / 'scanner_cases.json'
+
+
+def legacy_strategy1(parser: UltimateChessPDFParser, lines: List[str]) -> List[Dict]:
+    """parse_positions_strategy1 trước BoardScanner (giữ nguyên để so sánh)"""
+    positions = []
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip().replace("'", "")
+        if re.match(r'^\d+\s+\d+$', line):
+            try:
+                numbers = line.split()
+                pos_id1 = int(numbers[0])
+                pos_id2 = int(numbers[1])
+                if 1 <= pos_id1 <= 800 and 1 <= pos_id2 <= 800:
+                    context_lines = []
+                    for k in range(max(0, i-3), min(len(lines), i+15)):
+                        context_lines.append(lines[k])
+                    rows_left = []
+                    rows_right = []
+                    for j in range(i+1, min(i+50, len(lines))):
+                        row_line = lines[j].strip()
+                        if re.match(r'^\d+\s+\d+$', row_line.replace("'", "")):
+                            continue
+                        if 'a b c d e f g h' in row_line:
+                            break
+                        cleaned = parser.clean_row(row_line)
+                        if len(cleaned) >= 16:
+                            rows_left.append(cleaned[:8])
+                            rows_right.append(cleaned[8:16])
+                            if len(rows_left) == 8:
+                                break
+                        elif len(cleaned) >= 8 and len(rows_left) < 8:
+                            rows_left.append(cleaned[:8])
+                    if len(rows_left) == 8:
+                        fen_rows = [parser.row_to_fen(row) for row in rows_left]
+                        to_move = parser.determine_turn(rows_left, pos_id1, context_lines)
+                        positions.append({'id': pos_id1, 'fen': '/'.join(fen_rows) + f' {to_move} KQkq - 0 1',
+                                          'strategy': 'pattern_pairs_left'})
+                    if len(rows_right) == 8:
+                        fen_rows = [parser.row_to_fen(row) for row in rows_right]
+                        to_move = parser.determine_turn(rows_right, pos_id2, context_lines)
+                        positions.append({'id': pos_id2, 'fen': '/'.join(fen_rows) + f' {to_move} KQkq - 0 1',
+                                          'strategy': 'pattern_pairs_right'})
+            except (ValueError, IndexError):
+                pass
+        i += 1
+    return positions
+
+
+def scan(lines: List[str]) -> List[Dict]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return UltimateChessPDFParser().parse_positions_strategy1(lines)
+
+
+def blocks_only(lines: List[str]) -> int:
+    """Chỉ tách block (không dựng FEN / xác định bên đi - phần chung của hai bản)"""
+    scanner = BoardScanner(UltimateChessPDFParser().clean_row)
+    count = 0
+    for line in lines:
+        count += len(scanner.feed(line))
+    return count + len(scanner.finish())
+
+
+def legacy(lines: List[str]) -> List[Dict]:
+    return legacy_strategy1(UltimateChessPDFParser(), lines)
+
+
+def rows(positions: List[Dict]) -> List[List]:
+    return [[p['id'], p['fen'], p['strategy']] for p in positions]
+
+
+def timed(fn, lines: List[str], repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(lines)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def check_corpus(lines: List[str]) -> List[str]:
+    failures = []
+    with open(PDF_CORPUS, encoding='utf-8') as f:
+        expected = [json.loads(line) for line in f if line.strip()]
+    got = rows(scan(lines))
+    if got != expected:
+        diff = next((i for i, (a, b) in enumerate(zip(got, expected)) if a != b), min(len(got), len(expected)))
+        failures.append(f"{PDF_CORPUS.name}: {len(got)} positions vs {len(expected)} expected, first difference "
+                        f"at #{diff}")
+
+    with open(CASES, encoding='utf-8') as f:
+        cases = json.load(f)
+    for case in cases:
+        got = rows(scan(case['lines']))
+        if got != case['expected']:
+            failures.append(f"{CASES.name} '{case['name']}': got {got}")
+        if case.get('legacy') and rows(legacy(case['lines'])) != case['expected']:
+            failures.append(f"{CASES.name} '{case['name']}': legacy parser disagrees with expected output")
+    return failures
+
+
+def write_corpus(lines: List[str]) -> None:
+    CORPUS.mkdir(exist_ok=True)
+    with open(PDF_CORPUS, 'w', encoding='utf-8') as f:
+        for row in rows(legacy(lines)):
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+    with open(CASES, encoding='utf-8') as f:
+        cases = json.load(f)
+    for case in cases:
+        case['expected'] = rows(legacy(case['lines']) if case.get('legacy') else scan(case['lines']))
+    with open(CASES, 'w', encoding='utf-8') as f:
+        json.dump(cases, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    print(f"✅ Corpus written: {PDF_CORPUS}, {CASES}")
+
+
+def main():
+    cli = argparse.ArgumentParser(description='Benchmark the single-pass board scanner against strategy 1')
+    cli.add_argument('pdf', nargs='?', default=str(DEFAULT_PDF), help='PDF to scan')
+    cli.add_argument('--cache', default=str(DEFAULT_CACHE), help='Page text cache directory')
+    cli.add_argument('--copies', type=int, nargs='+', default=[1, 10], help='Times the line list is repeated')
+    cli.add_argument('--repeat', type=int, default=3, help='Runs per size (best is reported)')
+    cli.add_argument('--write-corpus', action='store_true', help='Regenerate the regression corpus')
+    args = cli.parse_args()
+
+    if not Path(args.pdf).exists():
+        print(f"❌ File not found: {args.pdf}")
+        sys.exit(1)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        lines = UltimateChessPDFParser().read_pdf(args.pdf, cache=PageTextCache(args.cache))
+    print(f"📄 {args.pdf}: {len(lines):,} lines")
+
+    if args.write_corpus:
+        write_corpus(lines)
+        return
+
+    mismatch = False
+    for copies in args.copies:
+        book = lines * copies
+        old_time, old = timed(legacy, book, args.repeat)
+        new_time, new = timed(scan, book, args.repeat)
+        blocks_time, _ = timed(blocks_only, book, args.repeat)
+        same = old == new
+        mismatch |= not same
+        print(f"   {len(book):>9,} lines | legacy {old_time * 1000:8.1f} ms | scanner {new_time * 1000:8.1f} ms "
+              f"(blocks only {blocks_time * 1000:7.1f} ms) | speedup {old_time / new_time:4.1f}x | "
+              f"{len(new):,} positions "
+              f"{'✅ identical' if same else '❌ DIFFERENT'}")
+
+    failures = check_corpus(lines)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures or mismatch:
+        sys.exit(1)
+    print("✅ Regression corpus matches")
+
+
+if __name__ == '__main__':
+    main()
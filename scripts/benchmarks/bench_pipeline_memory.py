@@ -0,0 +1,98 @@
+"""
+Benchmark: bộ nhớ đỉnh của pipeline dạng stream theo số trang PDF
+
+Dựng "tuyển tập" N trang bằng cách lặp lại text các trang của sách (đọc qua page cache,
+chạy parser một lần trước để cache ấm) rồi đưa qua:
+- stream: parser.run_pipeline (dòng -> bàn cờ + lời giải -> ghép -> enrichment -> JSON + SQLite
+  -> validation đọc lại từ database)
+- list: cách cũ - list toàn bộ dòng, full_text cho parse_solutions, list positions, json.dump
+  (chưa tính turn inference / validation)
+Mỗi lần chạy trong một process riêng; đo peak heap Python (tracemalloc) và peak RSS.
+Bộ nhớ của stream phải gần như không đổi khi số trang tăng.
+
+Usage (từ thư mục scripts):
+    python benchmarks/bench_pipeline_memory.py [../data/RAMAKRISHNAN-MATE-IN-2.pdf] [--pages 144 1440 5040]
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from page_cache import PageTextCache  # noqa: E402
+from ultimate_chess_parser import UltimateChessPDFParser  # noqa: E402
+
+DEFAULT_PDF = Path(__file__).resolve().parents[2] / 'data' / 'RAMAKRISHNAN-MATE-IN-2.pdf'
+DEFAULT_CACHE = Path(__file__).resolve().parents[1] / 'output' / 'page_cache'
+
+
+def anthology(book, pages: int):
+    """Text của `pages` trang: sách lặp lại nhiều lần (mỗi lần gồm bàn cờ rồi lời giải)"""
+    return itertools.islice(itertools.cycle(book), pages)
+
+
+def run(mode: str, book, pages: int, results) -> None:
+    parser = UltimateChessPDFParser()
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        os.chdir(tmp)  # save_results copy vào ./backend
+        tracemalloc.start()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            if mode == 'stream':
+                saved = parser.run_pipeline(anthology(book, pages), 'output', workers=1)
+            else:
+                lines = list(parser.iter_lines(anthology(book, pages)))
+                positions = parser.parse_positions_strategy1(lines)
+                solutions = parser.parse_solutions('\n'.join(lines))
+                positions = parser.enhance_positions(positions, solutions)
+                os.makedirs('output', exist_ok=True)
+                with open('output/chess_positions.json', 'w', encoding='utf-8') as f:
+                    json.dump(positions, f, indent=2, ensure_ascii=False)
+                parser._save_to_sqlite(positions, 'output/chess_puzzles.db')
+                saved = len(positions)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((elapsed, peak / 1024 / 1024, rss, parser.stats['total_lines'], saved))
+
+
+def main():
+    cli = argparse.ArgumentParser(description='Peak memory of the streaming parse pipeline vs page count')
+    cli.add_argument('pdf', nargs='?', default=str(DEFAULT_PDF), help='PDF whose pages are repeated')
+    cli.add_argument('--pages', type=int, nargs='+', default=[144, 1440, 5040], help='Anthology sizes')
+    cli.add_argument('--cache', default=str(DEFAULT_CACHE), help='Page text cache directory')
+    cli.add_argument('--modes', nargs='+', default=['list', 'stream'], choices=['list', 'stream'])
+    args = cli.parse_args()
+
+    if not Path(args.pdf).exists():
+        print(f"❌ File not found: {args.pdf}")
+        sys.exit(1)
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        book = list(UltimateChessPDFParser().iter_page_texts(args.pdf, cache=PageTextCache(args.cache)))
+    print(f"📄 {args.pdf}: {len(book)} pages")
+
+    for pages in args.pages:
+        for mode in args.modes:
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run, args=(mode, book, pages, results))
+            process.start()
+            elapsed, heap_mb, rss_mb, lines, saved = results.get()
+            process.join()
+            print(f"   {pages:>6,} pages {mode:<6} {elapsed:6.2f}s | peak heap {heap_mb:7.1f} MB | "
+                  f"peak RSS {rss_mb:6.1f} MB | {lines:,} lines | {saved:,} positions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: read_pdf tuần tự vs song song theo page range
+
+Đo thời gian trích text của cả PDF với từng số worker, kiểm tra danh sách dòng
+giống hệt bản tuần tự (thứ tự trang + nối trang) và in speedup theo số core.
+Cuối cùng đo lần đọc thứ hai khi mọi trang đã có trong page cache.
+
+Usage (từ thư mục scripts):
+    python benchmarks/bench_read_pdf.py [../data/RAMAKRISHNAN-MATE-IN-2.pdf] [--workers 1 2 4] [--repeat 1]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from page_cache import PageTextCache  # noqa: E402
+from ultimate_chess_parser import UltimateChessPDFParser  # noqa: E402
+
+DEFAULT_PDF = Path(__file__).resolve().parents[2] / 'data' / 'RAMAKRISHNAN-MATE-IN-2.pdf'
+
+
+def timed_read(pdf_path: str, workers: int, cache=None):
+    parser = UltimateChessPDFParser()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        lines = parser.read_pdf(pdf_path, workers, cache)
+    return time.perf_counter() - started, lines
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    defaults = sorted({1, 2, 4, cpus} if cpus > 1 else {1, 2})
+    parser = argparse.ArgumentParser(description='Benchmark parallel PDF page extraction')
+    parser.add_argument('pdf', nargs='?', default=str(DEFAULT_PDF), help='PDF to extract')
+    parser.add_argument('--workers', type=int, nargs='+', default=defaults, help='Worker counts to try')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per worker count (best is reported)')
+    args = parser.parse_args()
+
+    if not Path(args.pdf).exists():
+        print(f"❌ File not found: {args.pdf}")
+        sys.exit(1)
+
+    print(f"📄 {args.pdf} | cpus: {cpus}")
+    baseline, reference = None, None
+    for workers in args.workers:
+        runs = [timed_read(args.pdf, workers) for _ in range(args.repeat)]
+        elapsed = min(r[0] for r in runs)
+        lines = runs[0][1]
+        if reference is None:
+            baseline, reference = elapsed, lines
+        same = '✅ identical' if lines == reference else '❌ DIFFERENT'
+        print(f"   workers {workers:>2}: {elapsed:6.2f}s | speedup {baseline / elapsed:4.2f}x | "
+              f"{len(lines):,} lines {same}")
+
+    # Lần đọc thứ hai với page cache: không mở pdfplumber
+    with tempfile.TemporaryDirectory() as tmp:
+        timed_read(args.pdf, max(args.workers), PageTextCache(tmp))
+        elapsed, lines = timed_read(args.pdf, max(args.workers), PageTextCache(tmp))
+        same = '✅ identical' if lines == reference else '❌ DIFFERENT'
+        print(f"   cached    : {elapsed:6.3f}s | speedup {baseline / elapsed:4.0f}x | {len(lines):,} lines {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Board Scanner - tách block bàn cờ khỏi text PDF trong một lượt quét tuyến tính
+
+Mỗi dòng được phân loại đúng một lần (tokenizer), rồi một state machine giữ các block
+đang mở và đẩy từng token vào chúng - không quét lại 50 dòng phía sau cho mỗi dòng số
+hiệu như cách cũ.
+
+Loại dòng:
+- IDS: chỉ gồm các số ("32 35", "1 2 3"; cả nhãn hàng "8 8") - mở block với số bàn cờ
+  nằm cạnh nhau bằng số id (chỉ khi mọi id trong khoảng hợp lệ)
+- FOOTER: "a b c d e f g h" - đóng các block đang mở
+- SOLUTION: dòng có "Solution-" - không bao giờ được lấy làm hàng bàn cờ
+- ROW: còn ít nhất 8 ký tự quân / ô sau clean_row - mỗi 8 ký tự là hàng của một bàn cờ
+- NOISE: còn lại
+
+Quy tắc block giữ nguyên parse_positions_strategy1 cũ (output giống hệt trên PDF kèm
+repo, xem benchmarks/bench_board_scanner.py): tối đa 49 dòng sau dòng id, dòng IDS bị
+bỏ qua, hàng đủ mọi bàn cờ được thêm cho tất cả và block đóng khi bàn đầu đủ 8 hàng,
+hàng thiếu chỉ thêm cho các bàn bên trái còn chưa đủ 8. Context xác định bên đi là dòng
+đầu tiên có ký hiệu trong khoảng 3 dòng trước đến 14 dòng sau dòng id.
+"""
+
+import re
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional, Tuple
+
+IDS, FOOTER, SOLUTION, ROW, NOISE = 'ids', 'footer', 'solution', 'row', 'noise'
+
+ID_LINE = re.compile(r'^\d+(?:\s+\d+)+$')
+FOOTER_MARK = 'a b c d e f g h'
+SOLUTION_MARK = 'Solution-'
+BOARD_SIZE = 8
+
+# Dòng tìm hàng bàn cờ sau dòng id / dòng context trước và sau dòng id
+ROWS_AHEAD = 49
+CONTEXT_BEHIND = 3
+CONTEXT_AHEAD = 14
+
+
+class Token(NamedTuple):
+    kind: str
+    ids: Tuple[int, ...] = ()
+    cells: str = ''  # ROW: các ký tự đã clean
+
+
+class Block(NamedTuple):
+    """Một dòng id và các bàn cờ bên dưới (mỗi bàn: danh sách hàng 8 ký tự, có thể thiếu)"""
+    line_no: int
+    ids: Tuple[int, ...]
+    boards: List[List[str]]
+    context: Optional[str]  # dòng context đầu tiên có ký hiệu bên đi
+
+
+def turn_marker(line: str) -> Optional[str]:
+    """'w' / 'b' nếu dòng có ký hiệu bên đi (□ / WHITE / W: - ■ / BLACK / B:)"""
+    if '□' in line or 'WHITE' in line.upper() or 'W:' in line:
+        return 'w'
+    if '■' in line or 'BLACK' in line.upper() or 'B:' in line:
+        return 'b'
+    return None
+
+
+def classify(line: str, clean: Callable[[str], str]) -> Token:
+    """Phân loại một dòng text"""
+    text = line.strip()
+    digits = text.replace("'", "") if "'" in text else text
+    if digits[:1].isdigit() and ID_LINE.match(digits):
+        return Token(IDS, tuple(int(n) for n in digits.split()))
+    if FOOTER_MARK in text:
+        return Token(FOOTER)
+    if SOLUTION_MARK in text:
+        return Token(SOLUTION)
+    cells = clean(text)
+    if len(cells) >= BOARD_SIZE:
+        return Token(ROW, cells=cells)
+    return Token(NOISE)
+
+
+class _OpenBlock:
+    __slots__ = ('line_no', 'ids', 'boards', 'context', 'last_line', 'rows_done')
+
+    def __init__(self, line_no: int, ids: Tuple[int, ...], context: Optional[str]):
+        self.line_no = line_no
+        self.ids = ids
+        self.boards: List[List[str]] = [[] for _ in ids]
+        self.context = context
+        self.last_line = line_no + ROWS_AHEAD  # dòng cuối cùng còn tìm hàng
+        self.rows_done = False
+
+    def consume(self, token: Token) -> None:
+        """Đẩy một token ROW / FOOTER vào block (token khác không đổi trạng thái)"""
+        if token.kind == FOOTER:
+            self.rows_done = True
+            return
+        across = len(token.cells) // BOARD_SIZE
+        if across >= len(self.boards):
+            for index, board in enumerate(self.boards):
+                board.append(token.cells[index * BOARD_SIZE:(index + 1) * BOARD_SIZE])
+            if len(self.boards[0]) == BOARD_SIZE:
+                self.rows_done = True
+        else:
+            for index in range(across):
+                if len(self.boards[index]) < BOARD_SIZE:
+                    self.boards[index].append(token.cells[index * BOARD_SIZE:(index + 1) * BOARD_SIZE])
+
+
+class BoardScanner:
+    """
+    State machine quét từng dòng một, phát ra Block theo thứ tự dòng id
+
+    Chỉ dòng ROW / FOOTER được đẩy vào các block đang mở; block hết hạn theo số dòng
+    (last_line) nên dòng NOISE không tốn gì ngoài lần phân loại.
+
+    Args:
+        clean: Hàm lọc ký tự bàn cờ của một dòng (parser.clean_row)
+        id_range: Khoảng id hợp lệ (ngoài khoảng => dòng số không mở block)
+    """
+
+    def __init__(self, clean: Callable[[str], str], id_range: Tuple[int, int] = (1, 800)):
+        self.clean = clean
+        self.id_range = id_range
+        self.line_no = 0
+        self.counts = {kind: 0 for kind in (IDS, FOOTER, SOLUTION, ROW, NOISE)}
+        self._open: Deque[_OpenBlock] = deque()
+        self._recent: Deque[str] = deque(maxlen=CONTEXT_BEHIND)
+
+    def feed(self, line: str) -> List[Block]:
+        """Đưa vào một dòng; trả về các block vừa hoàn tất"""
+        line_no = self.line_no
+        self.line_no += 1
+        token = classify(line, self.clean)
+        self.counts[token.kind] += 1
+        open_blocks = self._open
+
+        if token.kind == ROW or token.kind == FOOTER:
+            for block in open_blocks:
+                if not block.rows_done and line_no <= block.last_line:
+                    block.consume(token)
+
+        # Ký hiệu bên đi: chỉ tìm khi block mới nhất còn trong khoảng context
+        if open_blocks and line_no <= open_blocks[-1].line_no + CONTEXT_AHEAD and turn_marker(line):
+            for block in open_blocks:
+                if block.context is None and line_no <= block.line_no + CONTEXT_AHEAD:
+                    block.context = line
+
+        low, high = self.id_range
+        if token.kind == IDS and all(low <= pos_id <= high for pos_id in token.ids):
+            context = next((previous for previous in self._recent if turn_marker(previous)),
+                           line if turn_marker(line) else None)
+            open_blocks.append(_OpenBlock(line_no, token.ids, context))
+        self._recent.append(line)
+
+        done = []
+        while open_blocks:
+            first = open_blocks[0]
+            if line_no < first.line_no + CONTEXT_AHEAD or not (first.rows_done or line_no >= first.last_line):
+                break
+            done.append(self._emit(open_blocks.popleft()))
+        return done
+
+    def finish(self) -> List[Block]:
+        """Kết thúc input: phát mọi block còn mở"""
+        done = [self._emit(block) for block in self._open]
+        self._open.clear()
+        return done
+
+    @staticmethod
+    def _emit(block: _OpenBlock) -> Block:
+        return Block(block.line_no, block.ids, block.boards, block.context)
@@ -0,0 +1,810 @@
+"""
+Bitboard Mate Solver - kiểm chứng puzzle "mate in N"
+
+Chức năng:
+- Sinh nước đi bằng bitboard (int 64-bit), bảng tấn công dựng sẵn lúc import:
+  mã/vua/tốt theo ô, xe/tượng tra theo (ô, occupancy đã mask) - "magic" không cần phép nhân
+- Tìm chiếu hết giới hạn độ sâu (AND/OR search) với thứ tự nước đi: gợi ý lời giải,
+  nước chiếu, nước ăn quân; bên phòng thủ thử trước nước đã bác bỏ lần trước (killer)
+- CLI chạy trên bảng positions của puzzles DB bằng process pool
+- Bộ perft chuẩn để kiểm tra sinh nước đi, benchmark nodes/giây
+
+Không phụ thuộc thư viện ngoài (python-chess chỉ dùng ở backend).
+
+Usage:
+    python scripts/mate_solver.py                       # kiểm tra mọi puzzle trong DB
+    python scripts/mate_solver.py --ids 1,2,98 --depth 2 --report output/mate_report.json
+    python scripts/mate_solver.py --perft [--perft-depth 4]
+    python scripts/mate_solver.py --bench
+
+Library:
+    from mate_solver import Position, MateSearch
+    result = MateSearch().find_mate(Position.from_fen(fen), max_depth=2)
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+NO_PIECE = 7
+PIECE_CHARS = 'PNBRQK'
+
+# Cờ đặc biệt của nước đi
+NORMAL, EN_PASSANT, CASTLE, DOUBLE_PUSH = range(4)
+
+# Quyền nhập thành
+WK, WQ, BK, BQ = 1, 2, 4, 8
+
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+
+DEFAULT_DB = Path(__file__).resolve().parent.parent / 'backend' / 'data' / 'chess_puzzles.db'
+ANNOTATIONS = re.compile(r'[+#!?]+$')
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+
+
+def square_name(sq: int) -> str:
+    return 'abcdefgh'[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name: str) -> int:
+    return 'abcdefgh'.index(name[0]) + 8 * (int(name[1]) - 1)
+
+
+def iter_bits(bb: int) -> Iterator[int]:
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+# ==================== ATTACK TABLES ====================
+
+def _step_table(deltas: List[Tuple[int, int]]) -> List[int]:
+    table = []
+    for sq in range(64):
+        rank, file = divmod(sq, 8)
+        bb = 0
+        for dr, df in deltas:
+            r, f = rank + dr, file + df
+            if 0 <= r < 8 and 0 <= f < 8:
+                bb |= 1 << (r * 8 + f)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_table([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = [_step_table([(1, -1), (1, 1)]), _step_table([(-1, -1), (-1, 1)])]
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def _rays(sq: int, directions) -> List[List[int]]:
+    rank, file = divmod(sq, 8)
+    rays = []
+    for dr, df in directions:
+        ray = []
+        r, f = rank + dr, file + df
+        while 0 <= r < 8 and 0 <= f < 8:
+            ray.append(1 << (r * 8 + f))
+            r, f = r + dr, f + df
+        rays.append(ray)
+    return rays
+
+
+def _slider_tables(directions) -> Tuple[List[int], List[Dict[int, int]]]:
+    """
+    Bảng tấn công của quân trượt cho từng ô
+
+    Returns:
+        (masks, tables) - tables[sq][occupancy & masks[sq]] = các ô bị tấn công
+    """
+    masks, tables = [], []
+    for sq in range(64):
+        rays = _rays(sq, directions)
+        # Ô cuối của mỗi tia không ảnh hưởng kết quả => bỏ khỏi mask
+        ray_masks = [sum(ray[:-1]) for ray in rays]
+        ray_tables = []
+        for ray, ray_mask in zip(rays, ray_masks):
+            table = {}
+            subset = 0
+            while True:
+                attacks = 0
+                for bit in ray:
+                    attacks |= bit
+                    if bit & subset:
+                        break
+                table[subset] = attacks
+                subset = (subset - ray_mask) & ray_mask
+                if subset == 0:
+                    break
+            ray_tables.append(table)
+
+        mask = sum(ray_masks)
+        table = {}
+        subset = 0
+        while True:
+            attacks = 0
+            for ray_mask, ray_table in zip(ray_masks, ray_tables):
+                attacks |= ray_table[subset & ray_mask]
+            table[subset] = attacks
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, ROOK_TABLES = _slider_tables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _slider_tables(BISHOP_DIRECTIONS)
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    return ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    return BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]]
+
+
+# Nhập thành: ô đích của vua -> (ô xe đi, ô xe đến)
+CASTLE_ROOKS = {6: (7, 5), 2: (0, 3), 62: (63, 61), 58: (56, 59)}
+# Quyền nhập thành còn lại khi có quân rời / đến ô này
+CASTLE_KEEP = [WK | WQ | BK | BQ] * 64
+CASTLE_KEEP[4] &= ~(WK | WQ)
+CASTLE_KEEP[7] &= ~WK
+CASTLE_KEEP[0] &= ~WQ
+CASTLE_KEEP[60] &= ~(BK | BQ)
+CASTLE_KEEP[63] &= ~BK
+CASTLE_KEEP[56] &= ~BQ
+
+
+def encode_move(frm: int, to: int, piece: int, captured: int = NO_PIECE,
+                promotion: int = 0, flag: int = NORMAL) -> int:
+    """Nước đi gói trong một int: from | to | quân | quân bị ăn | phong cấp | cờ"""
+    return frm | to << 6 | piece << 12 | captured << 15 | promotion << 18 | flag << 21
+
+
+def move_uci(move: int) -> str:
+    promotion = move >> 18 & 7
+    return square_name(move & 63) + square_name(move >> 6 & 63) + ('nbrq'[promotion - 1] if promotion else '')
+
+
+# ==================== POSITION ====================
+
+class Position:
+    """Thế cờ bitboard bất biến: make() trả về Position mới"""
+
+    __slots__ = ('bb', 'occ', 'turn', 'castling', 'ep')
+
+    def __init__(self, bb: List[int], turn: int, castling: int = 0, ep: int = -1):
+        self.bb = bb  # 12 bitboard: màu * 6 + loại quân
+        self.occ = [bb[0] | bb[1] | bb[2] | bb[3] | bb[4] | bb[5],
+                    bb[6] | bb[7] | bb[8] | bb[9] | bb[10] | bb[11]]
+        self.turn = turn
+        self.castling = castling
+        self.ep = ep
+
+    @classmethod
+    def from_fen(cls, fen: str, sanitize: bool = True) -> 'Position':
+        """
+        Parse FEN
+
+        Args:
+            fen: Chuỗi FEN (có thể chỉ có phần bàn cờ)
+            sanitize: Bỏ quyền nhập thành / ô bắt tốt qua đường không khớp với bàn cờ
+                      (parser PDF luôn ghi "KQkq")
+
+        Raises:
+            ValueError: FEN không hợp lệ
+        """
+        fields = fen.split()
+        rows = fields[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f'Invalid FEN board: {fen}')
+
+        bb = [0] * 12
+        for row_index, row in enumerate(rows):
+            rank = 7 - row_index
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+                piece = PIECE_CHARS.find(char.upper())
+                if piece < 0 or file > 7:
+                    raise ValueError(f'Invalid FEN board: {fen}')
+                color = WHITE if char.isupper() else BLACK
+                bb[color * 6 + piece] |= 1 << (rank * 8 + file)
+                file += 1
+            if file != 8:
+                raise ValueError(f'Invalid FEN row: {row}')
+
+        turn = BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+        castling = 0
+        for char in (fields[2] if len(fields) > 2 else '-'):
+            castling |= {'K': WK, 'Q': WQ, 'k': BK, 'q': BQ}.get(char, 0)
+        ep = parse_square(fields[3]) if len(fields) > 3 and fields[3] != '-' else -1
+
+        if sanitize:
+            squares = {WK: (4, 7, WHITE), WQ: (4, 0, WHITE), BK: (60, 63, BLACK), BQ: (60, 56, BLACK)}
+            for right, (king_sq, rook_sq, color) in squares.items():
+                if not (bb[color * 6 + KING] >> king_sq & 1 and bb[color * 6 + ROOK] >> rook_sq & 1):
+                    castling &= ~right
+            if ep >= 0:
+                # Ô bắt tốt qua đường chỉ hợp lệ khi vừa có tốt đối phương đi 2 ô
+                pawn_sq = ep - 8 if turn == WHITE else ep + 8
+                if not (0 <= pawn_sq < 64 and bb[(turn ^ 1) * 6 + PAWN] >> pawn_sq & 1):
+                    ep = -1
+
+        return cls(bb, turn, castling, ep)
+
+    def fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for file in range(8):
+                char = self.piece_char(rank * 8 + file)
+                if char:
+                    row += (str(empty) if empty else '') + char
+                    empty = 0
+                else:
+                    empty += 1
+            rows.append(row + (str(empty) if empty else ''))
+        castling = ''.join(c for c, r in zip('KQkq', (WK, WQ, BK, BQ)) if self.castling & r) or '-'
+        ep = square_name(self.ep) if self.ep >= 0 else '-'
+        return f"{'/'.join(rows)} {'wb'[self.turn]} {castling} {ep} 0 1"
+
+    def piece_char(self, sq: int) -> str:
+        for index, bb in enumerate(self.bb):
+            if bb >> sq & 1:
+                char = PIECE_CHARS[index % 6]
+                return char if index < 6 else char.lower()
+        return ''
+
+    def king_square(self, color: int) -> int:
+        return self.bb[color * 6 + KING].bit_length() - 1
+
+    def attacked(self, sq: int, by: int) -> bool:
+        """Ô sq có bị bên `by` tấn công không"""
+        bb = self.bb
+        base = by * 6
+        if KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[by ^ 1][sq] & bb[base + PAWN]:
+            return True
+        if KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        occupied = self.occ[0] | self.occ[1]
+        queens = bb[base + QUEEN]
+        if BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]] & (bb[base + BISHOP] | queens):
+            return True
+        return bool(ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]] & (bb[base + ROOK] | queens))
+
+    def in_check(self) -> bool:
+        return self.attacked(self.king_square(self.turn), self.turn ^ 1)
+
+    def is_valid(self) -> bool:
+        """Mỗi bên đúng một vua và bên vừa đi không bị chiếu"""
+        for color in (WHITE, BLACK):
+            if bin(self.bb[color * 6 + KING]).count('1') != 1:
+                return False
+        return not self.attacked(self.king_square(self.turn ^ 1), self.turn)
+
+    def with_turn(self, turn: int) -> 'Position':
+        return Position(self.bb[:], turn, self.castling, -1)
+
+    # ---------- sinh nước đi ----------
+
+    def pseudo_moves(self) -> List[int]:
+        """Nước đi giả hợp lệ (chưa kiểm tra vua mình bị chiếu)"""
+        us = self.turn
+        them = us ^ 1
+        bb = self.bb
+        base = us * 6
+        them_base = them * 6
+        own = self.occ[us]
+        opp = self.occ[them]
+        occupied = own | opp
+        empty = ~occupied & FULL
+        moves = []
+        append = moves.append
+
+        def captured(target_bit: int) -> int:
+            for piece in range(6):
+                if bb[them_base + piece] & target_bit:
+                    return piece
+            return NO_PIECE
+
+        # Tốt
+        pawns = bb[base + PAWN]
+        if us == WHITE:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            forward, promo_rank = 8, RANK_8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            forward, promo_rank = -8, RANK_1
+        for to in iter_bits(single):
+            frm = to - forward
+            if (1 << to) & promo_rank:
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    append(encode_move(frm, to, PAWN, NO_PIECE, promotion))
+            else:
+                append(frm | to << 6 | PAWN << 12 | NO_PIECE << 15)
+        for to in iter_bits(double):
+            append(encode_move(to - 2 * forward, to, PAWN, flag=DOUBLE_PUSH))
+        ep_bit = 1 << self.ep if self.ep >= 0 else 0
+        for frm in iter_bits(pawns):
+            attacks = PAWN_ATTACKS[us][frm]
+            for to in iter_bits(attacks & opp):
+                victim = captured(1 << to)
+                if (1 << to) & promo_rank:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        append(encode_move(frm, to, PAWN, victim, promotion))
+                else:
+                    append(frm | to << 6 | PAWN << 12 | victim << 15)
+            if attacks & ep_bit:
+                append(encode_move(frm, self.ep, PAWN, PAWN, flag=EN_PASSANT))
+
+        # Mã, tượng, xe, hậu, vua
+        not_own = ~own & FULL
+        for piece in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            for frm in iter_bits(bb[base + piece]):
+                if piece == KNIGHT:
+                    targets = KNIGHT_ATTACKS[frm]
+                elif piece == BISHOP:
+                    targets = BISHOP_TABLES[frm][occupied & BISHOP_MASKS[frm]]
+                elif piece == ROOK:
+                    targets = ROOK_TABLES[frm][occupied & ROOK_MASKS[frm]]
+                elif piece == QUEEN:
+                    targets = (BISHOP_TABLES[frm][occupied & BISHOP_MASKS[frm]] |
+                               ROOK_TABLES[frm][occupied & ROOK_MASKS[frm]])
+                else:
+                    targets = KING_ATTACKS[frm]
+                targets &= not_own
+                head = frm | piece << 12
+                for to in iter_bits(targets & opp):
+                    append(head | to << 6 | captured(1 << to) << 15)
+                for to in iter_bits(targets & empty):
+                    append(head | to << 6 | NO_PIECE << 15)
+
+        # Nhập thành (ô vua đi qua không được bị tấn công)
+        if self.castling:
+            if us == WHITE:
+                if self.castling & WK and not occupied & 0x60 and not self.attacked(4, them) \
+                        and not self.attacked(5, them) and not self.attacked(6, them):
+                    append(encode_move(4, 6, KING, flag=CASTLE))
+                if self.castling & WQ and not occupied & 0x0E and not self.attacked(4, them) \
+                        and not self.attacked(3, them) and not self.attacked(2, them):
+                    append(encode_move(4, 2, KING, flag=CASTLE))
+            else:
+                if self.castling & BK and not occupied & (0x60 << 56) and not self.attacked(60, them) \
+                        and not self.attacked(61, them) and not self.attacked(62, them):
+                    append(encode_move(60, 62, KING, flag=CASTLE))
+                if self.castling & BQ and not occupied & (0x0E << 56) and not self.attacked(60, them) \
+                        and not self.attacked(59, them) and not self.attacked(58, them):
+                    append(encode_move(60, 58, KING, flag=CASTLE))
+        return moves
+
+    def make(self, move: int) -> 'Position':
+        """Thế cờ sau nước đi (không kiểm tra hợp lệ)"""
+        frm = move & 63
+        to = move >> 6 & 63
+        piece = move >> 12 & 7
+        victim = move >> 15 & 7
+        promotion = move >> 18 & 7
+        flag = move >> 21
+
+        us = self.turn
+        base = us * 6
+        from_bit = 1 << frm
+        to_bit = 1 << to
+
+        bb = self.bb[:]
+        occ_us = self.occ[us] ^ from_bit ^ to_bit
+        occ_them = self.occ[us ^ 1]
+        bb[base + piece] ^= from_bit
+        bb[base + (promotion or piece)] |= to_bit
+
+        if victim != NO_PIECE:
+            if flag == EN_PASSANT:
+                victim_bit = 1 << (to - 8 if us == WHITE else to + 8)
+            else:
+                victim_bit = to_bit
+            bb[(us ^ 1) * 6 + victim] ^= victim_bit
+            occ_them ^= victim_bit
+        elif flag == CASTLE:
+            rook_from, rook_to = CASTLE_ROOKS[to]
+            rook_bits = 1 << rook_from | 1 << rook_to
+            bb[base + ROOK] ^= rook_bits
+            occ_us ^= rook_bits
+
+        child = Position.__new__(Position)
+        child.bb = bb
+        child.occ = [occ_us, occ_them] if us == WHITE else [occ_them, occ_us]
+        child.turn = us ^ 1
+        child.castling = self.castling & CASTLE_KEEP[frm] & CASTLE_KEEP[to] if self.castling else 0
+        child.ep = (frm + to) >> 1 if flag == DOUBLE_PUSH else -1
+        return child
+
+    def legal_children(self) -> List[Tuple[int, 'Position']]:
+        """Các cặp (nước đi hợp lệ, thế cờ sau nước đi)"""
+        us = self.turn
+        them = us ^ 1
+        king_bb = self.bb[us * 6 + KING]
+        king_sq = king_bb.bit_length() - 1
+        children = []
+        for move in self.pseudo_moves():
+            child = self.make(move)
+            sq = child.bb[us * 6 + KING].bit_length() - 1 if move >> 12 & 7 == KING else king_sq
+            if not child.attacked(sq, them):
+                children.append((move, child))
+        return children
+
+    def has_legal_move(self) -> bool:
+        us = self.turn
+        them = us ^ 1
+        king_sq = self.king_square(us)
+        for move in self.pseudo_moves():
+            child = self.make(move)
+            sq = move >> 6 & 63 if move >> 12 & 7 == KING else king_sq
+            if not child.attacked(sq, them):
+                return True
+        return False
+
+    def san(self, move: int, children: Optional[List[Tuple[int, 'Position']]] = None) -> str:
+        """Ký hiệu SAN của một nước đi hợp lệ"""
+        children = children if children is not None else self.legal_children()
+        frm, to = move & 63, move >> 6 & 63
+        piece, victim, promotion = move >> 12 & 7, move >> 15 & 7, move >> 18 & 7
+
+        if move >> 21 == CASTLE:
+            text = 'O-O' if to & 7 == 6 else 'O-O-O'
+        elif piece == PAWN:
+            text = (square_name(frm)[0] + 'x' if victim != NO_PIECE else '') + square_name(to)
+            if promotion:
+                text += '=' + PIECE_CHARS[promotion]
+        else:
+            rivals = [m & 63 for m, _ in children
+                      if m >> 12 & 7 == piece and m >> 6 & 63 == to and m & 63 != frm]
+            prefix = ''
+            if rivals:
+                if all(sq & 7 != frm & 7 for sq in rivals):
+                    prefix = square_name(frm)[0]
+                elif all(sq >> 3 != frm >> 3 for sq in rivals):
+                    prefix = square_name(frm)[1]
+                else:
+                    prefix = square_name(frm)
+            text = PIECE_CHARS[piece] + prefix + ('x' if victim != NO_PIECE else '') + square_name(to)
+
+        child = next(c for m, c in children if m == move)
+        if child.in_check():
+            text += '+' if child.has_legal_move() else '#'
+        return text
+
+
+def perft(position: Position, depth: int) -> int:
+    """Số nút lá hợp lệ ở độ sâu `depth`"""
+    if depth == 1:
+        return len(position.legal_children())
+    return sum(perft(child, depth - 1) for _, child in position.legal_children())
+
+
+# ==================== MATE SEARCH ====================
+
+class MateSearch:
+    """
+    Tìm chiếu hết trong N nước (AND/OR search giới hạn độ sâu)
+
+    Bên tấn công: tồn tại nước đi mà mọi nước đáp đều còn bị chiếu hết trong N-1.
+    Bên phòng thủ: thử trước nước đã bác bỏ thành công lần trước ở cùng độ sâu.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self._killers: Dict[int, int] = {}
+
+    def children(self, position: Position) -> List[Tuple[int, Position]]:
+        children = position.legal_children()
+        self.nodes += len(children)
+        return children
+
+    def find_mate(self, position: Position, max_depth: int = 2,
+                  hint: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """
+        Nước then chốt của chiếu hết nhanh nhất trong max_depth nước
+
+        Args:
+            position: Thế cờ, bên tấn công đi trước
+            max_depth: Số nước tối đa của bên tấn công
+            hint: Nước thử trước (VD nước đầu của lời giải có sẵn)
+
+        Returns:
+            (nước then chốt, số nước đến chiếu hết), hoặc None
+        """
+        for depth in range(1, max_depth + 1):
+            move = self._attack(position, depth, hint)
+            if move is not None:
+                return move, depth
+        return None
+
+    def forces_mate(self, position: Position, move: int, depth: int) -> bool:
+        """Nước `move` có buộc chiếu hết trong `depth` nước không"""
+        for candidate, child in self.children(position):
+            if candidate == move:
+                return self._defend(child, depth - 1)
+        return False
+
+    def _attack(self, position: Position, depth: int, hint: Optional[int] = None) -> Optional[int]:
+        children = self.children(position)
+        if depth == 1:
+            for move, child in children:
+                if child.in_check() and not child.has_legal_move():
+                    return move
+            return None
+
+        # Gợi ý trước, rồi nước chiếu, rồi nước ăn quân
+        ordered = sorted(children, key=lambda item: (item[0] != hint, not item[1].in_check(),
+                                                     item[0] >> 15 & 7 == NO_PIECE))
+        for move, child in ordered:
+            if self._defend(child, depth - 1):
+                return move
+        return None
+
+    def _defend(self, position: Position, depth: int) -> bool:
+        """Mọi nước đáp của bên phòng thủ đều để bị chiếu hết trong `depth` nước"""
+        replies = self.children(position)
+        if not replies:
+            return position.in_check()  # đã chiếu hết; hết nước mà không bị chiếu là hòa pat
+        if depth == 0:
+            return False
+
+        killer = self._killers.get(depth)
+        if killer is not None:
+            for index, (move, _) in enumerate(replies):
+                if move == killer:
+                    replies.insert(0, replies.pop(index))
+                    break
+        for move, child in replies:
+            if self._attack(child, depth) is None:
+                self._killers[depth] = move
+                return False
+        return True
+
+
+# ==================== PUZZLE VALIDATION ====================
+
+def solution_moves(solution: Optional[str]) -> List[str]:
+    """"1. h7+ Kh8 2. Rf8" -> ['h7+', 'Kh8', 'Rf8']"""
+    moves = []
+    for token in (solution or '').split():
+        token = MOVE_NUMBER.sub('', token)
+        if token and token not in ('1-0', '0-1', '1/2-1/2', '*'):
+            moves.append(token)
+    return moves
+
+
+def find_san(position: Position, san: str) -> Optional[int]:
+    """Nước đi hợp lệ có SAN khớp (bỏ qua + # ! ? và chữ x)"""
+    wanted = ANNOTATIONS.sub('', san).replace('x', '').replace('0-0', 'O-O')
+    children = position.legal_children()
+    for move, _ in children:
+        if ANNOTATIONS.sub('', position.san(move, children)).replace('x', '') == wanted:
+            return move
+    return None
+
+
+def solve_puzzle(position_id: int, fen: str, solution: Optional[str], max_depth: int = 2) -> Dict:
+    """
+    Kiểm chứng một puzzle
+
+    Returns:
+        Dict với status: 'mate' (đúng bên đi trong FEN), 'mate_other_side' (FEN ghi sai
+        bên đi), 'no_mate', 'invalid' (FEN hỏng / thế cờ không hợp lệ)
+    """
+    started = time.perf_counter()
+    result = {'id': position_id, 'status': 'invalid', 'turn': None, 'key': None,
+              'mate_in': None, 'solution_key': None, 'key_matches': False, 'nodes': 0}
+    try:
+        position = Position.from_fen(fen)
+    except ValueError:
+        return result
+
+    moves = solution_moves(solution)
+    result['solution_key'] = moves[0] if moves else None
+    search = MateSearch()
+
+    stated = position.turn
+    any_valid = False
+    for turn, status in ((stated, 'mate'), (stated ^ 1, 'mate_other_side')):
+        candidate = position if turn == stated else position.with_turn(turn)
+        if not candidate.is_valid():
+            continue
+        any_valid = True
+        hint = find_san(candidate, moves[0]) if moves else None
+        found = search.find_mate(candidate, max_depth, hint)
+        if found is not None:
+            key, depth = found
+            key_san = candidate.san(key)
+            result.update(status=status, turn='wb'[turn], key=key_san, mate_in=depth,
+                          key_matches=hint is not None and (key == hint or search.forces_mate(candidate, hint, depth)))
+            break
+    else:
+        result['status'] = 'no_mate' if any_valid else 'invalid'
+
+    result['nodes'] = search.nodes
+    result['ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _solve_task(args) -> Dict:
+    return solve_puzzle(*args)
+
+
+def load_puzzles(db_path: str, ids: Optional[List[int]] = None) -> List[Tuple[int, str, Optional[str]]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT id, fen, solution FROM positions ORDER BY id').fetchall()
+    finally:
+        conn.close()
+    if ids:
+        wanted = set(ids)
+        rows = [row for row in rows if row[0] in wanted]
+    return rows
+
+
+def validate_db(db_path: str, max_depth: int = 2, workers: Optional[int] = None,
+                ids: Optional[List[int]] = None) -> List[Dict]:
+    """Kiểm chứng mọi puzzle trong DB song song trên process pool"""
+    puzzles = load_puzzles(db_path, ids)
+    tasks = [(pid, fen, solution, max_depth) for pid, fen, solution in puzzles]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 8:
+        return [_solve_task(task) for task in tasks]
+    chunksize = max(1, len(tasks) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_solve_task, tasks, chunksize=chunksize))
+
+
+# ==================== PERFT SUITE & BENCHMARK ====================
+
+# (tên, FEN, số nút theo độ sâu 1, 2, 3, ...) - giá trị chuẩn của chessprogramming.org
+PERFT_SUITE = [
+    ('startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890]),
+]
+
+
+def run_perft_suite(max_depth: int = 3) -> bool:
+    """Chạy bộ perft; trả về True nếu mọi số nút khớp giá trị chuẩn"""
+    print(f"🧪 Perft suite (depth ≤ {max_depth})")
+    all_ok = True
+    total_nodes, total_time = 0, 0.0
+    for name, fen, expected in PERFT_SUITE:
+        position = Position.from_fen(fen, sanitize=False)
+        for depth, want in enumerate(expected[:max_depth], 1):
+            started = time.perf_counter()
+            got = perft(position, depth)
+            elapsed = time.perf_counter() - started
+            total_nodes += got
+            total_time += elapsed
+            ok = got == want
+            all_ok &= ok
+            print(f"   {'✅' if ok else '❌'} {name:<10} depth {depth}: {got:>9,} (expected {want:,})"
+                  f"  {elapsed:6.2f}s")
+    nps = total_nodes / total_time if total_time else 0
+    print(f"{'✅ All perft counts match' if all_ok else '❌ Perft mismatch'} - {nps:,.0f} nodes/s")
+    return all_ok
+
+
+def run_benchmark(db_path: str, max_depth: int = 2, workers: Optional[int] = None) -> None:
+    """Nodes/giây của perft và của mate search trên DB (1 process và process pool)"""
+    print("⏱️  Benchmark")
+    position = Position.from_fen(PERFT_SUITE[0][1])
+    started = time.perf_counter()
+    nodes = perft(position, 4)
+    elapsed = time.perf_counter() - started
+    print(f"   perft(startpos, 4): {nodes:,} nodes in {elapsed:.2f}s = {nodes / elapsed:,.0f} nodes/s")
+
+    if not Path(db_path).exists():
+        print(f"   ⚠️  DB not found: {db_path} - skipping mate search benchmark")
+        return
+
+    puzzles = load_puzzles(db_path)[:100]
+    started = time.perf_counter()
+    results = [solve_puzzle(pid, fen, solution, max_depth) for pid, fen, solution in puzzles]
+    elapsed = time.perf_counter() - started
+    nodes = sum(r['nodes'] for r in results)
+    print(f"   mate search, 1 process, {len(puzzles)} puzzles: {elapsed:.2f}s, "
+          f"{nodes:,} nodes = {nodes / elapsed:,.0f} nodes/s")
+
+    started = time.perf_counter()
+    results = validate_db(db_path, max_depth, workers)
+    elapsed = time.perf_counter() - started
+    print(f"   mate search, {workers or os.cpu_count()} workers, {len(results)} puzzles: {elapsed:.2f}s")
+
+
+def print_summary(results: List[Dict], elapsed: float) -> None:
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    nodes = sum(r['nodes'] for r in results)
+
+    print(f"\n📊 MATE VALIDATION: {len(results)} puzzles in {elapsed:.2f}s ({nodes:,} nodes)")
+    for status in ('mate', 'mate_other_side', 'no_mate', 'invalid'):
+        print(f"   {status:<16} {counts.get(status, 0):>5}")
+    mismatched = [r for r in results if r['status'].startswith('mate') and r['solution_key'] and not r['key_matches']]
+    print(f"   solution key does not force mate: {len(mismatched)}")
+
+    problems = [r for r in results if r['status'] != 'mate' or not r['key_matches']]
+    for result in problems[:20]:
+        print(f"   ⚠️  #{result['id']}: {result['status']} key={result['key']} "
+              f"solution={result['solution_key']}")
+    if len(problems) > 20:
+        print(f"   ... {len(problems) - 20} more (see --report)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bitboard mate-in-N solver for the puzzles DB')
+    parser.add_argument('--db', default=str(DEFAULT_DB), help='SQLite puzzles DB (positions table)')
+    parser.add_argument('--depth', type=int, default=2, help='Maximum mate depth in moves (default: 2)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--ids', help='Comma-separated position ids to check')
+    parser.add_argument('--report', help='Write the per-puzzle JSON report to this file')
+    parser.add_argument('--perft', action='store_true', help='Run the perft correctness suite')
+    parser.add_argument('--perft-depth', type=int, default=3)
+    parser.add_argument('--bench', action='store_true', help='Run the nodes/s benchmark')
+    args = parser.parse_args()
+
+    if args.perft:
+        sys.exit(0 if run_perft_suite(args.perft_depth) else 1)
+    if args.bench:
+        run_benchmark(args.db, args.depth, args.workers)
+        return
+
+    if not Path(args.db).exists():
+        print(f"❌ DB not found: {args.db}")
+        sys.exit(1)
+
+    ids = [int(x) for x in args.ids.split(',') if x.strip()] if args.ids else None
+    started = time.perf_counter()
+    results = validate_db(args.db, args.depth, args.workers, ids)
+    print_summary(results, time.perf_counter() - started)
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Page Text Cache - cache text đã trích của từng trang PDF trên đĩa
+
+Key theo nội dung: hash của file PDF + số trang + cấu hình trích text (tham số
+extract_text và version pdfplumber). Sửa clean_row / piece_map / determine_turn
+rồi chạy lại parser => đọc text từ cache, không mở pdfplumber.
+
+- Mỗi trang một file <key>.txt; manifest <pdf hash>-<settings>.json giữ số trang
+- Ghi nguyên tử (file tạm + os.replace) nên nhiều process ghi cùng lúc vẫn an toàn
+- Giới hạn dung lượng: prune() xóa file ít được dùng nhất (theo mtime, được
+  cập nhật mỗi lần đọc) cho đến khi tổng dung lượng dưới max_bytes
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pdfplumber
+
+# Tăng khi đổi định dạng cache => mọi entry cũ tự bị bỏ qua
+CACHE_VERSION = 1
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+# Tham số truyền cho page.extract_text() - là một phần của key
+EXTRACT_SETTINGS: Dict = {}
+# Trang không có text được lưu bằng marker này (khác với trang chưa cache)
+NO_TEXT = '\x00'
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """blake2b của nội dung file (đọc từng khối, không nạp cả file)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(settings: Optional[Dict] = None) -> str:
+    raw = json.dumps({
+        'version': CACHE_VERSION,
+        'pdfplumber': pdfplumber.__version__,
+        'extract_text': EXTRACT_SETTINGS if settings is None else settings
+    }, sort_keys=True)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class PageTextCache:
+    """
+    Cache text theo trang cho một thư mục
+
+    Args:
+        cache_dir: Thư mục cache
+        max_bytes: Dung lượng tối đa sau prune()
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = MAX_CACHE_BYTES, settings: Optional[Dict] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.settings = settings_key(settings)
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    def _prefix(self, pdf_hash: str) -> str:
+        return f'{pdf_hash}-{self.settings}'
+
+    def _page_path(self, pdf_hash: str, page: int) -> Path:
+        return self.cache_dir / f'{self._prefix(pdf_hash)}-{page:05d}.txt'
+
+    def _write(self, path: Path, text: str) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def page_count(self, pdf_hash: str) -> Optional[int]:
+        """Số trang đã ghi trong manifest (None nếu PDF chưa từng được cache)"""
+        try:
+            with open(self.cache_dir / f'{self._prefix(pdf_hash)}.json', encoding='utf-8') as f:
+                return json.load(f)['pages']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set_page_count(self, pdf_hash: str, pages: int) -> None:
+        self._write(self.cache_dir / f'{self._prefix(pdf_hash)}.json', json.dumps({'pages': pages}))
+
+    def contains(self, pdf_hash: str, page: int) -> bool:
+        return self._page_path(pdf_hash, page).exists()
+
+    def get(self, pdf_hash: str, page: int) -> Optional[str]:
+        """
+        Text đã cache của một trang
+
+        Returns:
+            None nếu chưa cache; '' nếu trang không có text
+        """
+        path = self._page_path(pdf_hash, page)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            self.stats['misses'] += 1
+            return None
+        try:
+            os.utime(path)  # đánh dấu vừa dùng cho eviction
+        except OSError:
+            pass
+        self.stats['hits'] += 1
+        return '' if text == NO_TEXT else text
+
+    def get_many(self, pdf_hash: str, pages: int) -> List[Optional[str]]:
+        return [self.get(pdf_hash, page) for page in range(pages)]
+
+    def put(self, pdf_hash: str, page: int, text: Optional[str]) -> None:
+        self._write(self._page_path(pdf_hash, page), text or NO_TEXT)
+        self.stats['stored'] += 1
+
+    def prune(self) -> int:
+        """Xóa entry cũ nhất đến khi tổng dung lượng <= max_bytes; trả về số file đã xóa"""
+        if not self.cache_dir.exists():
+            return 0
+        entries = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            if path.suffix not in ('.txt', '.json'):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.stats['evicted'] += removed
+        return removed
@@ -0,0 +1,297 @@
+"""
+Parse Pipeline - các stage dạng generator cho parser, bộ nhớ không phụ thuộc cỡ PDF
+
+page text -> dòng -> bàn cờ / lời giải -> ghép lời giải -> enrichment -> sink
+
+- sliding_window: cửa sổ cố định quanh dòng hiện tại (thay cho truy cập lines[i] ngẫu nhiên)
+- SolutionMatcher: khớp "Solution-N: ..." từng dòng, kể cả lời giải vắt qua ranh giới trang
+- SolutionJoin: ghép position với lời giải; bên nào đến trước chờ trong một file SQLite
+  tạm (sách để lời giải ở cuối => mọi position chờ trên đĩa, không nằm trong RAM)
+- bounded_map: map có thứ tự trên process pool, giới hạn số task đang chạy
+- JsonArraySink / SqliteSink: ghi từng lô ngay khi có (JSON giống hệt json.dump indent=2)
+"""
+
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Pattern: Solution-1: 1. h7+ Kh8 2. Rf8 Checkmate 1-0
+SOLUTION_RE = re.compile(r'Solution-(\d+):\s+(.+?)\s+(?:Checkmate\s+)?(?:1-0|0-1)', re.MULTILINE)
+SOLUTION_MARK = 'Solution-'
+# Số dòng giữ lại chờ phần còn lại của một lời giải (lời giải dài nhất chỉ vài dòng)
+SOLUTION_KEEP_LINES = 16
+# Số dòng ghi vào SQLite mỗi lần executemany
+SINK_BATCH = 500
+
+POSITION_COLUMNS = ('id', 'fen', 'solution', 'difficulty', 'source', 'tags', 'strategy')
+POSITIONS_DDL = '''
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY,
+    fen TEXT NOT NULL,
+    solution TEXT,
+    difficulty TEXT,
+    source TEXT,
+    tags TEXT,
+    strategy TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+
+def sliding_window(lines: Iterable[str], behind: int, ahead: int) -> Iterator[Tuple[Deque[str], int]]:
+    """
+    Yield (window, index of the current line in window) for every line
+
+    The window holds up to `behind` lines before and `ahead` lines after the
+    current one, so a scanner can look around a line without the full list.
+    """
+    window: Deque[str] = deque()
+    current = 0
+    for line in lines:
+        window.append(line)
+        if len(window) - current > ahead:
+            yield window, current
+            current += 1
+            if current > behind:
+                window.popleft()
+                current -= 1
+    while current < len(window):
+        yield window, current
+        current += 1
+        if current > behind:
+            window.popleft()
+            current -= 1
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bounded_map(fn: Callable, items: Iterable, executor: Optional[Executor] = None,
+                window: Optional[int] = None) -> Iterator:
+    """
+    Ordered map that keeps at most `window` tasks in flight
+
+    Unlike Executor.map, the input iterable is consumed lazily. Without an
+    executor the calls run inline.
+    """
+    if executor is None:
+        yield from map(fn, items)
+        return
+    window = window or 2 * (os.cpu_count() or 1)
+    futures: Deque = deque()
+    for item in items:
+        futures.append(executor.submit(fn, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class SolutionMatcher:
+    """
+    Khớp lời giải theo từng dòng
+
+    Kết quả giống SOLUTION_RE.finditer trên toàn văn bản nối bằng '\\n'. Một match có thể
+    đổi khi có thêm text (\\s+ tham lam vượt nhiều dòng trắng), nên chỉ được chốt khi sau
+    dòng chứa điểm kết thúc của nó đã có ít nhất hai dòng khác rỗng - mọi nhánh regex thử
+    trước nó (khoảng trắng, một dòng lời giải, khoảng trắng, "Checkmate", khoảng trắng,
+    kết quả) đều đã có đủ text. Phần đã khớp bị bỏ; buffer giữ tối đa keep_lines dòng.
+    """
+
+    def __init__(self, keep_lines: int = SOLUTION_KEEP_LINES):
+        self.keep_lines = keep_lines
+        self._lines: Deque[str] = deque()
+        self._armed = False  # có 'Solution-' chưa khớp trong buffer
+
+    def _match(self, final: bool) -> List[Tuple[int, str]]:
+        text = '\n'.join(self._lines)
+        limit = len(text)
+        if not final:
+            nonblank = [k for k, line in enumerate(self._lines) if line.strip()]
+            if len(nonblank) < 3:
+                return []
+            # Điểm kết thúc phải nằm trước dòng khác rỗng thứ hai từ cuối lên
+            limit = sum(len(line) + 1 for line in itertools.islice(self._lines, nonblank[-2])) - 1
+        found, consumed = [], 0
+        for match in SOLUTION_RE.finditer(text):
+            if match.end() > limit:
+                break
+            found.append((int(match.group(1)), re.sub(r'\s+', ' ', match.group(2).strip())))
+            consumed = match.end()
+        if consumed:
+            self._lines = deque(text[consumed:].split('\n'))
+            self._armed = SOLUTION_MARK in text[consumed:]
+        return found
+
+    def feed(self, line: str) -> List[Tuple[int, str]]:
+        """Thêm một dòng; trả về các (id, lời giải) vừa được chốt"""
+        self._lines.append(line)
+        found = []
+        if SOLUTION_MARK in line:
+            self._armed = True
+        if self._armed and len(self._lines) > 1:
+            found = self._match(final=False)
+        while len(self._lines) > self.keep_lines:
+            self._lines.popleft()
+        if self._armed and not any(SOLUTION_MARK in buffered for buffered in self._lines):
+            self._armed = False
+        return found
+
+    def finish(self) -> List[Tuple[int, str]]:
+        found = self._match(final=True) if self._armed and self._lines else []
+        self._lines.clear()
+        self._armed = False
+        return found
+
+
+class SolutionJoin:
+    """
+    Ghép position với lời giải theo id, bất kể bên nào xuất hiện trước
+
+    Position chưa có lời giải và lời giải chưa có position được giữ trong một
+    database SQLite tạm (xóa khi close) => bộ nhớ không đổi dù sách dài bao nhiêu.
+    Lời giải đến sau: position được phát ra ngay khi khớp; finish() phát nốt các
+    position không có lời giải (solution rỗng) theo thứ tự xuất hiện.
+
+    Args:
+        spill_dir: Thư mục chứa file tạm (mặc định: thư mục tạm của hệ thống)
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None):
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=spill_dir, prefix='solution-join-', suffix='.db')
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute('CREATE TABLE pending (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL, data TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX idx_pending_id ON pending(id)')
+        self.conn.execute('CREATE TABLE solutions (id INTEGER PRIMARY KEY, solution TEXT NOT NULL)')
+        self.stats = {'positions': 0, 'matched': 0, 'solutions': 0}
+
+    def add_position(self, pos: Dict) -> List[Dict]:
+        """Position mới; trả về [pos] nếu lời giải của nó đã có, không thì giữ lại"""
+        self.stats['positions'] += 1
+        row = self.conn.execute('SELECT solution FROM solutions WHERE id = ?', (pos['id'],)).fetchone()
+        if row is None:
+            self.conn.execute('INSERT INTO pending (id, data) VALUES (?, ?)',
+                              (pos['id'], json.dumps(pos, ensure_ascii=False)))
+            return []
+        pos['solution'] = row[0]
+        self.stats['matched'] += 1
+        return [pos]
+
+    def add_solution(self, pos_id: int, solution: str) -> List[Dict]:
+        """Lời giải mới; trả về các position đang chờ nó"""
+        self.conn.execute('INSERT OR REPLACE INTO solutions (id, solution) VALUES (?, ?)', (pos_id, solution))
+        rows = self.conn.execute('SELECT data FROM pending WHERE id = ? ORDER BY seq', (pos_id,)).fetchall()
+        if not rows:
+            return []
+        self.conn.execute('DELETE FROM pending WHERE id = ?', (pos_id,))
+        ready = []
+        for (data,) in rows:
+            pos = json.loads(data)
+            pos['solution'] = solution
+            ready.append(pos)
+        self.stats['matched'] += len(ready)
+        return ready
+
+    def finish(self) -> Iterator[Dict]:
+        """Các position không có lời giải, theo thứ tự xuất hiện"""
+        self.stats['solutions'] = self.conn.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+        for (data,) in self.conn.execute('SELECT data FROM pending ORDER BY seq'):
+            pos = json.loads(data)
+            pos['solution'] = ''
+            yield pos
+
+    def close(self) -> None:
+        self.conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonArraySink:
+    """Ghi positions thành một JSON array từng phần tử một (cùng định dạng json.dump indent=2)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write_many(self, positions: Iterable[Dict]) -> None:
+        for pos in positions:
+            body = json.dumps(pos, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            self._file.write(('[\n  ' if self.count == 0 else ',\n  ') + body)
+            self.count += 1
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.write('\n]' if self.count else '[]')
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SqliteSink:
+    """
+    Ghi positions vào bảng positions (xóa dữ liệu cũ), tất cả trong một transaction
+
+    Lỗi giữa chừng => rollback, database giữ nguyên nội dung cũ.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(POSITIONS_DDL)
+        self.conn.execute('DELETE FROM positions')
+
+    def write_many(self, positions: Iterable[Dict]) -> None:
+        rows = ((pos['id'], pos['fen'], pos['solution'], pos['difficulty'], pos['source'],
+                 ','.join(pos['tags']), pos.get('strategy', 'unknown')) for pos in positions)
+        for batch in batched(rows, SINK_BATCH):
+            self.conn.executemany(f'''
+            INSERT OR REPLACE INTO positions ({', '.join(POSITION_COLUMNS)})
+            VALUES ({', '.join('?' * len(POSITION_COLUMNS))})
+            ''', batch)
+            self.count += len(batch)
+
+    def close(self, commit: bool = True) -> None:
+        if commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,337 @@
+"""
+Puzzle Validator - kiểm tra puzzle đã parse bằng cách đi lại lời giải
+
+Chức năng:
+- Đi lại từng lời giải trên FEN của nó (python-chess), song song trên process pool
+- Phát hiện: nước đi không hợp lệ, biến kết thúc không chiếu hết, sai bên đi trước,
+  lời giải gắn nhầm id (khớp với FEN của position lân cận), id trùng, thiếu lời giải
+- Ghi report JSON (summary + từng puzzle) để xử lý tự động
+
+Usage:
+    python scripts/puzzle_validator.py output/chess_positions.json [--workers 8] [--report report.json]
+    python scripts/puzzle_validator.py backend/data/chess_puzzles.db
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import chess
+
+from mate_solver import solution_moves
+from pipeline import JsonArraySink, batched, bounded_map, sliding_window
+
+MATE_IN = re.compile(r'mate_in_(\d+)')
+
+# Lời giải lỗi được thử trên FEN của các id cách nhau tối đa chừng này
+NEIGHBOUR_RADIUS = 2
+# Số puzzle mỗi task gửi sang worker
+CHUNK_SIZE = 256
+
+ISSUES = (
+    'no_solution', 'duplicate_id', 'invalid_fen', 'illegal_move', 'wrong_side_to_move',
+    'no_mate', 'mate_length_mismatch', 'id_mismatch',
+)
+
+
+def load_board(fen: str) -> chess.Board:
+    """Parse FEN; bỏ quyền nhập thành sai (parser luôn ghi KQkq)"""
+    board = chess.Board(fen)
+    board.castling_rights = board.clean_castling_rights()
+    return board
+
+
+def replay(board: chess.Board, moves: List[str]) -> Tuple[int, bool]:
+    """
+    Đi lại các nước SAN trên bản sao của board
+
+    Returns:
+        (số nước hợp lệ liên tiếp từ đầu, thế cờ cuối có bị chiếu hết không)
+    """
+    board = board.copy(stack=False)
+    for index, san in enumerate(moves):
+        try:
+            board.push_san(san)
+        except ValueError:
+            return index, False
+    return len(moves), board.is_checkmate()
+
+
+def validate_puzzle(puzzle: Dict, neighbours: List[Tuple[int, str]]) -> Dict:
+    """
+    Kiểm tra một puzzle
+
+    Args:
+        puzzle: Dict có id, fen, solution, difficulty
+        neighbours: (id, fen) của các position lân cận, để dò lời giải gắn nhầm id
+
+    Returns:
+        Kết quả: id, status ('ok' / 'warning' / 'error'), issues và chi tiết
+    """
+    result = {'id': puzzle['id'], 'status': 'ok', 'issues': [], 'turn': None,
+              'mate_in': None, 'illegal_ply': None, 'illegal_move': None, 'suggested_id': None}
+    issues = result['issues']
+    moves = solution_moves(puzzle.get('solution'))
+
+    try:
+        board = load_board(puzzle['fen'])
+    except ValueError:
+        issues.append('invalid_fen')
+        result['status'] = 'error'
+        return result
+    result['turn'] = 'w' if board.turn == chess.WHITE else 'b'
+
+    if not moves:
+        issues.append('no_solution')
+        result['status'] = 'error'
+        return result
+
+    played, mated = replay(board, moves) if board.is_valid() else (0, False)
+    if played < len(moves):
+        # Thử bên còn lại đi trước
+        flipped = board.copy(stack=False)
+        flipped.turn = not flipped.turn
+        flipped.ep_square = None
+        if flipped.is_valid():
+            flipped_played, flipped_mated = replay(flipped, moves)
+            if flipped_played > played:
+                issues.append('wrong_side_to_move')
+                result['turn'] = 'w' if flipped.turn == chess.WHITE else 'b'
+                played, mated = flipped_played, flipped_mated
+        elif not board.is_valid():
+            issues.append('invalid_fen')
+
+    if played < len(moves):
+        issues.append('illegal_move')
+        result['illegal_ply'] = played
+        result['illegal_move'] = moves[played]
+        # Lời giải có khớp với position lân cận không (lệch id khi parse)
+        for other_id, other_fen in neighbours:
+            try:
+                other = load_board(other_fen)
+            except ValueError:
+                continue
+            for turn in (other.turn, not other.turn):
+                other.turn = turn
+                if other.is_valid() and replay(other, moves) == (len(moves), True):
+                    issues.append('id_mismatch')
+                    result['suggested_id'] = other_id
+                    break
+            if result['suggested_id'] is not None:
+                break
+    elif not mated:
+        issues.append('no_mate')
+    else:
+        result['mate_in'] = (len(moves) + 1) // 2
+        expected = MATE_IN.match(puzzle.get('difficulty') or '')
+        if expected and int(expected.group(1)) != result['mate_in']:
+            issues.append('mate_length_mismatch')
+
+    if issues:
+        warnings_only = set(issues) <= {'wrong_side_to_move', 'mate_length_mismatch'}
+        result['status'] = 'warning' if warnings_only else 'error'
+    return result
+
+
+def _validate_chunk(chunk: List[Tuple[Dict, List[Tuple[int, str]]]]) -> List[Dict]:
+    return [validate_puzzle(puzzle, neighbours) for puzzle, neighbours in chunk]
+
+
+def validate_puzzles(puzzles: List[Dict], workers: Optional[int] = None) -> Dict:
+    """
+    Kiểm tra toàn bộ puzzle trên process pool
+
+    Args:
+        puzzles: Danh sách dict có id, fen, solution, difficulty
+        workers: Số process (mặc định: số CPU)
+
+    Returns:
+        Report: {'summary': {...}, 'puzzles': [...]} - puzzles theo thứ tự đầu vào
+    """
+    started = time.perf_counter()
+    ordered = sorted(puzzles, key=lambda p: p['id'])
+    fens = [(p['id'], p['fen']) for p in ordered]
+    index_of = {id(p): i for i, p in enumerate(ordered)}
+
+    tasks = []
+    for puzzle in puzzles:
+        i = index_of[id(puzzle)]
+        neighbours = [fens[j] for j in range(max(0, i - NEIGHBOUR_RADIUS), min(len(fens), i + NEIGHBOUR_RADIUS + 1))
+                      if j != i]
+        tasks.append((puzzle, neighbours))
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        results = [r for chunk in chunks for r in _validate_chunk(chunk)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for rs in pool.map(_validate_chunk, chunks) for r in rs]
+
+    seen = set()
+    for result in results:
+        if result['id'] in seen:
+            result['issues'].append('duplicate_id')
+            result['status'] = 'error'
+        seen.add(result['id'])
+
+    tally = Tally(workers)
+    for result in results:
+        tally.add(result)
+    return {'summary': tally.summary(started), 'puzzles': results}
+
+
+class Tally:
+    """Đếm kết quả theo status / issue"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.total = 0
+        self.by_status = {'ok': 0, 'warning': 0, 'error': 0}
+        self.by_issue = {issue: 0 for issue in ISSUES}
+
+    def add(self, result: Dict) -> None:
+        self.total += 1
+        self.by_status[result['status']] += 1
+        for issue in result['issues']:
+            self.by_issue[issue] += 1
+
+    def summary(self, started: float) -> Dict:
+        return {
+            'total': self.total,
+            **self.by_status,
+            'issues': dict(self.by_issue),
+            'workers': self.workers,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+
+
+def _validate_window_chunk(chunk: List[Tuple[Dict, List[Tuple[int, str]], bool]]) -> List[Dict]:
+    results = []
+    for puzzle, neighbours, duplicate in chunk:
+        result = validate_puzzle(puzzle, neighbours)
+        if duplicate:
+            result['issues'].append('duplicate_id')
+            result['status'] = 'error'
+        results.append(result)
+    return results
+
+
+def iter_validated(puzzles: Iterable[Dict], executor: Optional[Executor] = None) -> Iterator[Dict]:
+    """
+    Kiểm tra một stream puzzle đã sắp theo id (vd. đọc từ database), giữ bộ nhớ không đổi
+
+    Lân cận giống validate_puzzles (NEIGHBOUR_RADIUS id mỗi bên) nhờ cửa sổ trượt;
+    id trùng liền kề bị đánh dấu duplicate_id.
+
+    Yields:
+        Kết quả theo thứ tự đầu vào
+    """
+    def tasks():
+        previous = None
+        for window, i in sliding_window(puzzles, NEIGHBOUR_RADIUS, NEIGHBOUR_RADIUS):
+            puzzle = window[i]
+            neighbours = [(p['id'], p['fen']) for j, p in enumerate(window) if j != i]
+            yield puzzle, neighbours, puzzle['id'] == previous
+            previous = puzzle['id']
+
+    for results in bounded_map(_validate_window_chunk, batched(tasks(), CHUNK_SIZE), executor):
+        yield from results
+
+
+def save_report(report: Dict, path: str) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def write_report(results: Iterable[Dict], path: str, workers: int, limit: int = 10) -> Dict:
+    """
+    Ghi report từ một stream kết quả, cùng định dạng save_report
+
+    Kết quả từng puzzle được ghi ra file tạm rồi nối sau summary, không giữ trong RAM.
+
+    Returns:
+        {'summary': ..., 'puzzles': tối đa `limit` puzzle có vấn đề} - đủ cho print_report
+    """
+    started = time.perf_counter()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tally = Tally(workers)
+    problems = []
+    body = f'{path}.puzzles.tmp'
+    try:
+        with JsonArraySink(body) as sink:
+            for result in results:
+                tally.add(result)
+                if result['status'] != 'ok' and len(problems) < limit:
+                    problems.append(result)
+                sink.write_many([result])
+        summary = tally.summary(started)
+        with open(path, 'w', encoding='utf-8') as out, open(body, encoding='utf-8') as puzzles:
+            out.write('{\n  "summary": ' + json.dumps(summary, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+            out.write(',\n  "puzzles": ')
+            for n, line in enumerate(puzzles):
+                out.write(line if n == 0 else '  ' + line)
+            out.write('\n}')
+    finally:
+        if os.path.exists(body):
+            os.remove(body)
+    return {'summary': summary, 'puzzles': problems}
+
+
+def print_report(report: Dict, limit: int = 10) -> None:
+    summary = report['summary']
+    print(f"🔍 Validated {summary['total']:,} puzzles in {summary['seconds']:.2f}s "
+          f"({summary['workers']} workers): {summary['ok']:,} ok, "
+          f"{summary['warning']:,} warnings, {summary['error']:,} errors")
+    for issue, count in summary['issues'].items():
+        if count:
+            print(f"   {issue:<22} {count:>6,}")
+    problems = [r for r in report['puzzles'] if r['status'] != 'ok']
+    for result in problems[:limit]:
+        detail = f" ({result['illegal_move']} at ply {result['illegal_ply']})" if result['illegal_move'] else ''
+        print(f"   ⚠️  #{result['id']}: {', '.join(result['issues'])}{detail}")
+    total_problems = summary['warning'] + summary['error']
+    if total_problems > limit:
+        print(f"   ... {total_problems - limit} more in report")
+
+
+def load_puzzles(path: str) -> List[Dict]:
+    """Đọc puzzle từ file JSON của parser hoặc từ bảng positions của SQLite"""
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute('SELECT id, fen, solution, difficulty FROM positions ORDER BY id')]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay parsed puzzle solutions and report problems')
+    parser.add_argument('source', help='chess_positions.json or a puzzles SQLite DB')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--report', default='output/validation_report.json', help='JSON report path')
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        print(f"❌ File not found: {args.source}")
+        sys.exit(1)
+
+    report = validate_puzzles(load_puzzles(args.source), args.workers)
+    print_report(report)
+    save_report(report, args.report)
+    print(f"✅ Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
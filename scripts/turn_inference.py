@@ -0,0 +1,193 @@
+"""
+Turn Inference - xác định bên đi trước bằng tìm kiếm thay vì heuristic
+
+Với mỗi position, thử cả hai bên đi trước và thu thập bằng chứng (theo thứ tự tin cậy):
+1. Chỉ một bên hợp lệ (bên còn lại đang chiếu vua đối phương)
+2. Ký hiệu lời giải ("1..." => đen đi trước), được xác nhận bằng nước đầu buộc chiếu
+   hết trong N nước / cả biến đi lại được / nước đầu hợp lệ
+3. Không có lời giải: bên duy nhất có chiếu hết trong N nước (mate search nông)
+Không có bằng chứng nào thì giữ bên đi của FEN (phán đoán sơ bộ của parser).
+
+Chạy song song trên process pool; kết quả cache theo hash (bàn cờ + lời giải + độ sâu)
+trong file JSON nên lần chạy lại gần như tức thì.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mate_solver import MateSearch, Position, find_san, solution_moves
+
+MATE_IN = re.compile(r'mate_in_(\d+)')
+# Mate search nông: đủ cho mate in 2, giới hạn để không nổ thời gian với bàn cờ parse lỗi
+MAX_SEARCH_DEPTH = 2
+CHUNK_SIZE = 64
+# Tăng khi đổi logic suy luận => cache cũ tự bị bỏ
+CACHE_VERSION = 1
+
+EVIDENCE = ('only_legal_side', 'solution_mates', 'solution_line', 'solution_first_move',
+            'notation', 'mate_search', 'provisional')
+
+
+def cache_key(fen: str, solution: Optional[str], depth: int) -> str:
+    board = ' '.join(fen.split()[:2])  # bàn cờ + bên đi sơ bộ (dùng khi không có bằng chứng)
+    raw = f"{CACHE_VERSION}|{board}|{solution or ''}|{depth}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _replays(position: Position, moves: List[str]) -> bool:
+    for san in moves:
+        move = find_san(position, san)
+        if move is None:
+            return False
+        position = position.make(move)
+    return True
+
+
+def infer_turn(fen: str, solution: Optional[str], depth: int = MAX_SEARCH_DEPTH) -> Tuple[str, str]:
+    """
+    Xác định bên đi trước của một position
+
+    Args:
+        fen: FEN với bên đi sơ bộ
+        solution: Lời giải đã parse (có thể rỗng)
+        depth: Độ sâu mate search
+
+    Returns:
+        (turn 'w'/'b', bằng chứng đã dùng - một giá trị trong EVIDENCE)
+    """
+    try:
+        stated = Position.from_fen(fen)
+    except ValueError:
+        return (fen.split()[1] if len(fen.split()) > 1 else 'w'), 'provisional'
+
+    moves = solution_moves(solution)
+    candidates = {}
+    for turn in (stated.turn, stated.turn ^ 1):
+        position = stated if turn == stated.turn else stated.with_turn(turn)
+        if position.is_valid():
+            candidates['wb'[turn]] = position
+
+    if len(candidates) == 1:
+        return next(iter(candidates)), 'only_legal_side'
+    if not candidates:
+        return 'wb'[stated.turn], 'provisional'
+
+    search = MateSearch()
+    firsts = {side: find_san(position, moves[0]) if moves else None for side, position in candidates.items()}
+
+    # Ký hiệu của sách ("1..." = đen đi) là bằng chứng chính; search xác nhận nếu được
+    notation_side = None
+    if moves:
+        notation_side = 'b' if re.match(r'^\s*1\s*\.\.\.', solution) else 'w'
+    if notation_side in candidates:
+        position, first = candidates[notation_side], firsts[notation_side]
+        if first is None:
+            return notation_side, 'notation'  # bàn cờ parse lỗi: để validator báo
+        if any(search.forces_mate(position, first, d) for d in range(1, depth + 1)):
+            return notation_side, 'solution_mates'
+        replays = _replays(position.make(first), moves[1:])
+        return notation_side, 'solution_line' if replays else 'solution_first_move'
+
+    # Không có lời giải: bên duy nhất có chiếu hết trong N nước
+    mates = [side for side, position in candidates.items() if search.find_mate(position, depth) is not None]
+    if len(mates) == 1:
+        return mates[0], 'mate_search'
+    return 'wb'[stated.turn], 'provisional'
+
+
+def _infer_chunk(chunk: List[Tuple[str, Optional[str], int]]) -> List[Tuple[str, str]]:
+    return [infer_turn(fen, solution, depth) for fen, solution, depth in chunk]
+
+
+def set_turn(fen: str, turn: str) -> str:
+    fields = fen.split()
+    if len(fields) > 1:
+        fields[1] = turn
+    else:
+        fields.append(turn)
+    return ' '.join(fields)
+
+
+def load_cache(cache_path: Optional[str]) -> Dict[str, List[str]]:
+    if cache_path and Path(cache_path).exists():
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_cache(cache_path: str, cache: Dict[str, List[str]]) -> None:
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+
+
+def infer_turns(positions: List[Dict], workers: Optional[int] = None,
+                cache_path: Optional[str] = None, cache: Optional[Dict[str, List[str]]] = None,
+                executor: Optional[Executor] = None) -> Dict[str, int]:
+    """
+    Sửa bên đi trước trong FEN của toàn bộ positions (tại chỗ)
+
+    Args:
+        positions: Danh sách dict có fen, solution, difficulty
+        workers: Số process (mặc định: số CPU)
+        cache_path: File JSON cache kết quả; None => không cache
+        cache: Cache đã nạp sẵn (gọi theo lô: nạp / ghi một lần bằng load_cache / save_cache,
+            khi đó cache_path bị bỏ qua)
+        executor: Process pool dùng chung thay vì tạo pool mới
+
+    Returns:
+        Thống kê: số position theo bằng chứng, 'changed', 'cached'
+    """
+    if cache is None:
+        cache = load_cache(cache_path)
+    else:
+        cache_path = None
+
+    keys, pending = [], []
+    for pos in positions:
+        match = MATE_IN.match(pos.get('difficulty') or '')
+        depth = min(int(match.group(1)), MAX_SEARCH_DEPTH) if match else MAX_SEARCH_DEPTH
+        key = cache_key(pos['fen'], pos.get('solution'), depth)
+        keys.append(key)
+        if key not in cache:
+            pending.append((key, (pos['fen'], pos.get('solution'), depth)))
+
+    # Bỏ trùng: cùng bàn cờ + lời giải chỉ tính một lần
+    unique = list(dict((key, task) for key, task in pending).items())
+    stats = {name: 0 for name in EVIDENCE}
+    stats.update(changed=0, cached=len(positions) - len(pending))
+
+    if unique:
+        tasks = [task for _, task in unique]
+        chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+        workers = workers or os.cpu_count() or 1
+        if executor is not None and len(chunks) > 1:
+            results = [r for rs in executor.map(_infer_chunk, chunks) for r in rs]
+        elif workers == 1 or len(chunks) == 1:
+            results = [r for chunk in chunks for r in _infer_chunk(chunk)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = [r for rs in pool.map(_infer_chunk, chunks) for r in rs]
+        for (key, _), result in zip(unique, results):
+            cache[key] = list(result)
+
+    for pos, key in zip(positions, keys):
+        turn, evidence = cache[key]
+        stats[evidence] += 1
+        fen = set_turn(pos['fen'], turn)
+        if fen != pos['fen']:
+            stats['changed'] += 1
+            pos['fen'] = fen
+
+    if cache_path and unique:
+        save_cache(cache_path, cache)
+
+    return stats
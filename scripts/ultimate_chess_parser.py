@@ -8,15 +8,83 @@ Chức năng:
 - Trích xuất solutions/answers
 - Lưu vào JSON và SQLite database
 - Hỗ trợ multiple parsing strategies
+
+Pipeline dạng stream (bộ nhớ không tăng theo số trang, xem pipeline.py):
+page text -> dòng -> bàn cờ + lời giải -> ghép lời giải -> enrichment (theo lô) -> JSON + SQLite
+
+Nhiều PDF một lúc (song song, gộp vào một database): xem batch_ingest.py
 """
 
+import argparse
 import pdfplumber
+import os
 import re
 import json
 import sqlite3
 import shutil
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from board_scanner import Block, BoardScanner, turn_marker
+from page_cache import EXTRACT_SETTINGS, PageTextCache, file_hash
+from pipeline import (SOLUTION_RE, JsonArraySink, SolutionJoin, SolutionMatcher, SqliteSink,
+                      batched, bounded_map)
+
+# Mỗi worker nhận nhiều page range nhỏ để cân tải (trang có nhiều bàn cờ chậm hơn)
+RANGES_PER_WORKER = 4
+# Giới hạn cỡ range => text đang chờ ghép thứ tự trang không tăng theo cỡ PDF
+MAX_RANGE_PAGES = 32
+# Số position mỗi lô enrichment (turn inference) và ghi sink
+ENRICH_BATCH = 256
+
+# Metadata mặc định (sách Ramakrishnan); batch_ingest.py truyền metadata riêng cho từng PDF
+DEFAULT_SOURCE = 'Ramakrishnan - Mate in Two - All 4 Volumes'
+DEFAULT_DIFFICULTY = 'mate_in_2'
+DEFAULT_TAGS = ('tactics', 'checkmate', 'puzzle')
+DEFAULT_TARGET = 702
+DEFAULT_ID_RANGE = (1, 800)
+
+
+def page_ranges(pages: List[int], workers: int, max_pages: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Group page indexes into contiguous (start, end) ranges for the pool"""
+    if not pages:
+        return []
+    size = len(pages) if workers <= 1 else max(1, -(-len(pages) // (workers * RANGES_PER_WORKER)))
+    if max_pages:
+        size = min(size, max_pages)
+    ranges = []
+    start = prev = pages[0]
+    for page in pages[1:]:
+        if page != prev + 1 or page - start >= size:
+            ranges.append((start, prev + 1))
+            start = page
+        prev = page
+    ranges.append((start, prev + 1))
+    return ranges
+
+
+def iter_extracted(pdf_path: str, pages: Iterable[int]) -> Iterator[Optional[str]]:
+    """Extract the given pages one at a time, opening the PDF once"""
+    with pdfplumber.open(pdf_path) as pdf:
+        for index in pages:
+            page = pdf.pages[index]
+            yield page.extract_text(**EXTRACT_SETTINGS)
+            page.flush_cache()  # giải phóng cache layout của trang
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> Tuple[int, List[Optional[str]]]:
+    """
+    Extract the text of pages [start, end) (runs in a worker process)
+    
+    Returns:
+        (start, text of each page in order)
+    """
+    return start, list(iter_extracted(pdf_path, range(start, end)))
+
+
+def _extract_task(task: Tuple[str, int, int]) -> Tuple[int, List[Optional[str]]]:
+    return extract_page_range(*task)
 
 
 class UltimateChessPDFParser:
@@ -25,8 +93,25 @@ class UltimateChessPDFParser:
     Optimized with only Strategy 1 for maximum accuracy
     """
     
-    def __init__(self):
-        """Initialize parser with piece mappings"""
+    def __init__(self, source: str = DEFAULT_SOURCE, difficulty: str = DEFAULT_DIFFICULTY,
+                 tags: Iterable[str] = DEFAULT_TAGS, target: Optional[int] = DEFAULT_TARGET,
+                 id_range: Tuple[int, int] = DEFAULT_ID_RANGE):
+        """
+        Initialize parser with piece mappings
+        
+        Args:
+            source: Source name stored with every position
+            difficulty: Difficulty stored with every position
+            tags: Tags stored with every position
+            target: Expected number of positions (None = unknown, no success rate)
+            id_range: Valid position ids; numeric lines outside it are not boards
+        """
+        self.source = source
+        self.difficulty = difficulty
+        self.tags = list(tags)
+        self.target = target
+        self.id_range = id_range
+        
         self.piece_map = {
             # Empty squares
             'Z': '', '0': '',
@@ -41,6 +126,7 @@ class UltimateChessPDFParser:
         }
         
         self.valid_chars = set('ZOMALJSQomaljsqPNBRQKpnbrqk0')
+        self._non_board = re.compile(f"[^{re.escape(''.join(sorted(self.valid_chars)))}]")
         self.stats = {
             'total_lines': 0,
             'positions_found': 0,
@@ -48,144 +134,159 @@ class UltimateChessPDFParser:
             'parsing_errors': 0
         }
     
-    def read_pdf(self, pdf_path: str) -> List[str]:
+    def read_pdf(self, pdf_path: str, workers: Optional[int] = None,
+                 cache: Optional[PageTextCache] = None) -> List[str]:
         """
         Read PDF and extract all text lines
         
+        List form of iter_page_texts() + iter_lines(); the streaming pipeline
+        in parse_pdf never holds the whole line list.
+        
         Args:
             pdf_path: Path to PDF file
+            workers: Worker processes (default: CPU count, 1 = sequential)
+            cache: Page text cache (None = always extract)
             
         Returns:
             List of text lines from PDF
         """
-        print(f"📖 Reading PDF: {pdf_path}")
-        
-        all_lines = []
-        
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                print(f"📄 Total pages: {total_pages}")
-                
-                for i, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        lines = text.split('\n')
-                        all_lines.extend(lines)
-                    
-                    if i % 20 == 0:
-                        print(f"   Progress: {i}/{total_pages} pages...")
-                
-                self.stats['total_lines'] = len(all_lines)
-                print(f"✅ PDF read complete - {len(all_lines):,} lines extracted")
-                
+            all_lines = list(self.iter_lines(self.iter_page_texts(pdf_path, workers, cache)))
+            print(f"✅ PDF read complete - {len(all_lines):,} lines extracted")
         except Exception as e:
             print(f"❌ Error reading PDF: {e}")
             return []
         
         return all_lines
     
+    def iter_page_texts(self, pdf_path: str, workers: Optional[int] = None,
+                        cache: Optional[PageTextCache] = None,
+                        executor: Optional[Executor] = None) -> Iterator[Optional[str]]:
+        """
+        Yield the text of every page in page order
+        
+        Pages are extracted in parallel page ranges when workers > 1 and yielded
+        in page order, so the line stream (and boards spanning a page break) is
+        identical to a sequential read. At most a few ranges are in flight at a
+        time. Pages already in the cache are not extracted again - a fully cached
+        PDF never opens pdfplumber.
+        
+        Args:
+            pdf_path: Path to PDF file
+            workers: Worker processes (default: CPU count, 1 = sequential)
+            cache: Page text cache (None = always extract)
+            executor: Shared process pool (default: a pool owned by this call)
+        """
+        print(f"📖 Reading PDF: {pdf_path}")
+        
+        pdf_hash = file_hash(pdf_path) if cache else None
+        total_pages = cache.page_count(pdf_hash) if cache else None
+        if total_pages is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                total_pages = len(pdf.pages)
+            if cache:
+                cache.set_page_count(pdf_hash, total_pages)
+        print(f"📄 Total pages: {total_pages}")
+        
+        missing = [page for page in range(total_pages) if not cache or not cache.contains(pdf_hash, page)]
+        if cache:
+            print(f"♻️  Page cache: {total_pages - len(missing)}/{total_pages} pages cached")
+        
+        workers = max(1, min(workers or os.cpu_count() or 1, len(missing)))
+        own_pool = None
+        if workers == 1:
+            extracted = iter_extracted(pdf_path, missing)
+        else:
+            ranges = page_ranges(missing, workers, MAX_RANGE_PAGES)
+            print(f"   Extracting with {workers} worker processes ({len(ranges)} page ranges)")
+            if executor is None:
+                executor = own_pool = ProcessPoolExecutor(max_workers=workers)
+            tasks = ((pdf_path, start, end) for start, end in ranges)
+            extracted = (text for _, texts in bounded_map(_extract_task, tasks, executor, 2 * workers)
+                         for text in texts)
+        
+        try:
+            done = 0
+            next_missing = iter(missing)
+            upcoming = next(next_missing, None)
+            for page in range(total_pages):
+                if page == upcoming:
+                    text = next(extracted)
+                    upcoming = next(next_missing, None)
+                    done = self._report_pages(done, 1, len(missing))
+                    if cache:
+                        cache.put(pdf_hash, page, text)
+                else:
+                    text = cache.get(pdf_hash, page)
+                    if text is None:
+                        # Bị xóa khỏi cache giữa chừng (prune của process khác)
+                        text = next(iter_extracted(pdf_path, [page]))
+                yield text
+        finally:
+            if own_pool:
+                own_pool.shutdown(cancel_futures=True)
+        
+        if cache and missing:
+            cache.prune()
+    
+    def iter_lines(self, texts: Iterable[Optional[str]]) -> Iterator[str]:
+        """Split page texts into lines (pages joined in order)"""
+        self.stats['total_lines'] = 0
+        for text in texts:
+            if text:
+                for line in text.split('\n'):
+                    self.stats['total_lines'] += 1
+                    yield line
+    
+    @staticmethod
+    def _report_pages(done: int, count: int, total_pages: int) -> int:
+        """Print progress every 20 pages; returns the new done count"""
+        new_done = done + count
+        if new_done // 20 > done // 20 or new_done == total_pages:
+            print(f"   Progress: {new_done}/{total_pages} pages...")
+        return new_done
+    
     def determine_turn(self, rows: List[str], pos_id: int, context_lines: List[str] = None) -> str:
         """
-        Determine who to move based on multiple factors and specific position knowledge
+        Provisional side to move while parsing boards
+        
+        The final decision is made by infer_turns() once solutions are attached
+        (solution notation + mate search); this guess is only kept when that
+        stage finds no evidence either way.
         
         Args:
             rows: List of 8 board rows
-            pos_id: Position ID for pattern analysis
+            pos_id: Position ID (unused, kept for compatibility)
             context_lines: Context lines around position for hints
             
         Returns:
             'w' for white to move, 'b' for black to move
         """
-        
-        # 1. Known positions database (user-verified)
-        known_white = {7, 16}  # Positions confirmed to be white to move
-        known_black = set()    # Positions confirmed to be black to move
-        
-        if pos_id in known_white:
-            return 'w'
-        elif pos_id in known_black:
-            return 'b'
-        
-        # 2. Tìm ký hiệu trong context (nếu có)
+        # 1. Tìm ký hiệu trong context (nếu có)
         if context_lines:
             for line in context_lines:
-                # Tìm các ký hiệu có thể chỉ ai đi trước
-                if '□' in line or 'WHITE' in line.upper() or 'W:' in line:
-                    return 'w'
-                if '■' in line or 'BLACK' in line.upper() or 'B:' in line:
-                    return 'b'
-        
-        # 3. Phân tích vị trí quân để xác định
-        white_pieces = 0
-        black_pieces = 0
-        white_in_check = False
-        black_in_check = False
-        
-        # Tìm vị trí vua
+                marker = turn_marker(line)
+                if marker:
+                    return marker
+        
+        # 2. Bên đang bị chiếu phải đi
         white_king_pos = None
         black_king_pos = None
-        
         for row_idx, row in enumerate(rows):
             for col_idx, char in enumerate(row):
-                if char in self.piece_map:
-                    piece = self.piece_map[char]
-                    if piece == 'K':
-                        white_king_pos = (row_idx, col_idx)
-                        white_pieces += 1
-                    elif piece == 'k':
-                        black_king_pos = (row_idx, col_idx)
-                        black_pieces += 1
-                    elif piece.isupper():
-                        white_pieces += 1
-                    elif piece.islower():
-                        black_pieces += 1
-        
-        # 4. Kiểm tra xem có ai đang bị chiếu không
-        if white_king_pos:
-            white_in_check = self.is_king_in_check(rows, white_king_pos, 'white')
-        if black_king_pos:
-            black_in_check = self.is_king_in_check(rows, black_king_pos, 'black')
-        
-        # 5. Logic quyết định cải tiến:
-        # - Nếu vua trắng bị chiếu => đen vừa đi => trắng đi tiếp  
-        # - Nếu vua đen bị chiếu => trắng vừa đi => đen đi tiếp
-        if white_in_check and not black_in_check:
-            return 'w'  # Trắng bị chiếu, trắng đi
-        elif black_in_check and not white_in_check:
-            return 'b'  # Đen bị chiếu, đen đi
-        
-        # 6. Heuristics cải tiến cho mate-in-2:
-        total_pieces = white_pieces + black_pieces
-        
-        # Patterns dựa trên position ID và material
-        if total_pieces <= 6:  # Deep endgame
-            return 'w'  # Thường trắng mate
-        elif total_pieces <= 10:  # Light endgame
-            # Kiểm tra material balance
-            if white_pieces >= black_pieces:
-                return 'w'
-            else:
-                return 'b'
-        else:  # Middle game
-            # Trong mate-in-2, thường:
-            # - Odd positions (1,3,5,7...) có thể có pattern khác
-            # - Even positions (2,4,6,8...) có thể có pattern khác
-            
-            # Cải tiến logic dựa trên material advantage
-            material_diff = white_pieces - black_pieces
-            
-            if material_diff >= 3:  # Trắng có lợi thế lớn
-                return 'w'
-            elif material_diff <= -3:  # Đen có lợi thế lớn
-                return 'b'
-            else:
-                # Material cân bằng, dùng pattern analysis
-                # Positions trong ranges nhất định có thể có pattern
-                if 20 <= pos_id <= 40 or 180 <= pos_id <= 220:
-                    return 'b'  # Một số ranges có thể đen đi nhiều hơn
-                else:
-                    return 'w'  # Default: trắng đi
+                piece = self.piece_map.get(char)
+                if piece == 'K':
+                    white_king_pos = (row_idx, col_idx)
+                elif piece == 'k':
+                    black_king_pos = (row_idx, col_idx)
+        
+        white_in_check = bool(white_king_pos) and self.is_king_in_check(rows, white_king_pos, 'white')
+        black_in_check = bool(black_king_pos) and self.is_king_in_check(rows, black_king_pos, 'black')
+        if black_in_check and not white_in_check:
+            return 'b'
+        
+        # 3. Mặc định: trắng đi (infer_turns sẽ xác định lại)
+        return 'w'
     
     def is_king_in_check(self, rows: List[str], king_pos: Tuple[int, int], king_color: str) -> bool:
         """
@@ -257,13 +358,8 @@ class UltimateChessPDFParser:
         Returns:
             Cleaned text with only valid chess characters
         """
-        # Remove quotes and extra spaces
-        text = text.replace("'", "").replace('"', "").strip()
-        
-        # Keep only valid chess characters
-        cleaned = ''.join(c for c in text if c in self.valid_chars)
-        
-        return cleaned
+        # Keep only valid chess characters; quotes, spaces and everything else are dropped
+        return self._non_board.sub('', text)
     
     def row_to_fen(self, row: str) -> str:
         """
@@ -300,8 +396,8 @@ class UltimateChessPDFParser:
     
     def parse_positions_strategy1(self, lines: List[str]) -> List[Dict]:
         """
-        Strategy 1: Look for patterns like "1 2", "2 5" and parse BOTH positions
-        Each line contains 2 puzzles side by side with improved turn detection
+        Strategy 1: Look for patterns like "1 2", "2 5" and parse the boards below them
+        Each id line has its puzzles side by side (2 in this book, any number supported)
         
         Args:
             lines: List of text lines
@@ -309,95 +405,65 @@ class UltimateChessPDFParser:
         Returns:
             List of parsed positions
         """
-        positions = []
-        i = 0
+        return list(self.iter_positions(lines))
+    
+    def iter_positions(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """
+        Streaming form of parse_positions_strategy1
         
-        print("🔍 Strategy 1: Parsing with improved turn detection...")
+        Every line is classified once by BoardScanner (id line, board row,
+        footer, solution, noise); a state machine collects the board rows of
+        the open blocks, so the scan is linear in the number of lines.
         
-        while i < len(lines):
-            line = lines[i].strip().replace("'", "")
-            
-            # Look for number pairs (1 2, 2 5, etc.)
-            if re.match(r'^\d+\s+\d+$', line):
-                try:
-                    numbers = line.split()
-                    pos_id1 = int(numbers[0])
-                    pos_id2 = int(numbers[1])
-                    
-                    if 1 <= pos_id1 <= 800 and 1 <= pos_id2 <= 800:
-                        # Collect context lines for turn detection
-                        context_lines = []
-                        for k in range(max(0, i-3), min(len(lines), i+15)):
-                            context_lines.append(lines[k])
-                        
-                        # Parse next 8 rows for BOTH positions
-                        rows_left = []  # Position 1 (left side)
-                        rows_right = [] # Position 2 (right side)
-                        
-                        for j in range(i+1, min(i+50, len(lines))):
-                            row_line = lines[j].strip()
-                            
-                            # Skip number lines
-                            if re.match(r'^\d+\s+\d+$', row_line.replace("'", "")):
-                                continue
-                            
-                            # Stop at board footer
-                            if 'a b c d e f g h' in row_line:
-                                break
-                            
-                            # Split line into left and right boards
-                            cleaned = self.clean_row(row_line)
-                            
-                            if len(cleaned) >= 16:  # Both boards present
-                                left_board = cleaned[:8]
-                                right_board = cleaned[8:16]
-                                
-                                rows_left.append(left_board)
-                                rows_right.append(right_board)
-                                
-                                if len(rows_left) == 8:
-                                    break
-                            elif len(cleaned) >= 8 and len(rows_left) < 8:
-                                # Only one board, assume it's the left one
-                                rows_left.append(cleaned[:8])
-                        
-                        # Convert to FEN for position 1 (left)
-                        if len(rows_left) == 8:
-                            fen_rows = [self.row_to_fen(row) for row in rows_left]
-                            # Use improved turn detection
-                            to_move = self.determine_turn(rows_left, pos_id1, context_lines)
-                            fen = '/'.join(fen_rows) + f' {to_move} KQkq - 0 1'
-                            
-                            positions.append({
-                                'id': pos_id1,
-                                'fen': fen,
-                                'strategy': 'pattern_pairs_left'
-                            })
-                        
-                        # Convert to FEN for position 2 (right)
-                        if len(rows_right) == 8:
-                            fen_rows = [self.row_to_fen(row) for row in rows_right]
-                            # Use improved turn detection
-                            to_move = self.determine_turn(rows_right, pos_id2, context_lines)
-                            fen = '/'.join(fen_rows) + f' {to_move} KQkq - 0 1'
-                            
-                            positions.append({
-                                'id': pos_id2,
-                                'fen': fen,
-                                'strategy': 'pattern_pairs_right'
-                            })
-                        
-                        if len(positions) % 50 == 0:
-                            print(f"   Found {len(positions)} positions...")
-                
-                except (ValueError, IndexError) as e:
-                    self.stats['parsing_errors'] += 1
-                    continue
+        Args:
+            lines: Text lines, in document order
             
-            i += 1
+        Yields:
+            Parsed positions
+        """
+        print("🔍 Strategy 1: Parsing with improved turn detection...")
         
+        scanner = BoardScanner(self.clean_row, self.id_range)
+        found = 0
+        
+        def blocks():
+            for line in lines:
+                yield from scanner.feed(line)
+            yield from scanner.finish()
+        
+        for block in blocks():
+            positions = self.block_positions(block)
+            found += len(positions)
+            yield from positions
+            if found % 50 == 0:
+                print(f"   Found {found} positions...")
+    
+    def block_positions(self, block: Block) -> List[Dict]:
+        """Convert the complete boards (8 rows) of a block to positions"""
+        positions = []
+        context_lines = [block.context] if block.context else None
+        for index, (pos_id, rows) in enumerate(zip(block.ids, block.boards)):
+            if len(rows) != 8:
+                continue
+            fen_rows = [self.row_to_fen(row) for row in rows]
+            # Use improved turn detection
+            to_move = self.determine_turn(rows, pos_id, context_lines)
+            fen = '/'.join(fen_rows) + f' {to_move} KQkq - 0 1'
+            
+            positions.append({
+                'id': pos_id,
+                'fen': fen,
+                'strategy': self.block_strategy(index, len(block.ids))
+            })
         return positions
     
+    @staticmethod
+    def block_strategy(index: int, across: int) -> str:
+        """Strategy label of the board at `index` in a row of `across` boards"""
+        if across == 2:
+            return ('pattern_pairs_left', 'pattern_pairs_right')[index]
+        return f'pattern_{across}_across_{index + 1}'
+    
     def parse_solutions(self, text: str) -> Dict[int, str]:
         """
         Extract solutions from PDF text
@@ -413,9 +479,7 @@ class UltimateChessPDFParser:
         print("🔍 Extracting solutions...")
         
         # Pattern: Solution-1: 1. h7+ Kh8 2. Rf8 Checkmate 1-0
-        pattern = r'Solution-(\d+):\s+(.+?)\s+(?:Checkmate\s+)?(?:1-0|0-1)'
-        
-        for match in re.finditer(pattern, text, re.MULTILINE):
+        for match in SOLUTION_RE.finditer(text):
             try:
                 pos_id = int(match.group(1))
                 solution = match.group(2).strip()
@@ -460,6 +524,47 @@ class UltimateChessPDFParser:
         
         return solutions
     
+    def iter_matched(self, lines: Iterable[str], spill_dir: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Parse boards and solutions in one pass and pair them up by id
+        
+        Solutions are matched line by line (SolutionMatcher), so one that spans
+        a page break is still found. A position is yielded as soon as both it
+        and its solution have been seen; until then it waits in an on-disk
+        SolutionJoin, so solutions printed at the end of the book cost no RAM.
+        Positions without a solution are yielded last with an empty solution.
+        
+        Args:
+            lines: Text lines, in document order
+            spill_dir: Directory for the join's temporary database
+            
+        Yields:
+            Positions with 'solution' set
+        """
+        matcher = SolutionMatcher()
+        found = []
+        
+        def tap(lines):
+            for line in lines:
+                found.extend(matcher.feed(line))
+                yield line
+            found.extend(matcher.finish())
+        
+        with SolutionJoin(spill_dir) as join:
+            for pos in self.iter_positions(tap(lines)):
+                for pos_id, solution in found:
+                    yield from join.add_solution(pos_id, solution)
+                found.clear()
+                yield from join.add_position(pos)
+            for pos_id, solution in found:
+                yield from join.add_solution(pos_id, solution)
+            yield from join.finish()
+            
+            self.stats['positions_found'] = join.stats['positions']
+            self.stats['solutions_found'] = join.stats['solutions']
+        print(f"✅ Found {self.stats['positions_found']} positions, {self.stats['solutions_found']} solutions "
+              f"({join.stats['matched']} matched)")
+    
     def merge_multiple_strategies(self, all_positions: List[List[Dict]]) -> List[Dict]:
         """
         Merge positions from multiple strategies, removing duplicates
@@ -496,7 +601,8 @@ class UltimateChessPDFParser:
         for strategy, count in strategy_stats.items():
             print(f"   {strategy}: {count} positions")
         print(f"   Final merged: {len(result)} positions")
-        print(f"   Target: 702 positions ({(len(result)/702*100):.1f}% complete)")
+        if self.target:
+            print(f"   Target: {self.target} positions ({(len(result)/self.target*100):.1f}% complete)")
         
         return result
         """
@@ -547,9 +653,7 @@ class UltimateChessPDFParser:
         
         for pos in positions:
             pos['solution'] = solutions.get(pos['id'], '')
-            pos['difficulty'] = 'mate_in_2'
-            pos['source'] = 'Ramakrishnan - Mate in Two - All 4 Volumes'
-            pos['tags'] = ['tactics', 'checkmate', 'puzzle']
+            self.enhance_position(pos)
         
         # Count positions with solutions
         with_solutions = sum(1 for p in positions if p['solution'])
@@ -557,82 +661,141 @@ class UltimateChessPDFParser:
         
         return positions
     
-    def save_results(self, positions: List[Dict], output_dir: str = 'output') -> None:
+    def enhance_position(self, pos: Dict) -> Dict:
+        """Add metadata to a position that already has its solution"""
+        pos['difficulty'] = self.difficulty
+        pos['source'] = self.source
+        pos['tags'] = list(self.tags)
+        return pos
+    
+    def iter_enriched(self, positions: Iterable[Dict], output_dir: str = 'output',
+                      workers: Optional[int] = None,
+                      executor: Optional[Executor] = None) -> Iterator[List[Dict]]:
+        """
+        Enrichment stage: metadata, then the side to move from the solution and
+        a shallow mate search, one batch at a time
+        
+        Args:
+            positions: Positions with their solution attached
+            output_dir: Output directory for the result cache (turn_cache.json)
+            workers: Worker processes (default: CPU count)
+            executor: Shared process pool for the mate searches
+            
+        Yields:
+            Batches of enhanced positions (FEN turn updated)
+        """
+        from turn_inference import EVIDENCE, infer_turns, load_cache, save_cache
+        
+        cache_path = str(Path(output_dir) / 'turn_cache.json')
+        cache = load_cache(cache_path)
+        totals = {name: 0 for name in EVIDENCE + ('changed', 'cached')}
+        count = with_solutions = 0
+        
+        for batch in batched(positions, ENRICH_BATCH):
+            for pos in batch:
+                self.enhance_position(pos)
+            for name, value in infer_turns(batch, workers, cache=cache, executor=executor).items():
+                totals[name] += value
+            count += len(batch)
+            with_solutions += sum(1 for pos in batch if pos['solution'])
+            yield batch
+        
+        if totals['cached'] < count:
+            save_cache(cache_path, cache)
+        
+        print(f"✅ Enhanced {count} positions ({with_solutions} with solutions)")
+        print(f"♟️  Side to move decided from solution notation + mate search "
+              f"({totals['changed']} changed, {totals['cached']} from cache)")
+        for evidence, value in totals.items():
+            if value and evidence not in ('changed', 'cached'):
+                print(f"   {evidence}: {value}")
+    
+    def validate_positions(self, db_path: str, output_dir: str = 'output',
+                           workers: Optional[int] = None,
+                           executor: Optional[Executor] = None) -> Optional[Dict]:
+        """
+        Replay every saved solution on its FEN and write a validation report
+        
+        Puzzles are streamed back from the database in id order, so neighbours
+        for id-mismatch detection are the same as for a full in-memory list.
+        
+        Args:
+            db_path: SQLite database written by save_results
+            output_dir: Output directory for validation_report.json
+            workers: Worker processes (default: CPU count)
+            executor: Shared process pool
+            
+        Returns:
+            Report summary (with the first problems), or None if python-chess is not installed
+        """
+        print("🔍 Validating solutions against positions...")
+        
+        try:
+            from puzzle_validator import iter_validated, print_report, write_report
+        except ImportError:
+            print("⚠️  python-chess not installed - skipping validation (pip install python-chess)")
+            return None
+        
+        report_file = Path(output_dir) / 'validation_report.json'
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            puzzles = (dict(row) for row in conn.execute(
+                'SELECT id, fen, solution, difficulty FROM positions ORDER BY id'))
+            report = write_report(iter_validated(puzzles, executor), str(report_file),
+                                  workers or os.cpu_count() or 1)
+        finally:
+            conn.close()
+        print_report(report)
+        print(f"✅ Validation report saved: {report_file}")
+        
+        return report
+    
+    def save_results(self, batches: Iterable[List[Dict]], output_dir: str = 'output',
+                     sample_size: int = 5, publish: bool = True) -> Tuple[int, List[Dict]]:
         """
-        Save results to JSON and SQLite files
+        Sink stage: write each batch to JSON and SQLite as soon as it is produced
         
         Args:
-            positions: List of enhanced positions
+            batches: Batches of enhanced positions
             output_dir: Output directory path
+            sample_size: Number of positions kept for show_sample_results
+            publish: Copy the database to backend/ (batch ingestion publishes the merged one)
+            
+        Returns:
+            (positions saved, first sample_size positions)
         """
-        print(f"💾 Saving results to {output_dir}/...")
+        print(f"💾 Saving results to {output_dir}/ as they are produced...")
         
         # Create directories
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
-        backend_path = Path('backend')
-        backend_path.mkdir(exist_ok=True)
-        
-        try:
-            # Save JSON
-            json_file = output_path / 'chess_positions.json'
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(positions, f, indent=2, ensure_ascii=False)
-            print(f"✅ JSON saved: {json_file}")
-            
-            # Save SQLite
-            db_file = output_path / 'chess_puzzles.db'
-            self._save_to_sqlite(positions, str(db_file))
-            print(f"✅ Database saved: {db_file}")
-            
-            # Copy to backend
+        json_file = output_path / 'chess_positions.json'
+        db_file = output_path / 'chess_puzzles.db'
+        sample = []
+        with JsonArraySink(str(json_file)) as json_sink, SqliteSink(str(db_file)) as db_sink:
+            for batch in batches:
+                json_sink.write_many(batch)
+                db_sink.write_many(batch)
+                sample.extend(batch[:sample_size - len(sample)])
+        print(f"✅ JSON saved: {json_file}")
+        print(f"✅ Database saved: {db_file}")
+        
+        # Copy to backend
+        if publish:
+            backend_path = Path('backend')
+            backend_path.mkdir(exist_ok=True)
             backend_db = backend_path / 'chess_puzzles.db'
             shutil.copy(str(db_file), str(backend_db))
             print(f"✅ Copied to backend: {backend_db}")
-            
-        except Exception as e:
-            print(f"❌ Error saving results: {e}")
+        
+        return json_sink.count, sample
     
     def _save_to_sqlite(self, positions: List[Dict], db_path: str) -> None:
         """Save positions to SQLite database"""
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Create table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS positions (
-            id INTEGER PRIMARY KEY,
-            fen TEXT NOT NULL,
-            solution TEXT,
-            difficulty TEXT,
-            source TEXT,
-            tags TEXT,
-            strategy TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Clear existing data
-        cursor.execute('DELETE FROM positions')
-        
-        # Insert positions
-        for pos in positions:
-            cursor.execute('''
-            INSERT INTO positions (id, fen, solution, difficulty, source, tags, strategy)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                pos['id'],
-                pos['fen'],
-                pos['solution'],
-                pos['difficulty'],
-                pos['source'],
-                ','.join(pos['tags']),
-                pos.get('strategy', 'unknown')
-            ))
-        
-        conn.commit()
-        conn.close()
+        with SqliteSink(db_path) as sink:
+            sink.write_many(positions)
     
     def show_sample_results(self, positions: List[Dict], count: int = 5) -> None:
         """Show sample results"""
@@ -644,62 +807,75 @@ class UltimateChessPDFParser:
             print(f"   FEN: {pos['fen']}")
             print(f"   Solution: {pos['solution']}")
     
-    def show_statistics(self, positions: List[Dict]) -> None:
-        """Show parsing statistics including turn analysis"""
+    def show_statistics(self, db_path: str) -> None:
+        """Show parsing statistics including turn analysis (aggregated from the saved database)"""
+        conn = sqlite3.connect(db_path)
+        try:
+            total, with_solutions, white_to_move, black_to_move, min_id, max_id = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(solution != ''), 0),
+                       COALESCE(SUM(fen LIKE '% w %'), 0), COALESCE(SUM(fen LIKE '% b %'), 0),
+                       MIN(id), MAX(id)
+                FROM positions
+            ''').fetchone()
+            strategy_count = conn.execute('''
+                SELECT COALESCE(strategy, 'unknown'), COUNT(*) FROM positions
+                GROUP BY strategy ORDER BY MIN(rowid)
+            ''').fetchall()
+        finally:
+            conn.close()
+        
         print(f"\n📊 PARSING STATISTICS:")
         print("=" * 80)
         print(f"Total lines processed:    {self.stats['total_lines']:,}")
-        print(f"Positions found:         {len(positions):,}")
+        print(f"Positions found:         {self.stats['positions_found']:,}")
         print(f"Solutions found:         {self.stats['solutions_found']:,}")
         print(f"Parsing errors:          {self.stats['parsing_errors']:,}")
-        print(f"Positions with solutions: {sum(1 for p in positions if p['solution']):,}")
-        print(f"Success rate:            {(len(positions)/702*100):.1f}% (Target: 702 positions)")
+        print(f"Positions with solutions: {with_solutions:,}")
+        if self.target:
+            print(f"Success rate:            {(total/self.target*100):.1f}% (Target: {self.target} positions)")
         
         # Turn analysis
-        white_to_move = sum(1 for p in positions if ' w ' in p['fen'])
-        black_to_move = sum(1 for p in positions if ' b ' in p['fen'])
-        
         print(f"\n🎯 TURN ANALYSIS:")
         print(f"White to move:           {white_to_move:,}")
         print(f"Black to move:           {black_to_move:,}")
         
         # Strategy breakdown
-        strategy_count = {}
-        for pos in positions:
-            strategy = pos.get('strategy', 'unknown')
-            strategy_count[strategy] = strategy_count.get(strategy, 0) + 1
-        
         print(f"\n📋 STRATEGY BREAKDOWN:")
-        for strategy, count in strategy_count.items():
+        for strategy, count in strategy_count:
             print(f"   {strategy}: {count}")
         
-        # Position ID range analysis
-        if positions:
-            min_id = min(p['id'] for p in positions)
-            max_id = max(p['id'] for p in positions)
+        # Position ID range analysis (id là khóa chính => total = số id khác nhau)
+        if total:
             print(f"\n🔢 POSITION RANGE:")
             print(f"   Min ID: {min_id}")
             print(f"   Max ID: {max_id}")
-            print(f"   Range coverage: {len(set(p['id'] for p in positions))}/{max_id-min_id+1} positions")
+            print(f"   Range coverage: {total}/{max_id-min_id+1} positions")
         
         # Missing positions analysis
-        if len(positions) < 702:
-            print(f"\n⚠️  MISSING POSITIONS: {702 - len(positions)}")
+        if self.target and total < self.target:
+            print(f"\n⚠️  MISSING POSITIONS: {self.target - total}")
             print("   Possible causes:")
             print("   • Some boards couldn't be parsed due to format issues")
             print("   • Missing position numbers in PDF")
             print("   • Board data corruption in PDF extraction")
     
-    def parse_pdf(self, pdf_path: str, output_dir: str = 'output') -> List[Dict]:
+    def parse_pdf(self, pdf_path: str, output_dir: str = 'output',
+                  workers: Optional[int] = None, use_cache: bool = True,
+                  cache_dir: Optional[str] = None, publish: bool = True) -> int:
         """
         Main parsing function - combines all strategies
         
         Args:
             pdf_path: Path to PDF file
             output_dir: Output directory for results
+            workers: Worker processes for extraction, turn inference and validation
+                (default: CPU count)
+            use_cache: Reuse extracted page text from the page cache
+            cache_dir: Page cache directory (default: output_dir/page_cache)
+            publish: Copy the database to backend/
             
         Returns:
-            List of parsed and enhanced positions
+            Number of positions saved (0 on failure)
         """
         print("\n" + "=" * 80)
         print("🏆 ULTIMATE CHESS PDF PARSER - RAMAKRISHNAN COLLECTION")
@@ -708,42 +884,69 @@ class UltimateChessPDFParser:
         # Check if file exists
         if not Path(pdf_path).exists():
             print(f"❌ File not found: {pdf_path}")
-            return []
+            return 0
         
-        # Read PDF
-        lines = self.read_pdf(pdf_path)
-        if not lines:
-            return []
+        cache = PageTextCache(cache_dir or str(Path(output_dir) / 'page_cache')) if use_cache else None
+        workers = workers or os.cpu_count() or 1
+        # Một process pool cho cả pipeline: trích trang, turn inference, validation
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            texts = self.iter_page_texts(pdf_path, workers, cache, executor)
+            return self.run_pipeline(texts, output_dir, workers, executor, publish)
+        except Exception as e:
+            print(f"❌ Error parsing PDF: {e}")
+            return 0
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+    
+    def run_pipeline(self, texts: Iterable[Optional[str]], output_dir: str = 'output',
+                     workers: Optional[int] = None, executor: Optional[Executor] = None,
+                     publish: bool = True) -> int:
+        """
+        Run the streaming stages over page texts (in page order)
         
-        # Parse positions using only Strategy 1 (most effective)
-        positions = self.parse_positions_strategy1(lines)
-        self.stats['positions_found'] = len(positions)
+        Returns:
+            Number of positions saved
+        """
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        # Parse solutions
-        full_text = '\n'.join(lines)
-        solutions = self.parse_solutions(full_text)
+        # Page text -> lines -> boards + solutions -> positions with solutions
+        positions = self.iter_matched(self.iter_lines(texts), spill_dir=output_dir)
         
-        # Enhance positions
-        final_positions = self.enhance_positions(positions, solutions)
+        # Metadata + side to move (replaces the provisional guess made while parsing)
+        batches = self.iter_enriched(positions, output_dir, workers, executor)
         
-        # Save results
-        self.save_results(final_positions, output_dir)
+        # JSON + SQLite, written as batches arrive
+        count, sample = self.save_results(batches, output_dir, publish=publish)
+        if not count:
+            return 0
+        db_file = str(Path(output_dir) / 'chess_puzzles.db')
+        
+        # Validate solutions (illegal moves, missing mates, wrong turn, id mismatch)
+        self.validate_positions(db_file, output_dir, workers, executor)
         
         # Show results
-        self.show_sample_results(final_positions)
-        self.show_statistics(final_positions)
+        self.show_sample_results(sample)
+        self.show_statistics(db_file)
         
         print(f"\n" + "=" * 80)
         print("✅ PARSING COMPLETED SUCCESSFULLY!")
         print("=" * 80)
         
-        return final_positions
+        return count
 
 
 def main():
     """Main function"""
+    cli = argparse.ArgumentParser(description='Parse the Ramakrishnan mate-in-two PDF')
+    cli.add_argument('pdf', nargs='?', help='PDF path (default: search the usual locations)')
+    cli.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    cli.add_argument('--no-cache', action='store_true', help='Ignore and do not update output/page_cache')
+    args = cli.parse_args()
+    
     # Default PDF path
-    pdf_path = r'E:\project\chess-app\data\RAMAKRISHNAN-MATE-IN-2.pdf'
+    pdf_path = args.pdf or r'E:\project\chess-app\data\RAMAKRISHNAN-MATE-IN-2.pdf'
     
     # Alternative paths to try
     alternative_paths = [
@@ -784,10 +987,10 @@ def main():
     
     # Run parser
     parser = UltimateChessPDFParser()
-    positions = parser.parse_pdf(pdf_path)
+    saved = parser.parse_pdf(pdf_path, workers=args.workers, use_cache=not args.no_cache)
     
     # Final summary
-    if positions:
+    if saved:
         print(f"\n🎯 FILES CREATED:")
         output_files = [
             'output/chess_positions.json',